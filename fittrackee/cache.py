@@ -0,0 +1,431 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+from fittrackee import appLog, limiter, r
+from fittrackee.files import get_absolute_file_path
+
+
+class BaseCache(ABC):
+    """
+    Cache storing bytes values by namespace (for instance a workout uuid),
+    to evict all namespace values at once
+    """
+
+    backend = ''
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, namespace: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> Dict:
+        pass
+
+
+class LRUCache(BaseCache):
+    """
+    In-process cache, evicting least recently used values when max size (in
+    bytes) is reached, and values older than ttl (in seconds) if provided
+    """
+
+    backend = 'memory'
+
+    def __init__(
+        self, name: str, max_size: int, ttl: Optional[int] = None
+    ) -> None:
+        super().__init__(name)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._values: OrderedDict[Tuple[str, str], bytes] = OrderedDict()
+        self._expiration_times: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._values.get((namespace, key))
+            if (
+                value is not None
+                and self.ttl is not None
+                and time.time() > self._expiration_times[(namespace, key)]
+            ):
+                self._remove((namespace, key))
+                value = None
+            if value is None:
+                self.misses += 1
+                return None
+            self._values.move_to_end((namespace, key))
+            self.hits += 1
+            return value
+
+    def _remove(self, cache_key: Tuple[str, str]) -> None:
+        self.size -= len(self._values.pop(cache_key))
+        self._expiration_times.pop(cache_key, None)
+
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        if len(value) > self.max_size:
+            return
+        with self._lock:
+            if (namespace, key) in self._values:
+                self._remove((namespace, key))
+            while self._values and self.size + len(value) > self.max_size:
+                self._remove(next(iter(self._values)))
+            self._values[(namespace, key)] = value
+            self.size += len(value)
+            if self.ttl is not None:
+                self._expiration_times[(namespace, key)] = (
+                    time.time() + self.ttl
+                )
+
+    def delete(self, namespace: str) -> None:
+        with self._lock:
+            for cache_key in [
+                cache_key
+                for cache_key in self._values
+                if cache_key[0] == namespace
+            ]:
+                self._remove(cache_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self._expiration_times.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': self.backend,
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._values),
+            'size': self.size,
+        }
+
+
+class RedisCache(BaseCache):
+    """
+    Cache shared between application processes, each value is stored in a
+    Redis key expiring after ttl (in seconds).
+    If Redis is not reachable, values are not cached.
+    """
+
+    backend = 'redis'
+
+    def __init__(self, name: str, client: redis.Redis, ttl: int) -> None:
+        super().__init__(name)
+        self.client = client
+        self.ttl = ttl
+        self.stats_key = f'fittrackee:{name}:stats'
+
+    def _get_namespace_key(self, namespace: str) -> str:
+        return f'fittrackee:{self.name}:values:{namespace}'
+
+    def _get_value_key(self, namespace: str, key: str) -> str:
+        return f'{self._get_namespace_key(namespace)}:{key}'
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            value = self.client.get(self._get_value_key(namespace, key))
+            self.client.hincrby(
+                self.stats_key, 'misses' if value is None else 'hits'
+            )
+            return value
+        except redis.exceptions.RedisError as e:
+            appLog.error(f'Unable to get value from {self.name} cache: {e}')
+            return None
+
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        try:
+            self.client.set(
+                self._get_value_key(namespace, key), value, ex=self.ttl
+            )
+        except redis.exceptions.RedisError as e:
+            appLog.error(f'Unable to store value in {self.name} cache: {e}')
+
+    def delete(self, namespace: str) -> None:
+        # escape glob-style pattern special characters (namespace may be
+        # an url)
+        pattern = re.sub(
+            r'([*?\[\]\\])', r'\\\1', self._get_namespace_key(namespace)
+        )
+        try:
+            for key in self.client.scan_iter(f'{pattern}:*'):
+                self.client.delete(key)
+        except redis.exceptions.RedisError as e:
+            appLog.error(
+                f'Unable to delete values from {self.name} cache: {e}'
+            )
+
+    def clear(self) -> None:
+        try:
+            for key in self.client.scan_iter(f'fittrackee:{self.name}:*'):
+                self.client.delete(key)
+        except redis.exceptions.RedisError as e:
+            appLog.error(f'Unable to clear {self.name} cache: {e}')
+
+    def get_stats(self) -> Dict:
+        try:
+            stats = self.client.hgetall(self.stats_key)
+        except redis.exceptions.RedisError as e:
+            appLog.error(f'Unable to get {self.name} cache stats: {e}')
+            stats = {}
+        return {
+            'backend': self.backend,
+            'hits': int(stats.get(b'hits', 0)),
+            'misses': int(stats.get(b'misses', 0)),
+        }
+
+
+class DiskCache(BaseCache):
+    """
+    Cache stored in files in upload folder, shared between application
+    processes and persisted on restart.
+    Values expire after ttl (in seconds) and least recently used values (on
+    file access time, updated on each read) are evicted when max size (in
+    bytes) is reached.
+    """
+
+    backend = 'disk'
+    # ratio of max size to reach on eviction, to avoid evicting values on
+    # each write when cache is full
+    eviction_ratio = 0.9
+
+    def __init__(self, name: str, max_size: int, ttl: int) -> None:
+        super().__init__(name)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # size is calculated from files on first write
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def dir_path(self) -> str:
+        return get_absolute_file_path(os.path.join('cache', self.name))
+
+    def _get_namespace_dir_path(self, namespace: str) -> str:
+        # namespace may not be a valid directory name (for instance an url)
+        return os.path.join(
+            self.dir_path, hashlib.sha256(namespace.encode()).hexdigest()
+        )
+
+    def _get_file_path(self, namespace: str, key: str) -> str:
+        return os.path.join(self._get_namespace_dir_path(namespace), key)
+
+    def _get_files(self) -> List[Tuple[str, os.stat_result]]:
+        files = []
+        for dir_path, _, file_names in os.walk(self.dir_path):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                try:
+                    files.append((file_path, os.stat(file_path)))
+                except OSError:  # file deleted by another process
+                    continue
+        return files
+
+    def _is_expired(self, file_stat: os.stat_result) -> bool:
+        return time.time() - file_stat.st_mtime > self.ttl
+
+    def _increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        file_path = self._get_file_path(namespace, key)
+        try:
+            file_stat = os.stat(file_path)
+            if self._is_expired(file_stat):
+                os.remove(file_path)
+                self._increment('misses')
+                return None
+            with open(file_path, 'rb') as f:
+                value = f.read()
+            os.utime(file_path, (time.time(), file_stat.st_mtime))
+        except OSError:
+            self._increment('misses')
+            return None
+        self._increment('hits')
+        return value
+
+    def _evict(self) -> None:
+        files = self._get_files()
+        size = sum(file_stat.st_size for _, file_stat in files)
+        max_size = self.max_size * self.eviction_ratio
+        for file_path, file_stat in sorted(
+            files,
+            key=lambda file: (
+                not self._is_expired(file[1]),
+                file[1].st_atime,
+            ),
+        ):
+            if size <= max_size and not self._is_expired(file_stat):
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            size -= file_stat.st_size
+        self._size = size
+
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        if len(value) > self.max_size:
+            return
+        dir_path = self._get_namespace_dir_path(namespace)
+        try:
+            os.makedirs(dir_path, exist_ok=True)
+            fd, tmp_file_path = tempfile.mkstemp(dir=dir_path)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_file_path, os.path.join(dir_path, key))
+        except OSError as e:
+            appLog.error(f'Unable to store value in {self.name} cache: {e}')
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(
+                    file_stat.st_size for _, file_stat in self._get_files()
+                )
+            else:
+                self._size += len(value)
+            if self._size > self.max_size:
+                self._evict()
+
+    def delete(self, namespace: str) -> None:
+        shutil.rmtree(
+            self._get_namespace_dir_path(namespace), ignore_errors=True
+        )
+        with self._lock:
+            self._size = None
+
+    def clear(self) -> None:
+        shutil.rmtree(self.dir_path, ignore_errors=True)
+        with self._lock:
+            self._size = None
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> Dict:
+        files = self._get_files()
+        return {
+            'backend': self.backend,
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(files),
+            'size': sum(file_stat.st_size for _, file_stat in files),
+        }
+
+
+class Cache:
+    """
+    Use Redis cache if Redis is available (the same way as API rate limits,
+    the limiter being disabled when Redis is not available), otherwise
+    in-process LRU cache
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: int) -> None:
+        self.lru_cache = LRUCache(name, max_size, ttl)
+        self.redis_cache = RedisCache(name, r, ttl)
+
+    @property
+    def backend(self) -> BaseCache:
+        return self.redis_cache if limiter.enabled else self.lru_cache
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        return self.backend.get(namespace, key)
+
+    def set(self, namespace: str, key: str, value: bytes) -> None:
+        self.backend.set(namespace, key, value)
+
+    def delete(self, namespace: str) -> None:
+        self.backend.delete(namespace)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def get_stats(self) -> Dict:
+        return self.backend.get_stats()
+
+
+class UserResponsesCache:
+    """
+    Cache of API responses by user, stored only in Redis since responses
+    must be invalidated for all application processes (responses are not
+    cached if Redis is not available, the same way API rate limits are
+    disabled).
+    Responses are stored by user generation, incremented to invalidate user
+    responses (responses of previous generations expiring after ttl).
+    """
+
+    def __init__(self, name: str, ttl: int) -> None:
+        self.name = name
+        self.redis_cache = RedisCache(name, r, ttl)
+
+    def _get_generation_key(self, user_id: int) -> str:
+        return f'fittrackee:{self.name}:generations:{user_id}'
+
+    def get_namespace(self, user_id: int) -> Optional[str]:
+        """
+        Return namespace of user current generation, to get before
+        computing response (a response computed while user data are
+        modified is stored in previous generation)
+        """
+        if not limiter.enabled:
+            return None
+        try:
+            generation = int(r.get(self._get_generation_key(user_id)) or 0)
+        except redis.exceptions.RedisError as e:
+            appLog.error(f'Unable to get {self.name} cache generation: {e}')
+            return None
+        return f'{user_id}:{generation}'
+
+    def get(self, namespace: Optional[str], key: str) -> Optional[bytes]:
+        if namespace is None:
+            return None
+        return self.redis_cache.get(namespace, key)
+
+    def set(self, namespace: Optional[str], key: str, value: bytes) -> None:
+        if namespace is None:
+            return
+        self.redis_cache.set(namespace, key, value)
+
+    def invalidate(self, user_id: int) -> None:
+        if not limiter.enabled:
+            return
+        try:
+            r.incr(self._get_generation_key(user_id))
+        except redis.exceptions.RedisError as e:
+            appLog.error(f'Unable to invalidate {self.name} cache: {e}')
+
+    def clear(self) -> None:
+        if limiter.enabled:
+            self.redis_cache.clear()
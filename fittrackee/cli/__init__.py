@@ -3,6 +3,7 @@ import click
 from fittrackee.migrations.commands import db_cli
 from fittrackee.oauth2.commands import oauth2_cli
 from fittrackee.users.commands import users_cli
+from fittrackee.workouts.commands import records_cli, workouts_cli
 
 
 @click.group()
@@ -13,4 +14,6 @@ def cli() -> None:
 
 cli.add_command(db_cli)
 cli.add_command(oauth2_cli)
+cli.add_command(records_cli)
 cli.add_command(users_cli)
+cli.add_command(workouts_cli)
@@ -72,6 +72,17 @@ class BaseConfig:
     }
     OAUTH2_REFRESH_TOKEN_GENERATOR = True
     DATA_EXPORT_EXPIRATION = 24  # hours
+    # zip archives import: processes to parse gpx files and threads to
+    # get weather data (0 process: files are parsed in a thread)
+    # Note: maps are generated in background tasks or on first request
+    WORKOUTS_IMPORT_PROCESSES = int(
+        os.environ.get('WORKOUTS_IMPORT_PROCESSES', 0)
+    )
+    WORKOUTS_IMPORT_THREADS = int(os.environ.get('WORKOUTS_IMPORT_THREADS', 4))
+    # store uploaded gpx files compressed with gzip
+    GPX_COMPRESSION = (
+        os.environ.get('GPX_COMPRESSION', 'false').lower() == 'true'
+    )
 
 
 class DevelopmentConfig(BaseConfig):
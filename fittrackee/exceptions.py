@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Tuple
 
 
 class GenericException(Exception):
@@ -9,3 +9,7 @@ class GenericException(Exception):
         self.status = status
         self.message = message
         self.e = e
+
+    def __reduce__(self) -> Tuple:
+        # to be raised from a process pool
+        return self.__class__, (self.status, self.message, self.e)
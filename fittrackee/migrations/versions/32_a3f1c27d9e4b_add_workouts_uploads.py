@@ -0,0 +1,47 @@
+"""add workouts uploads
+
+Revision ID: a3f1c27d9e4b
+Revises: db58d195c5bf
+Create Date: 2026-10-17 10:12:31.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c27d9e4b'
+down_revision = 'db58d195c5bf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('workouts_uploads',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('uuid', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('file_name', sa.String(length=255), nullable=False),
+    sa.Column('file_path', sa.String(length=255), nullable=False),
+    sa.Column('workout_data', sa.JSON(), nullable=False),
+    sa.Column('files_count', sa.Integer(), nullable=True),
+    sa.Column('processed_files_count', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.JSON(), nullable=False),
+    sa.Column('workouts', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('uuid')
+    )
+    with op.batch_alter_table('workouts_uploads', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_workouts_uploads_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('workouts_uploads', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_workouts_uploads_user_id'))
+
+    op.drop_table('workouts_uploads')
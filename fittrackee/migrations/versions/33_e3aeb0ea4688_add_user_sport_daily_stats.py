@@ -0,0 +1,65 @@
+"""add user sport daily stats
+
+Revision ID: e3aeb0ea4688
+Revises: a3f1c27d9e4b
+Create Date: 2026-10-17 16:42:08.351204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3aeb0ea4688'
+down_revision = 'a3f1c27d9e4b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_sport_daily_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('sport_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('nb_workouts', sa.Integer(), nullable=False),
+    sa.Column('total_distance', sa.Numeric(precision=12, scale=3), nullable=False),
+    sa.Column('total_duration', sa.Integer(), nullable=False),
+    sa.Column('total_ascent', sa.Numeric(precision=14, scale=3), nullable=False),
+    sa.Column('total_descent', sa.Numeric(precision=14, scale=3), nullable=False),
+    sa.Column('total_average_speed', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['sport_id'], ['sports.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'sport_id', 'date')
+    )
+    with op.batch_alter_table('user_sport_daily_stats', schema=None) as batch_op:
+        batch_op.create_index('user_sport_daily_stats_user_date', ['user_id', 'date'], unique=False)
+
+    op.execute(
+        """
+        INSERT INTO user_sport_daily_stats (
+          user_id, sport_id, date, nb_workouts, total_distance,
+          total_duration, total_ascent, total_descent, total_average_speed
+        )
+        SELECT workouts.user_id, workouts.sport_id,
+               (workouts.workout_date AT TIME ZONE 'UTC'
+                 AT TIME ZONE coalesce(users.timezone, 'UTC'))::date,
+               count(workouts.id),
+               coalesce(sum(workouts.distance), 0),
+               coalesce(sum(extract(epoch from workouts.moving)), 0),
+               coalesce(sum(workouts.ascent), 0),
+               coalesce(sum(workouts.descent), 0),
+               coalesce(sum(workouts.ave_speed), 0)
+        FROM workouts
+        JOIN users ON users.id = workouts.user_id
+        GROUP BY workouts.user_id, workouts.sport_id,
+                 (workouts.workout_date AT TIME ZONE 'UTC'
+                   AT TIME ZONE coalesce(users.timezone, 'UTC'))::date;
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('user_sport_daily_stats', schema=None) as batch_op:
+        batch_op.drop_index('user_sport_daily_stats_user_date')
+
+    op.drop_table('user_sport_daily_stats')
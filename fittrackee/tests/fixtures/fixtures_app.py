@@ -9,7 +9,10 @@ from flask import current_app
 from fittrackee import create_app, db, limiter
 from fittrackee.application.models import AppConfig
 from fittrackee.application.utils import update_app_config_from_database
-from fittrackee.workouts.utils.gpx import weather_service
+from fittrackee.workouts.utils.gpx import chart_data_cache, weather_service
+from fittrackee.workouts.utils.maps import map_tiles_cache
+from fittrackee.workouts.utils.stats_cache import stats_cache
+from fittrackee.workouts.utils.weather.visual_crossing import weather_cache
 
 
 @pytest.fixture(autouse=True)
@@ -79,6 +82,10 @@ def get_app(
             # FATAL: remaining connection slots are reserved for
             # non-replication superuser connections
             db.engine.dispose()
+            chart_data_cache.clear()
+            map_tiles_cache.clear()
+            weather_cache.clear()
+            stats_cache.clear()
             # remove all temp files like gpx files
             shutil.rmtree(
                 current_app.config['UPLOAD_FOLDER'],
@@ -822,3 +822,9 @@ def gpx_file_storage(gpx_file: str) -> FileStorage:
     return FileStorage(
         filename=f'{uuid4().hex}.gpx', stream=BytesIO(str.encode(gpx_file))
     )
+
+
+@pytest.fixture()
+def process_upload_mock() -> Generator:
+    with patch('fittrackee.workouts.workouts.process_upload') as mock:
+        yield mock
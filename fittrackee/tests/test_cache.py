@@ -0,0 +1,314 @@
+import os
+import time
+from unittest.mock import Mock, patch
+
+import redis
+from flask import Flask
+
+from fittrackee.cache import (
+    Cache,
+    DiskCache,
+    LRUCache,
+    RedisCache,
+    UserResponsesCache,
+)
+
+
+class TestLRUCache:
+    def test_it_returns_none_when_value_is_not_cached(self) -> None:
+        cache = LRUCache('test', max_size=10)
+
+        assert cache.get('namespace', 'key') is None
+
+    def test_it_returns_cached_value(self) -> None:
+        cache = LRUCache('test', max_size=10)
+        cache.set('namespace', 'key', b'value')
+
+        assert cache.get('namespace', 'key') == b'value'
+
+    def test_it_evicts_least_recently_used_values_when_max_size_is_reached(
+        self,
+    ) -> None:
+        cache = LRUCache('test', max_size=10)
+        cache.set('namespace', 'key_1', b'aaaa')
+        cache.set('namespace', 'key_2', b'bbbb')
+        cache.get('namespace', 'key_1')
+
+        cache.set('namespace', 'key_3', b'cccc')
+
+        assert cache.get('namespace', 'key_1') == b'aaaa'
+        assert cache.get('namespace', 'key_2') is None
+        assert cache.get('namespace', 'key_3') == b'cccc'
+        assert cache.size == 8
+
+    def test_it_does_not_store_value_exceeding_max_size(self) -> None:
+        cache = LRUCache('test', max_size=4)
+
+        cache.set('namespace', 'key', b'value')
+
+        assert cache.get('namespace', 'key') is None
+        assert cache.size == 0
+
+    def test_it_deletes_all_namespace_values(self) -> None:
+        cache = LRUCache('test', max_size=100)
+        cache.set('namespace_1', 'key_1', b'value')
+        cache.set('namespace_1', 'key_2', b'value')
+        cache.set('namespace_2', 'key_1', b'value')
+
+        cache.delete('namespace_1')
+
+        assert cache.get('namespace_1', 'key_1') is None
+        assert cache.get('namespace_1', 'key_2') is None
+        assert cache.get('namespace_2', 'key_1') == b'value'
+        assert cache.size == 5
+
+    def test_it_returns_none_when_value_is_expired(self) -> None:
+        cache = LRUCache('test', max_size=100, ttl=60)
+        cache.set('namespace', 'key', b'value')
+
+        with patch('time.time', return_value=time.time() + 61):
+            assert cache.get('namespace', 'key') is None
+        assert cache.size == 0
+
+    def test_it_returns_value_when_not_expired(self) -> None:
+        cache = LRUCache('test', max_size=100, ttl=60)
+        cache.set('namespace', 'key', b'value')
+
+        with patch('time.time', return_value=time.time() + 59):
+            assert cache.get('namespace', 'key') == b'value'
+
+    def test_it_returns_stats(self) -> None:
+        cache = LRUCache('test', max_size=100)
+        cache.set('namespace', 'key', b'value')
+        cache.get('namespace', 'key')
+        cache.get('namespace', 'key')
+        cache.get('namespace', 'unknown')
+
+        assert cache.get_stats() == {
+            'backend': 'memory',
+            'hits': 2,
+            'misses': 1,
+            'entries': 1,
+            'size': 5,
+        }
+
+
+class TestRedisCache:
+    def test_it_returns_none_when_redis_is_not_available(self) -> None:
+        cache = RedisCache(
+            'test', redis.from_url('redis://localhost:1'), ttl=10
+        )
+
+        assert cache.get('namespace', 'key') is None
+
+    def test_it_does_not_raise_error_when_redis_is_not_available(
+        self,
+    ) -> None:
+        cache = RedisCache(
+            'test', redis.from_url('redis://localhost:1'), ttl=10
+        )
+
+        cache.set('namespace', 'key', b'value')
+        cache.delete('namespace')
+
+        assert cache.get_stats() == {
+            'backend': 'redis',
+            'hits': 0,
+            'misses': 0,
+        }
+
+    def test_it_stores_each_value_in_a_key_expiring_after_ttl(self) -> None:
+        client = Mock()
+        cache = RedisCache('test', client, ttl=10)
+
+        cache.set('namespace', 'key', b'value')
+
+        client.set.assert_called_once_with(
+            'fittrackee:test:values:namespace:key', b'value', ex=10
+        )
+
+    def test_it_deletes_all_namespace_keys(self) -> None:
+        client = Mock()
+        client.scan_iter.return_value = [
+            'fittrackee:test:values:https://a*b:key'
+        ]
+        cache = RedisCache('test', client, ttl=10)
+
+        cache.delete('https://a*b')
+
+        client.scan_iter.assert_called_once_with(
+            r'fittrackee:test:values:https://a\*b:*'
+        )
+        client.delete.assert_called_once_with(
+            'fittrackee:test:values:https://a*b:key'
+        )
+
+
+class TestDiskCache:
+    def test_it_returns_none_when_value_is_not_cached(
+        self, app: Flask
+    ) -> None:
+        cache = DiskCache('test', max_size=10, ttl=10)
+
+        assert cache.get('namespace', 'key') is None
+
+    def test_it_returns_cached_value(self, app: Flask) -> None:
+        cache = DiskCache('test', max_size=10, ttl=10)
+        cache.set('namespace', 'key', b'value')
+
+        assert cache.get('namespace', 'key') == b'value'
+
+    def test_it_stores_value_in_upload_folder(self, app: Flask) -> None:
+        cache = DiskCache('test', max_size=10, ttl=10)
+
+        cache.set('https://{s}.example.com/{z}/{x}/{y}.png', 'key', b'value')
+
+        assert cache.dir_path == os.path.join(
+            app.config['UPLOAD_FOLDER'], 'cache', 'test'
+        )
+        assert DiskCache('test', max_size=10, ttl=10).get(
+            'https://{s}.example.com/{z}/{x}/{y}.png', 'key'
+        ) == (b'value')
+
+    def test_it_does_not_return_expired_value(self, app: Flask) -> None:
+        cache = DiskCache('test', max_size=10, ttl=10)
+        cache.set('namespace', 'key', b'value')
+        file_path = cache._get_file_path('namespace', 'key')
+        os.utime(file_path, (time.time(), time.time() - 11))
+
+        assert cache.get('namespace', 'key') is None
+        assert not os.path.exists(file_path)
+
+    def test_it_evicts_least_recently_used_values_when_max_size_is_reached(
+        self, app: Flask
+    ) -> None:
+        cache = DiskCache('test', max_size=10, ttl=10)
+        cache.set('namespace', 'key_1', b'aaaa')
+        cache.set('namespace', 'key_2', b'bbbb')
+        now = time.time()
+        os.utime(cache._get_file_path('namespace', 'key_1'), (now - 2, now))
+        os.utime(cache._get_file_path('namespace', 'key_2'), (now - 3, now))
+        cache.get('namespace', 'key_1')
+
+        cache.set('namespace', 'key_3', b'cccc')
+
+        assert cache.get('namespace', 'key_1') == b'aaaa'
+        assert cache.get('namespace', 'key_2') is None
+        assert cache.get('namespace', 'key_3') == b'cccc'
+
+    def test_it_does_not_store_value_exceeding_max_size(
+        self, app: Flask
+    ) -> None:
+        cache = DiskCache('test', max_size=4, ttl=10)
+
+        cache.set('namespace', 'key', b'value')
+
+        assert cache.get('namespace', 'key') is None
+
+    def test_it_deletes_all_namespace_values(self, app: Flask) -> None:
+        cache = DiskCache('test', max_size=100, ttl=10)
+        cache.set('namespace_1', 'key_1', b'value')
+        cache.set('namespace_1', 'key_2', b'value')
+        cache.set('namespace_2', 'key_1', b'value')
+
+        cache.delete('namespace_1')
+
+        assert cache.get('namespace_1', 'key_1') is None
+        assert cache.get('namespace_1', 'key_2') is None
+        assert cache.get('namespace_2', 'key_1') == b'value'
+
+    def test_it_returns_stats(self, app: Flask) -> None:
+        cache = DiskCache('test', max_size=100, ttl=10)
+        cache.set('namespace', 'key', b'value')
+        cache.get('namespace', 'key')
+        cache.get('namespace', 'key')
+        cache.get('namespace', 'unknown')
+
+        assert cache.get_stats() == {
+            'backend': 'disk',
+            'hits': 2,
+            'misses': 1,
+            'entries': 1,
+            'size': 5,
+        }
+
+
+class TestCache:
+    def test_it_uses_in_memory_cache_when_limiter_is_disabled(self) -> None:
+        cache = Cache('test', max_size=100, ttl=10)
+
+        with patch('fittrackee.cache.limiter') as limiter_mock:
+            limiter_mock.enabled = False
+
+            assert cache.backend == cache.lru_cache
+
+    def test_it_uses_redis_cache_when_limiter_is_enabled(self) -> None:
+        cache = Cache('test', max_size=100, ttl=10)
+
+        with patch('fittrackee.cache.limiter') as limiter_mock:
+            limiter_mock.enabled = True
+
+            assert cache.backend == cache.redis_cache
+
+
+class TestUserResponsesCache:
+    def test_it_does_not_cache_responses_when_limiter_is_disabled(
+        self,
+    ) -> None:
+        cache = UserResponsesCache('test', ttl=10)
+
+        with patch('fittrackee.cache.limiter') as limiter_mock, patch(
+            'fittrackee.cache.r'
+        ) as redis_mock:
+            limiter_mock.enabled = False
+            namespace = cache.get_namespace(1)
+            cache.set(namespace, 'key', b'value')
+            cache.invalidate(1)
+
+            assert namespace is None
+            assert cache.get(namespace, 'key') is None
+            redis_mock.get.assert_not_called()
+            redis_mock.incr.assert_not_called()
+
+    def test_it_returns_namespace_with_user_generation(self) -> None:
+        cache = UserResponsesCache('test', ttl=10)
+
+        with patch('fittrackee.cache.limiter') as limiter_mock, patch(
+            'fittrackee.cache.r', Mock(get=Mock(return_value=b'3'))
+        ) as redis_mock:
+            limiter_mock.enabled = True
+
+            assert cache.get_namespace(1) == '1:3'
+            redis_mock.get.assert_called_once_with(
+                'fittrackee:test:generations:1'
+            )
+
+    def test_it_increments_user_generation_on_invalidation(self) -> None:
+        cache = UserResponsesCache('test', ttl=10)
+
+        with patch('fittrackee.cache.limiter') as limiter_mock, patch(
+            'fittrackee.cache.r'
+        ) as redis_mock:
+            limiter_mock.enabled = True
+            cache.invalidate(1)
+
+        redis_mock.incr.assert_called_once_with(
+            'fittrackee:test:generations:1'
+        )
+
+    def test_it_does_not_raise_error_when_redis_is_not_available(
+        self,
+    ) -> None:
+        cache = UserResponsesCache('test', ttl=10)
+        cache.redis_cache.client = redis.from_url('redis://localhost:1')
+
+        with patch('fittrackee.cache.limiter') as limiter_mock, patch(
+            'fittrackee.cache.r', cache.redis_cache.client
+        ):
+            limiter_mock.enabled = True
+            namespace = cache.get_namespace(1)
+            cache.set('1:0', 'key', b'value')
+            cache.invalidate(1)
+
+            assert namespace is None
+            assert cache.get('1:0', 'key') is None
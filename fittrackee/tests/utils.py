@@ -1,5 +1,6 @@
 import random
 import string
+from datetime import datetime, timedelta
 from json import loads
 from typing import Dict, Optional
 from uuid import uuid4
@@ -53,3 +54,55 @@ TEST_OAUTH_CLIENT_METADATA = {
     'redirect_uris': [random_domain()],
     'scope': 'profile:read workouts:read',
 }
+
+
+def generate_gpx(
+    seed: int,
+    tracks_count: int = 1,
+    segments_count: int = 1,
+    points_count: int = 300,
+    missing_elevation_ratio: float = 0.0,
+    zero_elevation_ratio: float = 0.0,
+    missing_time_ratio: float = 0.0,
+    distant_points_ratio: float = 0.0,
+) -> str:
+    generator = random.Random(seed)
+    time = datetime(2023, 4, 1, 8, 0, 0)
+    latitude, longitude, elevation = 44.68, 6.07, 998.0
+    tracks = ''
+    for track_idx in range(tracks_count):
+        segments = ''
+        for _ in range(segments_count):
+            points = ''
+            for _ in range(points_count):
+                time += timedelta(seconds=generator.choice([0, 1, 1, 2, 5]))
+                if generator.random() < distant_points_ratio:
+                    latitude += 0.3
+                elif generator.random() > 0.1:  # otherwise, no move
+                    latitude += generator.uniform(-0.0001, 0.0002)
+                    longitude += generator.uniform(-0.0001, 0.0002)
+                elevation += generator.uniform(-2, 2)
+                point_elevation = (
+                    ''
+                    if generator.random() < missing_elevation_ratio
+                    else '<ele>0</ele>'
+                    if generator.random() < zero_elevation_ratio
+                    else f'<ele>{elevation:.1f}</ele>'
+                )
+                point_time = (
+                    ''
+                    if generator.random() < missing_time_ratio
+                    else f'<time>{time.isoformat()}Z</time>'
+                )
+                points += (
+                    f'<trkpt lat="{latitude:.6f}" lon="{longitude:.6f}">'
+                    f'{point_elevation}{point_time}</trkpt>'
+                )
+            segments += f'<trkseg>{points}</trkseg>'
+            time += timedelta(minutes=2)
+        tracks += f'<trk><name>track {track_idx}</name>{segments}</trk>'
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">'
+        f'{tracks}</gpx>'
+    )
@@ -0,0 +1,246 @@
+import datetime
+from typing import List
+from unittest.mock import patch
+
+from flask import Flask
+
+from fittrackee import db
+from fittrackee.users.models import User
+from fittrackee.workouts.models import (
+    Sport,
+    UserSportDailyStats,
+    Workout,
+    deferred_records_update,
+    update_daily_stats,
+)
+from fittrackee.workouts.utils.workouts import rebuild_daily_stats
+
+
+def get_daily_stats() -> List:
+    return [
+        (
+            daily_stats.user_id,
+            daily_stats.sport_id,
+            str(daily_stats.date),
+            daily_stats.nb_workouts,
+            float(daily_stats.total_distance),
+            daily_stats.total_duration,
+            float(daily_stats.total_average_speed),
+        )
+        for daily_stats in UserSportDailyStats.query.order_by(
+            UserSportDailyStats.user_id,
+            UserSportDailyStats.sport_id,
+            UserSportDailyStats.date,
+        ).all()
+    ]
+
+
+def get_workout(workout_date: str, distance: float) -> Workout:
+    workout = Workout(
+        user_id=1,
+        sport_id=1,
+        workout_date=datetime.datetime.strptime(
+            workout_date, '%d/%m/%Y %H:%M'
+        ),
+        distance=distance,
+        duration=datetime.timedelta(seconds=3600),
+    )
+    workout.moving = workout.duration
+    workout.ave_speed = distance
+    workout.max_speed = distance
+    return workout
+
+
+def add_workout(workout_date: str, distance: float) -> Workout:
+    workout = get_workout(workout_date, distance)
+    db.session.add(workout)
+    db.session.commit()
+    return workout
+
+
+class TestUserSportDailyStats:
+    def test_it_adds_workout_to_daily_stats_on_insertion(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        add_workout('01/01/2018 18:00', distance=5)
+        add_workout('02/01/2018 18:00', distance=8)
+
+        assert get_daily_stats() == [
+            (1, 1, '2018-01-01', 2, 15.0, 7200, 15.0),
+            (1, 1, '2018-01-02', 1, 8.0, 3600, 8.0),
+        ]
+
+    def test_it_updates_daily_stats_on_workout_update(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = add_workout('01/01/2018 18:00', distance=5)
+
+        workout.distance = 7
+        db.session.commit()
+
+        assert get_daily_stats() == [
+            (1, 1, '2018-01-01', 2, 17.0, 7200, 15.0),
+        ]
+
+    def test_it_updates_previous_daily_stats_when_date_and_sport_change(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = add_workout('01/01/2018 18:00', distance=5)
+        db.session.expire(workout)
+
+        workout.workout_date = datetime.datetime(2018, 1, 3, 10, 0)
+        workout.sport_id = sport_2_running.id
+        db.session.commit()
+
+        assert get_daily_stats() == [
+            (1, 1, '2018-01-01', 1, 10.0, 3600, 10.0),
+            (1, 2, '2018-01-03', 1, 5.0, 3600, 5.0),
+        ]
+
+    def test_it_removes_workout_from_daily_stats_on_deletion(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = add_workout('02/01/2018 18:00', distance=5)
+
+        db.session.delete(workout)
+        db.session.commit()
+
+        assert get_daily_stats() == [
+            (1, 1, '2018-01-01', 1, 10.0, 3600, 10.0),
+        ]
+
+    def test_it_stores_daily_stats_by_date_in_user_timezone(
+        self,
+        app: Flask,
+        user_1_paris: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        add_workout('01/01/2018 22:30', distance=5)  # 2018-01-01 in Paris
+        add_workout('01/01/2018 23:30', distance=8)  # 2018-01-02 in Paris
+
+        assert get_daily_stats() == [
+            (1, 1, '2018-01-01', 1, 5.0, 3600, 5.0),
+            (1, 1, '2018-01-02', 1, 8.0, 3600, 8.0),
+        ]
+
+    def test_it_updates_daily_stats_when_workout_moves_to_another_day(
+        self,
+        app: Flask,
+        user_1_paris: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        workout = add_workout('01/01/2018 22:30', distance=5)
+
+        workout.workout_date = datetime.datetime(2018, 1, 1, 23, 30)
+        db.session.commit()
+
+        assert get_daily_stats() == [
+            (1, 1, '2018-01-02', 1, 5.0, 3600, 5.0),
+        ]
+
+    def test_it_recomputes_daily_stats_when_user_timezone_changes(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        add_workout('02/01/2018 18:00', distance=8)
+
+        user_1.timezone = 'America/New_York'
+        db.session.commit()
+
+        assert get_daily_stats() == [
+            (1, 1, '2017-12-31', 1, 10.0, 3600, 10.0),
+            (1, 1, '2018-01-02', 1, 8.0, 3600, 8.0),
+        ]
+
+    def test_it_updates_daily_stats_once_per_day_when_update_is_deferred(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        with patch(
+            'fittrackee.workouts.models.update_daily_stats',
+            wraps=update_daily_stats,
+        ) as update_daily_stats_mock:
+            with deferred_records_update(db.session):
+                db.session.add_all(
+                    [
+                        get_workout('01/01/2018 18:00', distance=5),
+                        get_workout('01/01/2018 20:00', distance=6),
+                        get_workout('02/01/2018 18:00', distance=8),
+                    ]
+                )
+                db.session.flush()
+                update_daily_stats_mock.assert_not_called()
+            db.session.commit()
+
+        assert update_daily_stats_mock.call_count == 2
+        assert get_daily_stats() == [
+            (1, 1, '2018-01-01', 3, 21.0, 10800, 21.0),
+            (1, 1, '2018-01-02', 1, 8.0, 3600, 8.0),
+        ]
+
+
+class TestRebuildDailyStats:
+    def test_it_recomputes_daily_stats_of_all_users(
+        self,
+        app: Flask,
+        user_1: User,
+        user_2: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+        workout_running_user_1: Workout,
+        workout_cycling_user_2: Workout,
+    ) -> None:
+        expected_daily_stats = get_daily_stats()
+        UserSportDailyStats.query.filter_by(sport_id=1).delete()
+        UserSportDailyStats.query.filter_by(sport_id=2).update(
+            {'nb_workouts': 10}
+        )
+        db.session.commit()
+        users: List[int] = []
+
+        users_count = rebuild_daily_stats(on_user_end=users.append)
+
+        assert users_count == 2
+        assert users == [user_1.id, user_2.id]
+        assert get_daily_stats() == expected_daily_stats
+        assert len(expected_daily_stats) == 3
+
+    def test_it_recomputes_daily_stats_by_date_in_user_timezone(
+        self,
+        app: Flask,
+        user_1_paris: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        add_workout('01/01/2018 23:30', distance=5)
+        UserSportDailyStats.query.delete()
+        db.session.commit()
+
+        rebuild_daily_stats()
+
+        assert get_daily_stats() == [
+            (1, 1, '2018-01-02', 1, 5.0, 3600, 5.0),
+        ]
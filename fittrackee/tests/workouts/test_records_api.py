@@ -1,4 +1,5 @@
 import json
+from unittest.mock import Mock, patch
 
 import pytest
 from flask import Flask
@@ -935,3 +936,59 @@ class TestGetRecords(ApiTestCaseMixin):
         )
 
         self.assert_response_scope(response, can_access)
+
+
+class TestGetRecordsCache(ApiTestCaseMixin):
+    def test_it_returns_cached_response(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        cached_response = {'status': 'success', 'data': {'records': []}}
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        with patch(
+            'fittrackee.workouts.records.get_cached_response',
+            return_value=cached_response,
+        ):
+            response = client.get(
+                '/api/records',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        assert response.status_code == 200
+        assert json.loads(response.data.decode()) == cached_response
+
+    def test_it_caches_response_for_user_generation(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        with patch(
+            'fittrackee.workouts.records.stats_cache',
+            Mock(get_namespace=Mock(return_value='1:0')),
+        ), patch(
+            'fittrackee.workouts.records.get_cached_response',
+            return_value=None,
+        ), patch(
+            'fittrackee.workouts.records.cache_response'
+        ) as cache_response_mock:
+            response = client.get(
+                '/api/records',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        data = json.loads(response.data.decode())
+        cache_response_mock.assert_called_once()
+        namespace, key, cached_response = cache_response_mock.call_args[0]
+        assert namespace == '1:0'
+        assert key == 'records::None'
+        assert len(cached_response['data']['records']) == len(
+            data['data']['records']
+        )
@@ -1,7 +1,10 @@
 import datetime
+from typing import Dict
+from unittest.mock import patch
 
 from flask import Flask
 
+from fittrackee import db
 from fittrackee.users.models import User
 from fittrackee.workouts.models import Record, Sport, Workout
 
@@ -167,3 +170,214 @@ class TestRecordModel:
         record_serialize = record_ms.serialize()
         assert record_serialize.get('value') == 10.0
         assert isinstance(record_serialize.get('value'), float)
+
+
+class TestRecordsUpdate:
+    @staticmethod
+    def get_workout(
+        workout_date: str, distance: float, seconds: int = 3600
+    ) -> Workout:
+        workout = Workout(
+            user_id=1,
+            sport_id=1,
+            workout_date=datetime.datetime.strptime(workout_date, '%d/%m/%Y'),
+            distance=distance,
+            duration=datetime.timedelta(seconds=seconds),
+        )
+        workout.ave_speed = distance / (seconds / 3600)
+        workout.max_speed = workout.ave_speed
+        workout.moving = workout.duration
+        return workout
+
+    @staticmethod
+    def add_workout(
+        workout_date: str, distance: float, seconds: int = 3600
+    ) -> Workout:
+        workout = TestRecordsUpdate.get_workout(
+            workout_date, distance, seconds
+        )
+        db.session.add(workout)
+        db.session.commit()
+        return workout
+
+    @staticmethod
+    def get_records() -> Dict:
+        return {
+            record.record_type: (record.workout_id, record._value)
+            for record in Record.query.filter_by(user_id=1, sport_id=1).all()
+        }
+
+    def test_it_does_not_recompute_records_on_workout_insertion(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        with patch('fittrackee.workouts.models.update_records') as mock:
+            self.add_workout('02/01/2018', distance=5)
+
+        mock.assert_not_called()
+        assert self.get_records() == {
+            'AS': (workout_cycling_user_1.id, 1000),
+            'FD': (workout_cycling_user_1.id, 10000),
+            'LD': (workout_cycling_user_1.id, 3600),
+            'MS': (workout_cycling_user_1.id, 1000),
+        }
+
+    def test_it_updates_records_beaten_by_new_workout(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = self.add_workout(
+            '02/01/2018', distance=12.3456, seconds=7200
+        )
+
+        assert self.get_records() == {
+            'AS': (workout_cycling_user_1.id, 1000),
+            'FD': (workout.id, 12346),
+            'LD': (workout.id, 7200),
+            'MS': (workout_cycling_user_1.id, 1000),
+        }
+
+    def test_it_keeps_earliest_workout_when_values_are_equal(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        self.add_workout('02/01/2018', distance=10)
+        earlier_workout = self.add_workout('31/12/2017', distance=10)
+
+        assert self.get_records() == {
+            'AS': (earlier_workout.id, 1000),
+            'FD': (earlier_workout.id, 10000),
+            'LD': (earlier_workout.id, 3600),
+            'MS': (earlier_workout.id, 1000),
+        }
+
+    def test_it_updates_records_when_record_value_increases(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        self.add_workout('02/01/2018', distance=5)
+
+        with patch('fittrackee.workouts.models.update_records') as mock:
+            workout_cycling_user_1.distance = 15
+            db.session.commit()
+
+        mock.assert_not_called()
+        assert self.get_records()['FD'] == (workout_cycling_user_1.id, 15000)
+
+    def test_it_recomputes_records_when_record_value_decreases(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = self.add_workout('02/01/2018', distance=8)
+
+        workout_cycling_user_1.distance = 5
+        db.session.commit()
+
+        assert self.get_records()['FD'] == (workout.id, 8000)
+
+    def test_it_creates_records_once_when_workouts_are_added_together(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        workout_1 = self.get_workout('01/01/2018', distance=10)
+        workout_2 = self.get_workout('02/01/2018', distance=12, seconds=7200)
+        db.session.add_all([workout_1, workout_2])
+        db.session.commit()
+
+        assert Record.query.count() == 4
+        assert self.get_records() == {
+            'AS': (workout_1.id, 1000),
+            'FD': (workout_2.id, 12000),
+            'LD': (workout_2.id, 7200),
+            'MS': (workout_1.id, 1000),
+        }
+
+
+class TestGetUserSportsWorkoutRecords:
+    def test_it_returns_records_workouts_for_all_user_sports(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+        workout_running_user_1: Workout,
+    ) -> None:
+        sports_records = Workout.get_user_sports_workout_records(user_1.id)
+
+        assert {
+            sport_id: {
+                record_type: (
+                    record_data['workout'].id
+                    if record_data['workout']
+                    else None
+                )
+                for record_type, record_data in records.items()
+            }
+            for sport_id, records in sports_records.items()
+        } == {
+            sport_1_cycling.id: {
+                'AS': workout_cycling_user_1.id,
+                'FD': workout_cycling_user_1.id,
+                'HA': None,
+                'LD': workout_cycling_user_1.id,
+                'MS': workout_cycling_user_1.id,
+            },
+            sport_2_running.id: {
+                'AS': workout_running_user_1.id,
+                'FD': workout_running_user_1.id,
+                'HA': None,
+                'LD': workout_running_user_1.id,
+                'MS': workout_running_user_1.id,
+            },
+        }
+
+    def test_it_returns_earliest_workout_when_values_are_equal(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        TestRecordsUpdate.add_workout('31/12/2017', distance=10)
+        TestRecordsUpdate.add_workout('02/01/2018', distance=10)
+        earliest_workout = Workout.query.order_by(Workout.workout_date).first()
+
+        records = Workout.get_user_workout_records(
+            user_1.id, sport_1_cycling.id
+        )
+
+        assert records['FD']['workout'].id == earliest_workout.id
+        assert records['FD']['record_value'] == 10
+
+    def test_it_returns_empty_records_when_sport_has_no_workouts(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        records = Workout.get_user_workout_records(
+            user_1.id, sport_1_cycling.id
+        )
+
+        assert records == {
+            record_type: {'record_value': None, 'workout': None}
+            for record_type in ['AS', 'FD', 'HA', 'LD', 'MS']
+        }
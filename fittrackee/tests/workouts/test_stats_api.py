@@ -1,8 +1,11 @@
 import json
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
 
 import pytest
 from flask import Flask
 
+from fittrackee import db
 from fittrackee.users.models import User
 from fittrackee.workouts.models import Sport, Workout
 
@@ -232,6 +235,56 @@ class TestGetStatsByTime(ApiTestCaseMixin):
             }
         }
 
+    def test_it_gets_stats_for_partial_days_with_paris_timezone(
+        self,
+        app: Flask,
+        user_1_paris: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        for workout_date, distance in [
+            (datetime(2018, 3, 31, 21, 0), 2),  # 2018-03-31 in Paris
+            (datetime(2018, 3, 31, 23, 0), 1),  # 2018-04-01 in Paris
+            (datetime(2018, 4, 15, 10, 0), 16),
+            (datetime(2018, 4, 30, 21, 0), 4),  # 2018-04-30 in Paris
+            (datetime(2018, 4, 30, 22, 30), 8),  # 2018-05-01 in Paris
+        ]:
+            workout = Workout(
+                user_id=user_1_paris.id,
+                sport_id=sport_1_cycling.id,
+                workout_date=workout_date,
+                distance=distance,
+                duration=timedelta(seconds=3600),
+            )
+            workout.moving = workout.duration
+            workout.ave_speed = distance
+            workout.max_speed = distance
+            db.session.add(workout)
+        db.session.commit()
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1_paris.email
+        )
+
+        response = client.get(
+            f'/api/stats/{user_1_paris.username}/by_time?'
+            f'from=2018-04-01&to=2018-04-30',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert data['data']['statistics'] == {
+            '2018': {
+                '1': {
+                    'average_speed': 7.0,
+                    'nb_workouts': 3,
+                    'total_ascent': 0.0,
+                    'total_descent': 0.0,
+                    'total_distance': 21.0,
+                    'total_duration': 10800,
+                },
+            }
+        }
+
     def test_it_gets_stats_by_year(
         self,
         app: Flask,
@@ -492,7 +545,7 @@ class TestGetStatsByTime(ApiTestCaseMixin):
                     'total_duration': 1024,
                 }
             },
-            '2017-06': {
+            '2017-05': {
                 '1': {
                     'average_speed': 10.42,
                     'nb_workouts': 1,
@@ -502,7 +555,7 @@ class TestGetStatsByTime(ApiTestCaseMixin):
                     'total_duration': 3456,
                 }
             },
-            '2018-01': {
+            '2017-12': {
                 '1': {
                     'average_speed': 35.16,
                     'nb_workouts': 1,
@@ -522,7 +575,7 @@ class TestGetStatsByTime(ApiTestCaseMixin):
                     'total_duration': 1600,
                 }
             },
-            '2018-04': {
+            '2018-03': {
                 '1': {
                     'average_speed': 4.8,
                     'nb_workouts': 1,
@@ -552,6 +605,52 @@ class TestGetStatsByTime(ApiTestCaseMixin):
             },
         }
 
+    def test_it_gets_stats_by_time_periods_in_user_timezone(
+        self,
+        app: Flask,
+        user_1_full: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        for workout_date, distance in [
+            (datetime(2018, 4, 1, 2, 0), 2),  # 2018-03-31 in New York
+            (datetime(2018, 4, 1, 6, 0), 4),  # 2018-04-01 in New York
+        ]:
+            workout = Workout(
+                user_id=user_1_full.id,
+                sport_id=sport_1_cycling.id,
+                workout_date=workout_date,
+                distance=distance,
+                duration=timedelta(seconds=3600),
+            )
+            workout.moving = workout.duration
+            workout.ave_speed = distance
+            workout.max_speed = distance
+            db.session.add(workout)
+        db.session.commit()
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1_full.email
+        )
+        statistics = {}
+
+        for time in ['week', 'weekm', 'month']:
+            response = client.get(
+                f'/api/stats/{user_1_full.username}/by_time?time={time}',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+            assert response.status_code == 200
+            statistics[time] = {
+                time_period: sports_statistics['1']['total_distance']
+                for time_period, sports_statistics in json.loads(
+                    response.data.decode()
+                )['data']['statistics'].items()
+            }
+
+        assert statistics == {
+            'week': {'2018-03-25': 2.0, '2018-04-01': 4.0},
+            'weekm': {'2018-03-26': 6.0},
+            'month': {'2018-03': 2.0, '2018-04': 4.0},
+        }
+
     def test_it_gets_stats_by_month_for_april_2018(
         self,
         app: Flask,
@@ -656,7 +755,7 @@ class TestGetStatsByTime(ApiTestCaseMixin):
                     'total_duration': 1600,
                 }
             },
-            '2018-04-01': {
+            '2018-03-25': {
                 '1': {
                     'average_speed': 4.8,
                     'nb_workouts': 1,
@@ -899,6 +998,82 @@ class TestGetStatsByTime(ApiTestCaseMixin):
         self.assert_response_scope(response, can_access)
 
 
+class TestGetStatsCache(ApiTestCaseMixin):
+    def test_it_returns_cached_response(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        cached_response = {
+            'status': 'success',
+            'data': {'statistics': {'2018': {}}},
+        }
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        with patch(
+            'fittrackee.workouts.stats.get_cached_response',
+            return_value=cached_response,
+        ):
+            response = client.get(
+                f'/api/stats/{user_1.username}/by_time',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        assert response.status_code == 200
+        assert json.loads(response.data.decode()) == cached_response
+
+    def test_it_caches_response_for_user_generation(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        with patch(
+            'fittrackee.workouts.stats.stats_cache',
+            Mock(get_namespace=Mock(return_value='1:0')),
+        ), patch(
+            'fittrackee.workouts.stats.get_cached_response',
+            return_value=None,
+        ), patch(
+            'fittrackee.workouts.stats.cache_response'
+        ) as cache_response_mock:
+            response = client.get(
+                f'/api/stats/{user_1.username}/by_time?to=2018-12-31'
+                '&time=month&from=2018-01-01&unused=arg',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        data = json.loads(response.data.decode())
+        cache_response_mock.assert_called_once()
+        namespace, key, cached_response = cache_response_mock.call_args[0]
+        assert namespace == '1:0'
+        assert key == 'by_time:from=2018-01-01&time=month&to=2018-12-31:None'
+        assert json.loads(json.dumps(cached_response)) == data
+
+    def test_it_does_not_cache_error_response(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        with patch(
+            'fittrackee.workouts.stats.cache_response'
+        ) as cache_response_mock:
+            client.get(
+                f'/api/stats/{user_1.username}/by_time'
+                '?from=2018-04-01&to=2018-04-30&time=day',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        cache_response_mock.assert_not_called()
+
+
 class TestGetStatsBySport(ApiTestCaseMixin):
     def test_it_returns_error_if_user_is_not_authenticated(
         self, app: Flask, user_1: User
@@ -983,6 +1158,47 @@ class TestGetStatsBySport(ApiTestCaseMixin):
             }
         }
 
+    def test_it_gets_stats_for_workouts_longer_than_one_day(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout = Workout(
+            user_id=user_1.id,
+            sport_id=sport_1_cycling.id,
+            workout_date=datetime(2018, 1, 2),
+            distance=500,
+            duration=timedelta(days=1, hours=1),
+        )
+        workout.moving = workout.duration
+        workout.ave_speed = 20
+        workout.max_speed = 30
+        db.session.add(workout)
+        db.session.commit()
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        response = client.get(
+            f'/api/stats/{user_1.username}/by_sport',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert data['data']['statistics'] == {
+            '1': {
+                'average_speed': 15.0,
+                'nb_workouts': 2,
+                'total_ascent': 0.0,
+                'total_descent': 0.0,
+                'total_distance': 510.0,
+                'total_duration': 93600,
+            }
+        }
+
     def test_it_returns_errors_if_user_does_not_exist(
         self,
         app: Flask,
@@ -1138,6 +1354,20 @@ class TestGetAllStats(ApiTestCaseMixin):
         assert data['data']['sports'] == 2
         assert data['data']['users'] == 3
         assert 'uploads_dir_size' in data['data']
+        assert data['data']['chart_data_cache'] == {
+            'backend': 'memory',
+            'hits': 0,
+            'misses': 0,
+            'entries': 0,
+            'size': 0,
+        }
+        assert data['data']['map_tiles_cache'] == {
+            'backend': 'disk',
+            'hits': 0,
+            'misses': 0,
+            'entries': 0,
+            'size': 0,
+        }
 
     def test_it_returns_error_if_user_has_no_admin_rights(
         self,
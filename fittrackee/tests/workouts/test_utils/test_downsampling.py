@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from fittrackee.workouts.utils.downsampling import (
+    get_douglas_peucker_indices,
+    get_lttb_indices,
+)
+
+
+class TestGetLttbIndices:
+    @pytest.mark.parametrize('input_max_points', [0, 2, 10, 20])
+    def test_it_returns_all_indices_when_max_points_is_not_lower_than_points_count_or_invalid(  # noqa
+        self, input_max_points: int
+    ) -> None:
+        x_values = np.arange(10, dtype=np.float64)
+
+        indices = get_lttb_indices(x_values, [x_values], input_max_points)
+
+        assert indices.tolist() == list(range(10))
+
+    @pytest.mark.parametrize('input_max_points', [3, 10, 100, 999])
+    def test_it_returns_max_points_indices_including_first_and_last_points(
+        self, input_max_points: int
+    ) -> None:
+        rng = np.random.default_rng(0)
+        x_values = np.cumsum(rng.random(1000))
+
+        indices = get_lttb_indices(
+            x_values, [rng.random(1000), rng.random(1000)], input_max_points
+        )
+
+        assert indices.size == input_max_points
+        assert indices[0] == 0
+        assert indices[-1] == 999
+        assert (np.diff(indices) > 0).all()
+
+    def test_it_keeps_peaks(self) -> None:
+        x_values = np.arange(101, dtype=np.float64)
+        y_values = np.zeros(101)
+        y_values[25] = 10
+        y_values[75] = -10
+
+        indices = get_lttb_indices(x_values, [y_values], 5)
+
+        assert 25 in indices
+        assert 75 in indices
+
+    def test_it_selects_points_from_all_series(self) -> None:
+        x_values = np.arange(101, dtype=np.float64)
+        elevations = np.zeros(101)
+        elevations[25] = 100
+        speeds = np.zeros(101)
+        speeds[75] = 1
+
+        indices = get_lttb_indices(x_values, [elevations, speeds], 5)
+
+        assert 25 in indices
+        assert 75 in indices
+
+    def test_it_handles_missing_values(self) -> None:
+        x_values = np.arange(101, dtype=np.float64)
+        y_values = np.full(101, np.nan)
+        y_values[50] = 10
+
+        indices = get_lttb_indices(x_values, [y_values], 3)
+
+        assert indices.tolist() == [0, 50, 100]
+
+
+class TestGetDouglasPeuckerIndices:
+    @pytest.mark.parametrize('input_points_count', [0, 1, 2])
+    def test_it_returns_all_indices_when_less_than_3_points(
+        self, input_points_count: int
+    ) -> None:
+        values = np.arange(input_points_count, dtype=np.float64)
+
+        indices = get_douglas_peucker_indices(values, values, 1)
+
+        assert indices.tolist() == list(range(input_points_count))
+
+    def test_it_returns_all_indices_when_tolerance_is_0(self) -> None:
+        x_values = np.arange(10, dtype=np.float64)
+
+        indices = get_douglas_peucker_indices(x_values, np.zeros(10), 0)
+
+        assert indices.tolist() == list(range(10))
+
+    def test_it_removes_aligned_points(self) -> None:
+        x_values = np.arange(10, dtype=np.float64)
+
+        indices = get_douglas_peucker_indices(x_values, x_values * 2, 0.1)
+
+        assert indices.tolist() == [0, 9]
+
+    def test_it_keeps_points_farther_than_tolerance(self) -> None:
+        x_values = np.array([0, 1, 2, 10, 18, 19, 20], dtype=np.float64)
+        y_values = np.array([0, 0.5, 0, 5, 0, -0.5, 0], dtype=np.float64)
+
+        indices = get_douglas_peucker_indices(x_values, y_values, 1)
+
+        assert indices.tolist() == [0, 3, 6]
+
+    def test_it_handles_closed_track(self) -> None:
+        x_values = np.array([0, 5, 5, 0, 0], dtype=np.float64)
+        y_values = np.array([0, 0, 5, 5, 0], dtype=np.float64)
+
+        indices = get_douglas_peucker_indices(x_values, y_values, 1)
+
+        assert indices.tolist() == [0, 1, 2, 3, 4]
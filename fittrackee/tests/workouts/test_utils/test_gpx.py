@@ -1,27 +1,20 @@
 from datetime import timedelta
-from unittest.mock import call, patch
+from io import BytesIO
+from unittest.mock import ANY, patch
 
 import pytest
 from flask import Flask
-from gpxpy.gpx import IGNORE_TOP_SPEED_PERCENTILES, MovingData
 from werkzeug.datastructures import FileStorage
 
 from fittrackee.tests.utils import random_string
 from fittrackee.users.models import User, UserSportPreference
 from fittrackee.workouts.models import Sport
+from fittrackee.workouts.utils.gpx_metrics import get_segment_metrics
 from fittrackee.workouts.utils.workouts import get_gpx_info, process_files
 
 folders = {
-    'extract_dir': '/tmp/fitTrackee/uploads',
     'tmp_dir': '/tmp/fitTrackee/uploads/tmp',
 }
-moving_data = MovingData(
-    moving_time=1,
-    stopped_time=1,
-    moving_distance=1,
-    stopped_distance=1,
-    max_speed=1,
-)
 
 
 class TestStoppedSpeedThreshold:
@@ -29,7 +22,7 @@ class TestStoppedSpeedThreshold:
         'sport_id, expected_threshold',
         [(1, 1.0), (2, 0.1)],
     )
-    def test_it_calls_get_moving_data_with_threshold_depending_on_sport(
+    def test_it_calculates_moving_data_with_threshold_depending_on_sport(
         self,
         app: Flask,
         user_1: User,
@@ -43,9 +36,9 @@ class TestStoppedSpeedThreshold:
             'fittrackee.workouts.utils.workouts.get_new_file_path',
             return_value='/tmp/fitTrackee/uploads/test.png',
         ), patch(
-            'gpxpy.gpx.GPXTrackSegment.get_moving_data',
-            return_value=moving_data,
-        ) as gpx_track_segment_mock:
+            'fittrackee.workouts.utils.gpx.get_segment_metrics',
+            wraps=get_segment_metrics,
+        ) as get_segment_metrics_mock:
             process_files(
                 auth_user=user_1,
                 folders=folders,
@@ -53,17 +46,11 @@ class TestStoppedSpeedThreshold:
                 workout_file=gpx_file_storage,
             )
 
-        assert gpx_track_segment_mock.call_args_list[0] == call(
-            stopped_speed_threshold=expected_threshold
-        )
-        gpx_track_segment_mock.assert_called_with(
-            expected_threshold,  # stopped_speed_threshold
-            False,  # raw
-            IGNORE_TOP_SPEED_PERCENTILES,  # speed_extreemes_percentiles
-            True,  # ignore_nonstandard_distances
+        get_segment_metrics_mock.assert_called_once_with(
+            ANY, stopped_speed_threshold=expected_threshold
         )
 
-    def test_it_calls_get_moving_data_with_threshold_depending_from_user_preference(  # noqa
+    def test_it_calculates_moving_data_with_threshold_depending_from_user_preference(  # noqa
         self,
         app: Flask,
         user_1: User,
@@ -77,9 +64,9 @@ class TestStoppedSpeedThreshold:
             'fittrackee.workouts.utils.workouts.get_new_file_path',
             return_value='/tmp/fitTrackee/uploads/test.png',
         ), patch(
-            'gpxpy.gpx.GPXTrackSegment.get_moving_data',
-            return_value=moving_data,
-        ) as gpx_track_segment_mock:
+            'fittrackee.workouts.utils.gpx.get_segment_metrics',
+            wraps=get_segment_metrics,
+        ) as get_segment_metrics_mock:
             process_files(
                 auth_user=user_1,
                 folders=folders,
@@ -87,14 +74,8 @@ class TestStoppedSpeedThreshold:
                 workout_file=gpx_file_storage,
             )
 
-        assert gpx_track_segment_mock.call_args_list[0] == call(
-            stopped_speed_threshold=expected_threshold
-        )
-        gpx_track_segment_mock.assert_called_with(
-            expected_threshold,  # stopped_speed_threshold
-            False,  # raw
-            IGNORE_TOP_SPEED_PERCENTILES,  # speed_extreemes_percentiles
-            True,  # ignore_nonstandard_distances
+        get_segment_metrics_mock.assert_called_once_with(
+            ANY, stopped_speed_threshold=expected_threshold
         )
 
 
@@ -106,7 +87,9 @@ class TestGetGpxInfoStopTime:
         stopped_speed_threshold to 0 to avoid calculated stopped time
         in segments
         """
-        with patch('builtins.open', return_value=gpx_file):
+        with patch(
+            'builtins.open', return_value=BytesIO(str.encode(gpx_file))
+        ):
             gpx_data, _, _ = get_gpx_info(
                 gpx_file=random_string(), stopped_speed_threshold=0.0
             )
@@ -120,7 +103,10 @@ class TestGetGpxInfoStopTime:
         stopped_speed_threshold to 0 to avoid calculated stopped time
         in segments
         """
-        with patch('builtins.open', return_value=gpx_file_with_3_segments):
+        with patch(
+            'builtins.open',
+            return_value=BytesIO(str.encode(gpx_file_with_3_segments)),
+        ):
             gpx_data, _, _ = get_gpx_info(
                 gpx_file=random_string(), stopped_speed_threshold=0.0
             )
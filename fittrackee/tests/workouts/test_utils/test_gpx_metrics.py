@@ -0,0 +1,172 @@
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Union
+
+import gpxpy
+import pytest
+
+from fittrackee.tests.utils import generate_gpx
+from fittrackee.workouts.utils.gpx_metrics import (
+    GpxMetrics,
+    SegmentPoints,
+    get_gpx_metrics,
+    get_segment_metrics,
+)
+from fittrackee.workouts.utils.gpx_parser import GpxStreamParser
+
+
+def get_tracks_metrics(
+    gpx_content: str, stopped_speed_threshold: float
+) -> List[List[GpxMetrics]]:
+    parser = GpxStreamParser(BytesIO(str.encode(gpx_content)))
+    tracks_metrics: Dict[int, List[GpxMetrics]] = {}
+    for track_idx, _, points in parser.iter_segments():
+        segment_points = SegmentPoints()
+        for point in points:
+            segment_points.add_point(point)
+        tracks_metrics.setdefault(track_idx, []).append(
+            get_segment_metrics(segment_points, stopped_speed_threshold)
+        )
+    return list(tracks_metrics.values())
+
+
+def approx(value: Optional[float]) -> Any:
+    return None if value is None else pytest.approx(value, rel=1e-9)
+
+
+def assert_metrics_match_gpxpy(
+    metrics: GpxMetrics,
+    parsed_gpx: Union[gpxpy.gpx.GPX, gpxpy.gpx.GPXTrackSegment],
+    stopped_speed_threshold: float,
+) -> None:
+    assert metrics.duration == approx(parsed_gpx.get_duration())
+    elevation_extremes = parsed_gpx.get_elevation_extremes()
+    assert metrics.elevation_min == elevation_extremes.minimum
+    assert metrics.elevation_max == elevation_extremes.maximum
+    uphill_downhill = parsed_gpx.get_uphill_downhill()
+    assert metrics.uphill == approx(uphill_downhill.uphill)
+    assert metrics.downhill == approx(uphill_downhill.downhill)
+    moving_data = parsed_gpx.get_moving_data(
+        stopped_speed_threshold=stopped_speed_threshold
+    )
+    assert moving_data is not None
+    assert metrics.moving_time == approx(moving_data.moving_time)
+    assert metrics.stopped_time == approx(moving_data.stopped_time)
+    assert metrics.moving_distance == approx(moving_data.moving_distance)
+    assert metrics.stopped_distance == approx(moving_data.stopped_distance)
+    assert metrics.max_speed == approx(moving_data.max_speed)
+    bounds = parsed_gpx.get_bounds()
+    if bounds is None:
+        assert metrics.bounds is None
+    else:
+        assert metrics.bounds is not None
+        assert [
+            metrics.bounds.min_latitude,
+            metrics.bounds.max_latitude,
+            metrics.bounds.min_longitude,
+            metrics.bounds.max_longitude,
+        ] == [
+            bounds.min_latitude,
+            bounds.max_latitude,
+            bounds.min_longitude,
+            bounds.max_longitude,
+        ]
+
+
+def assert_gpx_metrics_match_gpxpy(
+    gpx_content: str, stopped_speed_threshold: float
+) -> None:
+    parsed_gpx = gpxpy.parse(gpx_content)
+
+    tracks_metrics = get_tracks_metrics(gpx_content, stopped_speed_threshold)
+
+    assert len(tracks_metrics) == len(parsed_gpx.tracks)
+    for track_metrics, track in zip(tracks_metrics, parsed_gpx.tracks):
+        assert len(track_metrics) == len(track.segments)
+        for segment_metrics, segment in zip(track_metrics, track.segments):
+            assert_metrics_match_gpxpy(
+                segment_metrics, segment, stopped_speed_threshold
+            )
+    assert_metrics_match_gpxpy(
+        get_gpx_metrics(tracks_metrics), parsed_gpx, stopped_speed_threshold
+    )
+
+
+class TestGetSegmentMetrics:
+    def test_it_returns_metrics_for_segment_without_points(self) -> None:
+        metrics = get_segment_metrics(SegmentPoints(), 1.0)
+
+        assert metrics == GpxMetrics(
+            duration=0,
+            elevation_min=None,
+            elevation_max=None,
+            uphill=0.0,
+            downhill=0.0,
+            moving_time=0.0,
+            stopped_time=0.0,
+            moving_distance=0.0,
+            stopped_distance=0.0,
+            max_speed=0.0,
+            bounds=None,
+        )
+
+    def test_it_returns_metrics_for_segment_with_one_point(
+        self, gpx_file: str
+    ) -> None:
+        segment_points = SegmentPoints()
+        parser = GpxStreamParser(BytesIO(str.encode(gpx_file)))
+        for _, _, points in parser.iter_segments():
+            segment_points.add_point(next(points))
+
+        metrics = get_segment_metrics(segment_points, 1.0)
+
+        assert metrics.duration == 0
+        assert metrics.elevation_min == metrics.elevation_max == 998.0
+        assert metrics.moving_time == metrics.stopped_time == 0.0
+        assert metrics.max_speed == 0.0
+
+
+class TestGpxMetricsParityWithGpxpy:
+    @pytest.mark.parametrize(
+        'input_gpx_file',
+        [
+            'gpx_file',
+            'gpx_file_with_offset',
+            'gpx_file_with_segments',
+            'gpx_file_with_3_segments',
+        ],
+    )
+    @pytest.mark.parametrize('input_threshold', [0.0, 0.1, 1.0, 5.0])
+    def test_it_returns_same_metrics_for_fixtures(
+        self,
+        request: pytest.FixtureRequest,
+        input_gpx_file: str,
+        input_threshold: float,
+    ) -> None:
+        assert_gpx_metrics_match_gpxpy(
+            request.getfixturevalue(input_gpx_file), input_threshold
+        )
+
+    @pytest.mark.parametrize(
+        'input_description, input_params',
+        [
+            ('one segment', {}),
+            ('several segments', {'segments_count': 3}),
+            ('several tracks', {'tracks_count': 3, 'segments_count': 2}),
+            ('missing elevations', {'missing_elevation_ratio': 0.2}),
+            ('elevations equal to 0', {'zero_elevation_ratio': 0.1}),
+            ('missing times', {'missing_time_ratio': 0.1}),
+            ('distant points', {'distant_points_ratio': 0.05}),
+            ('large segment', {'points_count': 10000}),
+        ],
+    )
+    @pytest.mark.parametrize('input_threshold', [0.0, 1.0, 5.0])
+    def test_it_returns_same_metrics_for_generated_gpx(
+        self,
+        input_description: str,
+        input_params: Dict,
+        input_threshold: float,
+    ) -> None:
+        for seed in range(3):
+            assert_gpx_metrics_match_gpxpy(
+                generate_gpx(seed, **input_params), input_threshold
+            )
@@ -0,0 +1,88 @@
+from io import BytesIO
+
+import pytest
+
+from fittrackee.workouts.exceptions import InvalidGPXException
+from fittrackee.workouts.utils.gpx import get_gpx_info
+from fittrackee.workouts.utils.gpx_parser import GpxStreamParser
+
+
+class TestGpxStreamParser:
+    def test_it_returns_points_for_each_segment(
+        self, gpx_file_with_3_segments: str
+    ) -> None:
+        parser = GpxStreamParser(BytesIO(str.encode(gpx_file_with_3_segments)))
+
+        segments = [
+            (track_idx, segment_idx, list(points))
+            for track_idx, segment_idx, points in parser.iter_segments()
+        ]
+
+        assert [segment[:2] for segment in segments] == [
+            (0, 0),
+            (0, 1),
+            (0, 2),
+        ]
+        assert [len(segment[2]) for segment in segments] == [3, 3, 3]
+        first_point = segments[0][2][0]
+        assert first_point.latitude == 44.68095
+        assert first_point.longitude == 6.07367
+        assert first_point.elevation == 998
+        assert first_point.time is not None
+        assert first_point.time.isoformat() == '2018-03-13T12:44:50+00:00'
+        assert parser.tracks_names == ['just a workout']
+
+    def test_it_skips_points_not_consumed(
+        self, gpx_file_with_3_segments: str
+    ) -> None:
+        parser = GpxStreamParser(BytesIO(str.encode(gpx_file_with_3_segments)))
+
+        segments_first_points = [
+            next(points) for _, _, points in parser.iter_segments()
+        ]
+
+        assert [point.elevation for point in segments_first_points] == [
+            998,
+            987,
+            980,
+        ]
+
+    def test_it_returns_no_tracks_when_gpx_file_has_no_tracks(
+        self, gpx_file_wo_track: str
+    ) -> None:
+        parser = GpxStreamParser(BytesIO(str.encode(gpx_file_wo_track)))
+
+        assert list(parser.iter_segments()) == []
+        assert parser.tracks_count == 0
+
+    def test_it_returns_none_when_point_has_no_time(
+        self, gpx_file_without_time: str
+    ) -> None:
+        parser = GpxStreamParser(BytesIO(str.encode(gpx_file_without_time)))
+
+        for _, _, points in parser.iter_segments():
+            assert all(point.time is None for point in points)
+
+
+class TestGetGpxInfoErrors:
+    @pytest.mark.parametrize(
+        'input_gpx_file, expected_message',
+        [
+            ('gpx_file_invalid_xml', 'gpx file is invalid'),
+            ('gpx_file_wo_track', 'no tracks in gpx file'),
+            ('gpx_file_without_time', '<time> is missing in gpx file'),
+        ],
+    )
+    def test_it_raises_error_when_gpx_file_is_invalid(
+        self,
+        request: pytest.FixtureRequest,
+        tmp_path: str,
+        input_gpx_file: str,
+        expected_message: str,
+    ) -> None:
+        gpx_file_path = f'{tmp_path}/workout.gpx'
+        with open(gpx_file_path, 'w') as f:
+            f.write(request.getfixturevalue(input_gpx_file))
+
+        with pytest.raises(InvalidGPXException, match=expected_message):
+            get_gpx_info(gpx_file_path, 1.0, False, False)
@@ -0,0 +1,190 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import gpxpy
+import pytest
+
+from fittrackee.workouts.exceptions import (
+    InvalidGPXException,
+    WorkoutGPXException,
+)
+from fittrackee.workouts.utils.gpx import extract_segment_from_gpx_file
+from fittrackee.workouts.utils.gpx_segments import (
+    generate_segments_index,
+    get_segments_index,
+    get_segments_index_filepath,
+    write_segments_index,
+)
+
+GPX_WITH_NAMESPACES = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx xmlns="http://www.topografix.com/GPX/1/1" '
+    'xmlns:gpxtpx="http://www.garmin.com/xmlschemas/'
+    'TrackPointExtension/v1">'
+    '<trk><name>just a workout</name>'
+    '<trkseg>'
+    '<trkpt lat="44.68095" lon="6.07367"><ele>998</ele>'
+    '<time>2018-03-13T12:44:45Z</time><extensions>'
+    '<gpxtpx:TrackPointExtension><gpxtpx:hr>92</gpxtpx:hr>'
+    '</gpxtpx:TrackPointExtension></extensions></trkpt>'
+    '</trkseg>'
+    '<trkseg/>\n'
+    '<trkseg >\n'
+    '<trkpt lat="44.67822" lon="6.07442"><ele>975</ele>'
+    '<time>2018-03-13T12:48:55Z</time></trkpt>'
+    '</trkseg >'
+    '</trk>'
+    '<trk><trkseg><trkpt lat="44" lon="6"/></trkseg></trk>'
+    '</gpx>'
+)
+
+
+def write_gpx_file(tmp_path: Path, content: str) -> str:
+    gpx_filepath = str(tmp_path / 'workout.gpx')
+    with open(gpx_filepath, 'w') as f:
+        f.write(content)
+    return gpx_filepath
+
+
+class TestGenerateSegmentsIndex:
+    def test_it_returns_none_when_gpx_has_no_tracks(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, '<gpx></gpx>')
+
+        assert generate_segments_index(gpx_filepath) is None
+
+    def test_it_raises_error_when_gpx_file_is_invalid(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, '<gpx><trk>')
+
+        with pytest.raises(InvalidGPXException):
+            generate_segments_index(gpx_filepath)
+
+    def test_it_returns_byte_ranges_of_first_track_segments(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, GPX_WITH_NAMESPACES)
+
+        segments_index = generate_segments_index(gpx_filepath)
+
+        assert segments_index is not None
+        content = GPX_WITH_NAMESPACES.encode()
+        first_segment_start = content.index(b'<trkseg>')
+        first_segment_end = content.index(b'</trkseg>') + len(b'</trkseg>')
+        third_segment_start = content.index(b'<trkseg >')
+        third_segment_end = content.index(b'</trkseg >') + len(b'</trkseg >')
+        assert [
+            content[start:end] for start, end in segments_index['segments']
+        ] == [
+            content[first_segment_start:first_segment_end],
+            b'<trkseg/>',
+            content[third_segment_start:third_segment_end],
+        ]
+
+    def test_it_stores_root_and_track_elements(self, tmp_path: Path) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, GPX_WITH_NAMESPACES)
+
+        segments_index = generate_segments_index(gpx_filepath)
+
+        assert segments_index is not None
+        assert segments_index['root'] == 'gpx'
+        assert segments_index['root_attributes'] == {
+            'xmlns': 'http://www.topografix.com/GPX/1/1',
+            'xmlns:gpxtpx': (
+                'http://www.garmin.com/xmlschemas/TrackPointExtension/v1'
+            ),
+        }
+        assert segments_index['track'] == 'trk'
+
+
+class TestGetSegmentsIndex:
+    def test_it_stores_segments_index_next_to_gpx_file(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, GPX_WITH_NAMESPACES)
+
+        segments_index = write_segments_index(gpx_filepath)
+
+        assert get_segments_index_filepath(gpx_filepath) == str(
+            tmp_path / 'workout.segments.json'
+        )
+        assert sorted(os.listdir(tmp_path)) == [
+            'workout.gpx',
+            'workout.segments.json',
+        ]
+        assert get_segments_index(gpx_filepath) == segments_index
+
+    def test_it_creates_segments_index_file_when_not_existing(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, GPX_WITH_NAMESPACES)
+
+        segments_index = get_segments_index(gpx_filepath)
+
+        assert segments_index == generate_segments_index(gpx_filepath)
+        assert os.path.exists(get_segments_index_filepath(gpx_filepath))
+
+
+class TestExtractSegmentFromGpxFile:
+    def test_it_returns_none_when_gpx_has_no_tracks(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, '<gpx></gpx>')
+
+        assert extract_segment_from_gpx_file(gpx_filepath, 1) is None
+
+    @pytest.mark.parametrize('input_segment_id', [1, 2, 3])
+    def test_it_returns_segment_gpx(
+        self, tmp_path: Path, input_segment_id: int
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, GPX_WITH_NAMESPACES)
+        expected_segment = (
+            gpxpy.parse(GPX_WITH_NAMESPACES)
+            .tracks[0]
+            .segments[input_segment_id - 1]
+        )
+
+        segment_gpx = extract_segment_from_gpx_file(
+            gpx_filepath, input_segment_id
+        )
+
+        assert segment_gpx is not None
+        gpx = gpxpy.parse(segment_gpx)
+        assert len(gpx.tracks) == 1
+        assert len(gpx.tracks[0].segments) == 1
+        assert [
+            (point.latitude, point.longitude, point.elevation, point.time)
+            for point in gpx.tracks[0].segments[0].points
+        ] == [
+            (point.latitude, point.longitude, point.elevation, point.time)
+            for point in expected_segment.points
+        ]
+
+    def test_it_does_not_parse_gpx_file_when_index_exists(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, GPX_WITH_NAMESPACES)
+        write_segments_index(gpx_filepath)
+
+        with patch(
+            'fittrackee.workouts.utils.gpx_segments.generate_segments_index'
+        ) as generate_segments_index_mock:
+            extract_segment_from_gpx_file(gpx_filepath, 1)
+
+        generate_segments_index_mock.assert_not_called()
+
+    @pytest.mark.parametrize(
+        'input_segment_id, expected_status', [(0, 'error'), (4, 'not found')]
+    )
+    def test_it_raises_error_when_segment_id_is_invalid(
+        self, tmp_path: Path, input_segment_id: int, expected_status: str
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, GPX_WITH_NAMESPACES)
+
+        with pytest.raises(WorkoutGPXException) as e:
+            extract_segment_from_gpx_file(gpx_filepath, input_segment_id)
+
+        assert e.value.status == expected_status
@@ -0,0 +1,119 @@
+import gzip
+import os
+from pathlib import Path
+
+import pytest
+
+from fittrackee.workouts.utils.gpx_storage import (
+    CHUNK_SIZE,
+    compress_gpx_file,
+    get_uncompressed_gpx_filepath,
+    is_gpx_file_compressed,
+    iter_gpx_file,
+    open_gpx_file,
+)
+
+GPX_CONTENT = '<gpx><trk><trkseg></trkseg></trk></gpx>'
+
+
+def write_gpx_file(tmp_path: Path, content: str = GPX_CONTENT) -> str:
+    gpx_filepath = str(tmp_path / 'workout.gpx')
+    with open(gpx_filepath, 'w') as f:
+        f.write(content)
+    return gpx_filepath
+
+
+class TestGetUncompressedGpxFilepath:
+    @pytest.mark.parametrize(
+        'input_filepath, expected_compressed, expected_filepath',
+        [
+            ('workouts/1/file.gpx', False, 'workouts/1/file.gpx'),
+            ('workouts/1/file.gpx.gz', True, 'workouts/1/file.gpx'),
+        ],
+    )
+    def test_it_returns_filepath_without_compression_extension(
+        self,
+        input_filepath: str,
+        expected_compressed: bool,
+        expected_filepath: str,
+    ) -> None:
+        assert is_gpx_file_compressed(input_filepath) is expected_compressed
+        assert get_uncompressed_gpx_filepath(input_filepath) == (
+            expected_filepath
+        )
+
+
+class TestCompressGpxFile:
+    def test_it_compresses_gpx_file_and_deletes_uncompressed_file(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path)
+
+        compressed_filepath = compress_gpx_file(gpx_filepath)
+
+        assert compressed_filepath == f'{gpx_filepath}.gz'
+        assert os.listdir(tmp_path) == ['workout.gpx.gz']
+        with gzip.open(compressed_filepath, 'rt') as f:
+            assert f.read() == GPX_CONTENT
+
+    def test_it_keeps_uncompressed_file_when_deletion_is_disabled(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path)
+
+        compress_gpx_file(gpx_filepath, delete_uncompressed_file=False)
+
+        assert sorted(os.listdir(tmp_path)) == [
+            'workout.gpx',
+            'workout.gpx.gz',
+        ]
+
+    def test_it_returns_same_content_for_same_gpx_file(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path)
+        compressed_filepath = compress_gpx_file(
+            gpx_filepath, delete_uncompressed_file=False
+        )
+        with open(compressed_filepath, 'rb') as f:
+            first_content = f.read()
+
+        compress_gpx_file(gpx_filepath)
+
+        with open(compressed_filepath, 'rb') as f:
+            assert f.read() == first_content
+
+    def test_it_does_not_leave_temporary_file_on_error(
+        self, tmp_path: Path
+    ) -> None:
+        with pytest.raises(FileNotFoundError):
+            compress_gpx_file(str(tmp_path / 'missing.gpx'))
+
+        assert os.listdir(tmp_path) == []
+
+
+class TestOpenGpxFile:
+    @pytest.mark.parametrize('input_compressed', [False, True])
+    def test_it_returns_uncompressed_content(
+        self, tmp_path: Path, input_compressed: bool
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path)
+        if input_compressed:
+            gpx_filepath = compress_gpx_file(gpx_filepath)
+
+        with open_gpx_file(gpx_filepath) as f:
+            assert f.read() == GPX_CONTENT.encode()
+
+    @pytest.mark.parametrize('input_compressed', [False, True])
+    def test_it_returns_content_by_chunks(
+        self, tmp_path: Path, input_compressed: bool
+    ) -> None:
+        content = GPX_CONTENT * (CHUNK_SIZE // len(GPX_CONTENT) + 1)
+        gpx_filepath = write_gpx_file(tmp_path, content)
+        if input_compressed:
+            gpx_filepath = compress_gpx_file(gpx_filepath)
+
+        chunks = list(iter_gpx_file(gpx_filepath))
+
+        assert len(chunks) == 2
+        assert b''.join(chunks) == content.encode()
@@ -1,8 +1,38 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
 from unittest.mock import patch
 
+import numpy as np
 import pytest
+from flask import Flask
+from PIL import Image
+from staticmap import Line, StaticMap
 
-from fittrackee.workouts.utils.maps import get_static_map_tile_server_url
+from fittrackee.tests.fixtures.fixtures_workouts import byte_image
+from fittrackee.workouts.utils.maps import (
+    CachedStaticMap,
+    RequestsCoalescer,
+    generate_map,
+    get_map_variant,
+    get_map_variant_filepath,
+    get_map_variants_filepaths,
+    get_map_zoom,
+    get_static_map_tile_server_url,
+    map_tiles_cache,
+    simplify_map_data,
+)
+
+TILE_SERVER_URL = 'https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png'
+
+
+def generate_map_data(points_count: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    steps = rng.uniform(-0.0001, 0.0002, size=(points_count, 2))
+    return np.array([6.07, 44.68]) + np.cumsum(steps, axis=0)
 
 
 class TestGetStaticMapTileServerUrl:
@@ -61,3 +91,267 @@ class TestGetStaticMapTileServerUrl:
                 get_static_map_tile_server_url(tile_config)
                 == 'https://b.tile.openstreetmap.org/{z}/{x}/{y}.png'
             )
+
+
+class TestCachedStaticMap:
+    @staticmethod
+    def get_static_map(subdomain: str = 'a') -> CachedStaticMap:
+        static_map = CachedStaticMap(400, 225, 10)
+        static_map.url_template = TILE_SERVER_URL.replace('{s}', subdomain)
+        static_map.tiles_namespace = TILE_SERVER_URL
+        return static_map
+
+    def test_it_gets_tile_from_tile_server_once(self, app: Flask) -> None:
+        static_map = self.get_static_map()
+        url = 'https://a.tile.openstreetmap.org/10/527/364.png'
+
+        with patch.object(
+            StaticMap, 'get', return_value=(200, b'tile')
+        ) as get_mock:
+            assert static_map.get(url, timeout=None) == (200, b'tile')
+            assert static_map.get(url, timeout=None) == (200, b'tile')
+
+        get_mock.assert_called_once_with(url, timeout=None)
+        assert map_tiles_cache.get_stats()['hits'] == 1
+
+    def test_it_shares_cached_tiles_between_subdomains(
+        self, app: Flask
+    ) -> None:
+        with patch.object(
+            StaticMap, 'get', return_value=(200, b'tile')
+        ) as get_mock:
+            self.get_static_map('a').get(
+                'https://a.tile.openstreetmap.org/10/527/364.png'
+            )
+
+            assert self.get_static_map('b').get(
+                'https://b.tile.openstreetmap.org/10/527/364.png'
+            ) == (200, b'tile')
+
+        get_mock.assert_called_once()
+
+    def test_it_does_not_cache_tile_on_error(self, app: Flask) -> None:
+        static_map = self.get_static_map()
+        url = 'https://a.tile.openstreetmap.org/10/527/364.png'
+
+        with patch.object(
+            StaticMap, 'get', return_value=(500, b'')
+        ) as get_mock:
+            static_map.get(url)
+            static_map.get(url)
+
+        assert get_mock.call_count == 2
+        assert map_tiles_cache.get_stats()['entries'] == 0
+
+    def test_it_does_not_cache_tile_when_url_does_not_match_template(
+        self, app: Flask
+    ) -> None:
+        static_map = self.get_static_map()
+        url = 'https://a.tile.openstreetmap.org/10/527/364.png?key=1'
+
+        with patch.object(
+            StaticMap, 'get', return_value=(200, b'tile')
+        ) as get_mock:
+            static_map.get(url)
+            static_map.get(url)
+
+        assert get_mock.call_count == 2
+
+
+class TestGenerateMap:
+    def test_it_gets_tiles_from_cache_on_second_map_generation(
+        self, app: Flask, tmp_path: Path
+    ) -> None:
+        map_data = [[6.07367, 44.68095], [6.07442, 44.68163]]
+
+        with patch.object(
+            StaticMap, 'get', return_value=(200, byte_image)
+        ) as get_mock:
+            generate_map(str(tmp_path / 'map_1.png'), map_data)
+            tiles_count = get_mock.call_count
+            generate_map(str(tmp_path / 'map_2.png'), map_data)
+
+        assert tiles_count > 0
+        assert get_mock.call_count == tiles_count
+        assert map_tiles_cache.get_stats()['hits'] == tiles_count
+
+    def test_it_generates_map_variants(
+        self, app: Flask, tmp_path: Path
+    ) -> None:
+        map_filepath = str(tmp_path / 'map.png')
+
+        with patch.object(StaticMap, 'get', return_value=(200, byte_image)):
+            generate_map(
+                map_filepath, [[6.07367, 44.68095], [6.07442, 44.68163]]
+            )
+
+        for variant_filepath in get_map_variants_filepaths(map_filepath):
+            assert os.path.exists(variant_filepath)
+        with Image.open(
+            get_map_variant_filepath(map_filepath, 'thumbnail', 'webp')
+        ) as image:
+            assert image.format == 'WEBP'
+            assert image.size == (100, 56)
+
+    def test_it_draws_simplified_track(
+        self, app: Flask, tmp_path: Path
+    ) -> None:
+        map_data = generate_map_data(10000)
+
+        with patch.object(
+            StaticMap, 'get', return_value=(200, byte_image)
+        ), patch(
+            'fittrackee.workouts.utils.maps.Line', wraps=Line
+        ) as line_mock:
+            generate_map(str(tmp_path / 'map.png'), map_data, tolerance=1)
+
+        drawn_coordinates = line_mock.call_args[0][0]
+        assert len(drawn_coordinates) < len(map_data)
+        assert drawn_coordinates[0] == map_data[0].tolist()
+        assert drawn_coordinates[-1] == map_data[-1].tolist()
+
+    def test_it_draws_all_points_when_tolerance_is_0(
+        self, app: Flask, tmp_path: Path
+    ) -> None:
+        map_data = generate_map_data(1000)
+
+        with patch.object(
+            StaticMap, 'get', return_value=(200, byte_image)
+        ), patch(
+            'fittrackee.workouts.utils.maps.Line', wraps=Line
+        ) as line_mock:
+            generate_map(str(tmp_path / 'map.png'), map_data, tolerance=0)
+
+        assert line_mock.call_args[0][0] == map_data.tolist()
+
+
+class TestGetMapVariantFilepath:
+    @pytest.mark.parametrize(
+        'input_size, input_format, expected_filepath',
+        [
+            (None, 'png', '/maps/map.png'),
+            (None, 'webp', '/maps/map.webp'),
+            ('small', 'png', '/maps/map_small.png'),
+            ('thumbnail', 'webp', '/maps/map_thumbnail.webp'),
+        ],
+    )
+    def test_it_returns_variant_filepath(
+        self,
+        input_size: Optional[str],
+        input_format: str,
+        expected_filepath: str,
+    ) -> None:
+        assert (
+            get_map_variant_filepath('/maps/map.png', input_size, input_format)
+            == expected_filepath
+        )
+
+
+class TestGetMapVariant:
+    def test_it_generates_missing_variant_from_map_image(
+        self, tmp_path: Path
+    ) -> None:
+        map_filepath = str(tmp_path / 'map.png')
+        Image.new('RGB', (400, 225)).save(map_filepath)
+
+        variant_filepath = get_map_variant(map_filepath, 'small', 'webp')
+
+        assert variant_filepath == str(tmp_path / 'map_small.webp')
+        with Image.open(variant_filepath) as image:
+            assert image.size == (200, 113)
+
+    def test_it_returns_existing_variant(self, tmp_path: Path) -> None:
+        map_filepath = str(tmp_path / 'map.png')
+        variant_filepath = tmp_path / 'map_small.png'
+        variant_filepath.write_bytes(b'variant')
+
+        assert get_map_variant(map_filepath, 'small', 'png') == str(
+            variant_filepath
+        )
+        assert variant_filepath.read_bytes() == b'variant'
+
+
+class TestGetMapZoom:
+    @pytest.mark.parametrize('input_points_count', [2, 100, 10000, 100000])
+    def test_it_returns_same_zoom_as_staticmap(
+        self, input_points_count: int
+    ) -> None:
+        map_data = generate_map_data(input_points_count)
+        m = StaticMap(400, 225, 10)
+        m.add_line(Line(map_data.tolist(), '#3388FF', 4))
+
+        assert get_map_zoom(m, map_data) == m._calculate_zoom()
+
+
+class TestSimplifyMapData:
+    def test_it_keeps_first_and_last_points(self) -> None:
+        map_data = generate_map_data(1000)
+
+        simplified_map_data = simplify_map_data(
+            map_data, zoom=12, tile_size=256, tolerance=1
+        )
+
+        assert len(simplified_map_data) < len(map_data)
+        assert simplified_map_data[0].tolist() == map_data[0].tolist()
+        assert simplified_map_data[-1].tolist() == map_data[-1].tolist()
+
+    def test_it_keeps_more_points_on_higher_zoom(self) -> None:
+        map_data = generate_map_data(1000)
+
+        assert len(
+            simplify_map_data(map_data, zoom=12, tile_size=256, tolerance=1)
+        ) < len(
+            simplify_map_data(map_data, zoom=16, tile_size=256, tolerance=1)
+        )
+
+    def test_it_keeps_more_points_with_lower_tolerance(self) -> None:
+        map_data = generate_map_data(1000)
+
+        assert len(
+            simplify_map_data(map_data, zoom=14, tile_size=256, tolerance=2)
+        ) < len(
+            simplify_map_data(map_data, zoom=14, tile_size=256, tolerance=0.5)
+        )
+
+
+class TestRequestsCoalescer:
+    def test_it_executes_concurrent_calls_with_same_key_once(self) -> None:
+        coalescer = RequestsCoalescer()
+        calls_count = 0
+        all_callers_are_waiting = threading.Event()
+
+        def fetch_tile() -> bytes:
+            nonlocal calls_count
+            calls_count += 1
+            all_callers_are_waiting.wait(timeout=5)
+            return b'tile'
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [
+                executor.submit(coalescer.execute, 'tile', fetch_tile)
+                for _ in range(5)
+            ]
+            # waiting for all threads to call 'execute'
+            time.sleep(0.2)
+            all_callers_are_waiting.set()
+            results = [future.result() for future in futures]
+
+        assert results == [b'tile'] * 5
+        assert calls_count == 1
+        assert coalescer._pending == {}
+
+    def test_it_executes_calls_with_different_keys(self) -> None:
+        coalescer = RequestsCoalescer()
+
+        assert coalescer.execute('tile_1', lambda: b'tile_1') == b'tile_1'
+        assert coalescer.execute('tile_2', lambda: b'tile_2') == b'tile_2'
+
+    def test_it_raises_error_to_all_callers(self) -> None:
+        coalescer = RequestsCoalescer()
+
+        def fetch_tile() -> bytes:
+            raise ValueError()
+
+        with pytest.raises(ValueError):
+            coalescer.execute('tile', fetch_tile)
+        assert coalescer._pending == {}
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from fittrackee.workouts.utils.polyline import encode_polyline
+
+
+class TestEncodePolyline:
+    def test_it_returns_empty_string_when_no_coordinates(self) -> None:
+        assert encode_polyline(np.array([]), np.array([])) == ''
+
+    @pytest.mark.parametrize(
+        'input_latitudes, input_longitudes, expected_polyline',
+        [
+            # example from algorithm documentation
+            (
+                [38.5, 40.7, 43.252],
+                [-120.2, -120.95, -126.453],
+                '_p~iF~ps|U_ulLnnqC_mqNvxq`@',
+            ),
+            ([0.0], [0.0], '??'),
+            ([44.68095], [6.07367], '}vuoGmgad@'),
+        ],
+    )
+    def test_it_encodes_coordinates(
+        self,
+        input_latitudes: list,
+        input_longitudes: list,
+        expected_polyline: str,
+    ) -> None:
+        assert (
+            encode_polyline(
+                np.array(input_latitudes), np.array(input_longitudes)
+            )
+            == expected_polyline
+        )
@@ -0,0 +1,301 @@
+import os
+from datetime import timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import gpxpy
+import numpy as np
+import pytest
+
+from fittrackee.tests.utils import generate_gpx
+from fittrackee.workouts.exceptions import WorkoutGPXException
+from fittrackee.workouts.utils.gpx import get_chart_data
+from fittrackee.workouts.utils.track_data import (
+    TRACK_DATA_COLUMNS,
+    get_track_data,
+    get_track_data_filepath,
+    write_track_data,
+)
+
+
+def get_gpxpy_chart_data(
+    gpx_content: str, segment_id: Optional[int] = None
+) -> List[Dict]:
+    """
+    Chart data calculated from gpxpy objects
+    """
+    gpx = gpxpy.parse(gpx_content)
+    chart_data = []
+    first_point: Any = None
+    previous_point: Any = None
+    previous_distance = 0.0
+    segments = gpx.tracks[0].segments
+    if segment_id is not None:
+        segments = [segments[segment_id - 1]]
+    for segment_idx, segment in enumerate(segments):
+        for point_idx, point in enumerate(segment.points):
+            if segment_idx == 0 and point_idx == 0:
+                first_point = point
+            distance = (
+                point.distance_3d(previous_point)
+                if (
+                    point.elevation
+                    and previous_point
+                    and previous_point.elevation
+                )
+                else point.distance_2d(previous_point)
+            )
+            distance = 0 if distance is None else distance
+            distance += previous_distance
+            speed = segment.get_speed(point_idx)
+            time: Any = point.time
+            chart_data.append(
+                {
+                    'distance': round(distance / 1000, 2),
+                    'duration': point.time_difference(first_point),
+                    'elevation': (
+                        round(point.elevation, 1)
+                        if point.elevation is not None
+                        else 0
+                    ),
+                    'latitude': point.latitude,
+                    'longitude': point.longitude,
+                    'speed': (
+                        round((speed / 1000) * 3600, 2)
+                        if speed is not None
+                        else 0
+                    ),
+                    'time': time.replace(tzinfo=timezone(time.utcoffset())),
+                }
+            )
+            previous_point = point
+            previous_distance = distance
+    return chart_data
+
+
+def write_gpx_file(tmp_path: Path, gpx_content: str) -> str:
+    gpx_filepath = str(tmp_path / 'workout.gpx')
+    with open(gpx_filepath, 'w') as f:
+        f.write(gpx_content)
+    return gpx_filepath
+
+
+class TestWriteTrackData:
+    def test_it_stores_track_data_next_to_gpx_file(
+        self, tmp_path: Path, gpx_file_with_segments: str
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file_with_segments)
+
+        write_track_data(gpx_filepath)
+
+        track_data_filepath = str(tmp_path / 'workout.npy')
+        assert get_track_data_filepath(gpx_filepath) == track_data_filepath
+        track_data = np.load(track_data_filepath, mmap_mode='r')
+        assert isinstance(track_data, np.memmap)
+        assert track_data.shape == (len(TRACK_DATA_COLUMNS), 25)
+        assert (
+            track_data[TRACK_DATA_COLUMNS.index('segment')].tolist()
+            == [0.0] * 9 + [1.0] * 16
+        )
+        assert sorted(os.listdir(tmp_path)) == ['workout.gpx', 'workout.npy']
+
+    def test_it_does_not_store_track_data_when_gpx_has_no_tracks(
+        self, tmp_path: Path, gpx_file_wo_track: str
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file_wo_track)
+
+        track_data = write_track_data(gpx_filepath)
+
+        assert track_data is None
+        assert not os.path.exists(get_track_data_filepath(gpx_filepath))
+
+
+class TestGetTrackData:
+    def test_it_creates_track_data_file_when_not_existing(
+        self, tmp_path: Path, gpx_file: str
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file)
+
+        track_data = get_track_data(gpx_filepath)
+
+        assert track_data is not None
+        assert os.path.exists(get_track_data_filepath(gpx_filepath))
+
+    def test_it_reads_existing_track_data_file(
+        self, tmp_path: Path, gpx_file: str
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file)
+        expected_track_data = write_track_data(gpx_filepath)
+        os.remove(gpx_filepath)
+
+        track_data = get_track_data(gpx_filepath)
+
+        assert isinstance(track_data, np.memmap)
+        assert np.array_equal(
+            track_data, expected_track_data, equal_nan=True  # type: ignore
+        )
+
+
+class TestGetChartData:
+    @pytest.mark.parametrize(
+        'input_gpx_file',
+        [
+            'gpx_file',
+            'gpx_file_with_offset',
+            'gpx_file_with_segments',
+            'gpx_file_with_3_segments',
+        ],
+    )
+    def test_it_returns_same_chart_data_as_gpxpy_for_fixtures(
+        self,
+        request: pytest.FixtureRequest,
+        tmp_path: Path,
+        input_gpx_file: str,
+    ) -> None:
+        gpx_content = request.getfixturevalue(input_gpx_file)
+        gpx_filepath = write_gpx_file(tmp_path, gpx_content)
+
+        assert get_chart_data(gpx_filepath) == get_gpxpy_chart_data(
+            gpx_content
+        )
+
+    @pytest.mark.parametrize('input_segment_id', [1, 2, 3])
+    def test_it_returns_same_segment_chart_data_as_gpxpy(
+        self,
+        tmp_path: Path,
+        gpx_file_with_3_segments: str,
+        input_segment_id: int,
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file_with_3_segments)
+
+        assert get_chart_data(
+            gpx_filepath, input_segment_id
+        ) == get_gpxpy_chart_data(gpx_file_with_3_segments, input_segment_id)
+
+    @pytest.mark.parametrize(
+        'input_description, input_params',
+        [
+            ('several segments', {'segments_count': 3}),
+            ('missing elevations', {'missing_elevation_ratio': 0.2}),
+            ('elevations equal to 0', {'zero_elevation_ratio': 0.1}),
+            ('distant points', {'distant_points_ratio': 0.05}),
+        ],
+    )
+    def test_it_returns_same_chart_data_as_gpxpy_for_generated_gpx(
+        self, tmp_path: Path, input_description: str, input_params: Dict
+    ) -> None:
+        gpx_content = generate_gpx(seed=0, **input_params)
+        gpx_filepath = write_gpx_file(tmp_path, gpx_content)
+
+        assert get_chart_data(gpx_filepath) == get_gpxpy_chart_data(
+            gpx_content
+        )
+
+    def test_it_returns_none_when_gpx_has_no_tracks(
+        self, tmp_path: Path, gpx_file_wo_track: str
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file_wo_track)
+
+        assert get_chart_data(gpx_filepath) is None
+
+    def test_it_returns_downsampled_chart_data(self, tmp_path: Path) -> None:
+        gpx_content = generate_gpx(seed=0, points_count=1000)
+        gpx_filepath = write_gpx_file(tmp_path, gpx_content)
+        chart_data = get_chart_data(gpx_filepath)
+        assert chart_data is not None
+
+        downsampled_chart_data = get_chart_data(gpx_filepath, max_points=100)
+
+        assert downsampled_chart_data is not None
+        assert len(downsampled_chart_data) == 100
+        assert downsampled_chart_data[0] == chart_data[0]
+        assert downsampled_chart_data[-1] == chart_data[-1]
+        assert all(point in chart_data for point in downsampled_chart_data)
+
+    def test_it_returns_all_points_when_max_points_exceeds_points_count(
+        self, tmp_path: Path, gpx_file_with_3_segments: str
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file_with_3_segments)
+
+        assert get_chart_data(
+            gpx_filepath, segment_id=2, max_points=1000
+        ) == get_chart_data(gpx_filepath, segment_id=2)
+
+    @pytest.mark.parametrize('input_segment_id', [None, 2])
+    def test_it_returns_columnar_chart_data(
+        self,
+        tmp_path: Path,
+        gpx_file_with_3_segments: str,
+        input_segment_id: Optional[int],
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file_with_3_segments)
+        chart_data = get_chart_data(gpx_filepath, input_segment_id)
+        assert isinstance(chart_data, list)
+
+        columnar_chart_data = get_chart_data(
+            gpx_filepath, input_segment_id, chart_format='columnar'
+        )
+
+        assert isinstance(columnar_chart_data, dict)
+        for key in [
+            'distance',
+            'duration',
+            'elevation',
+            'latitude',
+            'longitude',
+            'speed',
+        ]:
+            assert columnar_chart_data[key] == [
+                point[key] for point in chart_data
+            ]
+        start = columnar_chart_data['start']
+        assert start.microsecond == 0
+        assert [
+            start + timedelta(milliseconds=offset)
+            for offset in columnar_chart_data['time_offsets']
+        ] == [point['time'] for point in chart_data]
+
+    def test_it_returns_columnar_chart_data_with_polyline(
+        self, tmp_path: Path, gpx_file: str
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file)
+
+        chart_data = get_chart_data(
+            gpx_filepath, chart_format='columnar', with_polyline=True
+        )
+
+        assert isinstance(chart_data, dict)
+        assert 'latitude' not in chart_data
+        assert 'longitude' not in chart_data
+        assert chart_data['polyline'].startswith('}vuoGmgad@')
+
+    @pytest.mark.parametrize(
+        'input_segment_id, expected_message',
+        [(0, 'Incorrect segment id'), (4, "No segment with id '4'")],
+    )
+    def test_it_raises_error_when_segment_id_is_invalid(
+        self,
+        tmp_path: Path,
+        gpx_file_with_3_segments: str,
+        input_segment_id: int,
+        expected_message: str,
+    ) -> None:
+        gpx_filepath = write_gpx_file(tmp_path, gpx_file_with_3_segments)
+
+        with pytest.raises(WorkoutGPXException, match=expected_message):
+            get_chart_data(gpx_filepath, input_segment_id)
+
+
+class TestGetChartDataOnLargeTrack:
+    def test_it_returns_same_data_as_gpxpy_on_20k_points_track(
+        self, tmp_path: Path
+    ) -> None:
+        gpx_content = generate_gpx(
+            seed=0, points_count=20000, missing_elevation_ratio=0.05
+        )
+        gpx_filepath = write_gpx_file(tmp_path, gpx_content)
+        write_track_data(gpx_filepath)
+
+        assert get_chart_data(gpx_filepath) == get_gpxpy_chart_data(
+            gpx_content
+        )
@@ -0,0 +1,354 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+import pytest
+import pytz
+from flask import Flask
+from gpxpy.gpx import GPXTrackPoint
+
+from fittrackee import db
+from fittrackee.files import get_absolute_file_path
+from fittrackee.users.models import User
+from fittrackee.workouts.models import Sport, Workout
+from fittrackee.workouts.utils.gpx_segments import write_segments_index
+from fittrackee.workouts.utils.gpx_storage import compress_gpx_file
+from fittrackee.workouts.utils.track_data import (
+    get_track_data_filepath,
+    write_track_data,
+)
+from fittrackee.workouts.utils.weather.base_weather import BaseWeather
+from fittrackee.workouts.utils.weather_backfill import (
+    RateLimiter,
+    backfill_weather,
+    get_workout_weather_points,
+)
+
+
+class StubWeather(BaseWeather):
+    """
+    Local weather provider returning point time, and raising an error for
+    given latitude
+    """
+
+    def __init__(self, error_latitude: Optional[float] = None) -> None:
+        super().__init__('api_key')
+        self.error_latitude = error_latitude
+        self.calls: List[GPXTrackPoint] = []
+
+    def _get_data(
+        self, latitude: float, longitude: float, time: datetime
+    ) -> Optional[Dict]:
+        self.calls.append(
+            GPXTrackPoint(latitude=latitude, longitude=longitude, time=time)
+        )
+        if latitude == self.error_latitude:
+            raise Exception('weather API error')
+        return {
+            'icon': 'clear-day',
+            'temperature': 10,
+            'humidity': 0.5,
+            'wind': 2,
+            'windBearing': 180,
+            'time': time.isoformat(),
+        }
+
+
+def store_workout_gpx_file(workout: Workout, gpx_file: str) -> None:
+    workout.gpx = f'workouts/{workout.user_id}/{workout.id}.gpx'
+    gpx_filepath = get_absolute_file_path(workout.gpx)
+    os.makedirs(os.path.dirname(gpx_filepath), exist_ok=True)
+    with open(gpx_filepath, 'w') as f:
+        f.write(gpx_file)
+    db.session.commit()
+
+
+def get_points_values(weather_points: List[GPXTrackPoint]) -> List:
+    return [
+        (point.latitude, point.longitude, point.elevation, point.time)
+        for point in weather_points
+    ]
+
+
+class TestGetWorkoutWeatherPoints:
+    expected_points = [
+        (
+            44.68095,
+            6.07367,
+            998.0,
+            datetime(2018, 3, 13, 12, 44, 45, tzinfo=pytz.utc),
+        ),
+        (
+            44.67822,
+            6.07442,
+            975.0,
+            datetime(2018, 3, 13, 12, 48, 55, tzinfo=pytz.utc),
+        ),
+    ]
+
+    @staticmethod
+    def write_gpx_file(tmp_path: str, gpx_file: str) -> str:
+        gpx_filepath = os.path.join(tmp_path, 'workout.gpx')
+        with open(gpx_filepath, 'w') as f:
+            f.write(gpx_file)
+        return gpx_filepath
+
+    def test_it_returns_first_and_last_points_from_file_end(
+        self, app: Flask, tmp_path: str, gpx_file: str
+    ) -> None:
+        gpx_filepath = self.write_gpx_file(tmp_path, gpx_file)
+
+        weather_points = get_workout_weather_points(gpx_filepath)
+
+        assert get_points_values(weather_points) == self.expected_points
+        assert not os.path.exists(get_track_data_filepath(gpx_filepath))
+
+    def test_it_returns_last_point_when_file_end_is_smaller_than_a_point(
+        self, app: Flask, tmp_path: str, gpx_file: str
+    ) -> None:
+        gpx_filepath = self.write_gpx_file(tmp_path, gpx_file)
+
+        with patch(
+            'fittrackee.workouts.utils.weather_backfill.GPX_FILE_TAIL_SIZE',
+            10,
+        ):
+            weather_points = get_workout_weather_points(gpx_filepath)
+
+        assert get_points_values(weather_points) == self.expected_points
+
+    def test_it_returns_first_and_last_points_from_compressed_file(
+        self, app: Flask, tmp_path: str, gpx_file: str
+    ) -> None:
+        gpx_filepath = compress_gpx_file(
+            self.write_gpx_file(tmp_path, gpx_file)
+        )
+
+        weather_points = get_workout_weather_points(gpx_filepath)
+
+        assert get_points_values(weather_points) == self.expected_points
+
+    def test_it_returns_last_point_from_segments_index(
+        self, app: Flask, tmp_path: str, gpx_file_with_segments: str
+    ) -> None:
+        gpx_filepath = self.write_gpx_file(tmp_path, gpx_file_with_segments)
+        write_segments_index(gpx_filepath)
+
+        with patch(
+            'fittrackee.workouts.utils.weather_backfill'
+            '._get_last_point_from_file_end'
+        ) as get_last_point_from_file_end_mock:
+            weather_points = get_workout_weather_points(gpx_filepath)
+
+        get_last_point_from_file_end_mock.assert_not_called()
+        assert get_points_values(weather_points) == self.expected_points
+
+    def test_it_returns_points_from_track_data_when_they_exist(
+        self, app: Flask, tmp_path: str, gpx_file: str
+    ) -> None:
+        gpx_filepath = self.write_gpx_file(tmp_path, gpx_file)
+        write_track_data(gpx_filepath)
+
+        with patch(
+            'fittrackee.workouts.utils.weather_backfill.GpxStreamParser'
+        ) as gpx_stream_parser_mock:
+            weather_points = get_workout_weather_points(gpx_filepath)
+
+        gpx_stream_parser_mock.assert_not_called()
+        assert get_points_values(weather_points) == self.expected_points
+
+    def test_it_returns_empty_list_when_gpx_file_has_no_track(
+        self, app: Flask, tmp_path: str, gpx_file_wo_track: str
+    ) -> None:
+        gpx_filepath = self.write_gpx_file(tmp_path, gpx_file_wo_track)
+
+        assert get_workout_weather_points(gpx_filepath) == []
+
+
+class TestBackfillWeather:
+    def test_it_updates_workouts_without_weather(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+        gpx_file: str,
+    ) -> None:
+        store_workout_gpx_file(workout_cycling_user_1, gpx_file)
+        weather_api = StubWeather()
+
+        counts = backfill_weather(weather_api, max_requests_per_second=0)
+
+        assert counts == {
+            'processed': 1,
+            'updated': 1,
+            'errors': 0,
+            'last_workout_id': workout_cycling_user_1.id,
+        }
+        workout = Workout.query.first()
+        assert workout.weather_start['time'] == '2018-03-13T12:44:45+00:00'
+        assert workout.weather_end['time'] == '2018-03-13T12:48:55+00:00'
+
+    def test_it_does_not_process_workouts_without_gpx(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        weather_api = StubWeather()
+
+        counts = backfill_weather(weather_api, max_requests_per_second=0)
+
+        assert counts['processed'] == 0
+        assert weather_api.calls == []
+
+    def test_it_does_not_process_workouts_with_weather(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+        gpx_file: str,
+    ) -> None:
+        workout_cycling_user_1.weather_start = {'icon': 'rain'}
+        workout_cycling_user_1.weather_end = {'icon': 'rain'}
+        store_workout_gpx_file(workout_cycling_user_1, gpx_file)
+        weather_api = StubWeather()
+
+        counts = backfill_weather(weather_api, max_requests_per_second=0)
+
+        assert counts['processed'] == 0
+        assert weather_api.calls == []
+
+    def test_it_processes_workouts_by_batch_from_given_id(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: List[Workout],
+        gpx_file: str,
+    ) -> None:
+        for workout in seven_workouts_user_1:
+            store_workout_gpx_file(workout, gpx_file)
+        from_id = seven_workouts_user_1[1].id
+        batches: List[Dict] = []
+
+        counts = backfill_weather(
+            StubWeather(),
+            batch_size=2,
+            max_requests_per_second=0,
+            from_id=from_id,
+            on_batch_end=lambda batch_counts: batches.append({**batch_counts}),
+        )
+
+        assert counts['processed'] == 5
+        assert [batch['processed'] for batch in batches] == [2, 4, 5]
+        assert (
+            Workout.query.filter(
+                Workout.id <= from_id,
+                Workout.weather_start != None,  # noqa
+            ).count()
+            == 0
+        )
+        assert (
+            Workout.query.filter(
+                Workout.id > from_id,
+                Workout.weather_start != None,  # noqa
+            ).count()
+            == 5
+        )
+
+    def test_it_stops_when_limit_is_reached(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: List[Workout],
+        gpx_file: str,
+    ) -> None:
+        for workout in seven_workouts_user_1:
+            store_workout_gpx_file(workout, gpx_file)
+
+        counts = backfill_weather(
+            StubWeather(), batch_size=2, max_requests_per_second=0, limit=3
+        )
+
+        assert counts['processed'] == 3
+        assert counts['last_workout_id'] == seven_workouts_user_1[2].id
+
+    def test_it_counts_error_when_weather_api_raises_exception(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+        gpx_file: str,
+    ) -> None:
+        store_workout_gpx_file(workout_cycling_user_1, gpx_file)
+
+        counts = backfill_weather(
+            StubWeather(error_latitude=44.68095), max_requests_per_second=0
+        )
+
+        assert counts['updated'] == 0
+        assert counts['errors'] == 1
+        assert Workout.query.first().weather_start is None
+
+    def test_it_counts_error_when_gpx_file_is_missing(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout_cycling_user_1.gpx = 'workouts/1/missing.gpx'
+        db.session.commit()
+
+        counts = backfill_weather(StubWeather(), max_requests_per_second=0)
+
+        assert counts['processed'] == 1
+        assert counts['errors'] == 1
+
+
+class TestRateLimiter:
+    def test_it_spaces_calls(self) -> None:
+        rate_limiter = RateLimiter(max_calls_per_second=20)
+
+        with patch(
+            'fittrackee.workouts.utils.weather_backfill.time'
+        ) as time_mock:
+            time_mock.monotonic.return_value = 100.0
+            for _ in range(3):
+                rate_limiter.wait()
+
+        assert [
+            call_args[0][0] for call_args in time_mock.sleep.call_args_list
+        ] == [pytest.approx(0.05), pytest.approx(0.1)]
+
+    def test_it_does_not_wait_when_next_call_time_is_reached(self) -> None:
+        rate_limiter = RateLimiter(max_calls_per_second=20)
+
+        with patch(
+            'fittrackee.workouts.utils.weather_backfill.time'
+        ) as time_mock:
+            time_mock.monotonic.side_effect = [100.0, 100.1, 100.2]
+            for _ in range(3):
+                rate_limiter.wait()
+
+        time_mock.sleep.assert_not_called()
+
+    @pytest.mark.parametrize('input_rate', [0, -1])
+    def test_it_does_not_wait_when_rate_is_not_positive(
+        self, input_rate: float
+    ) -> None:
+        rate_limiter = RateLimiter(max_calls_per_second=input_rate)
+
+        with patch(
+            'fittrackee.workouts.utils.weather_backfill.time'
+        ) as time_mock:
+            time_mock.monotonic.return_value = 100.0
+            for _ in range(10):
+                rate_limiter.wait()
+
+        time_mock.sleep.assert_not_called()
@@ -1,15 +1,18 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, Optional
 from unittest.mock import Mock, patch, sentinel
 
 import pytest
 import pytz
-import requests
 from gpxpy.gpx import GPXTrackPoint
 
 from fittrackee.tests.mixins import CallArgsMixin
 from fittrackee.tests.utils import random_string
-from fittrackee.workouts.utils.weather.visual_crossing import VisualCrossing
+from fittrackee.workouts.utils.weather.visual_crossing import (
+    VisualCrossing,
+    weather_cache,
+    weather_session,
+)
 from fittrackee.workouts.utils.weather.weather_service import WeatherService
 
 VISUAL_CROSSING_RESPONSE = {
@@ -49,6 +52,10 @@ VISUAL_CROSSING_RESPONSE = {
 class WeatherTestCase:
     api_key = random_string()
 
+    @staticmethod
+    def setup_method() -> None:
+        weather_cache.clear()
+
     @staticmethod
     def get_gpx_point(time: Optional[datetime] = None) -> GPXTrackPoint:
         return GPXTrackPoint(latitude=48.866667, longitude=2.333333, time=time)
@@ -109,7 +116,9 @@ class TestVisualCrossingGetWeather(WeatherTestCase, CallArgsMixin):
         )
         point = self.get_gpx_point(time)
         visual_crossing = VisualCrossing(api_key=self.api_key)
-        with patch.object(requests, 'get') as get_mock:
+        with patch.object(
+            weather_session, 'get', return_value=self.get_response()
+        ) as get_mock:
             visual_crossing.get_weather(point)
 
         args = self.get_args(get_mock.call_args)
@@ -121,7 +130,9 @@ class TestVisualCrossingGetWeather(WeatherTestCase, CallArgsMixin):
 
     def test_it_calls_api_with_expected_params(self) -> None:
         visual_crossing = VisualCrossing(api_key=self.api_key)
-        with patch.object(requests, 'get') as get_mock:
+        with patch.object(
+            weather_session, 'get', return_value=self.get_response()
+        ) as get_mock:
             visual_crossing.get_weather(self.get_gpx_point(datetime.utcnow()))
 
         kwargs = self.get_kwargs(get_mock.call_args)
@@ -150,7 +161,82 @@ class TestVisualCrossingGetWeather(WeatherTestCase, CallArgsMixin):
             ).astimezone(pytz.timezone('Europe/Paris'))
         )
         visual_crossing = VisualCrossing(api_key=self.api_key)
-        with patch.object(requests, 'get', return_value=self.get_response()):
+        with patch.object(
+            weather_session, 'get', return_value=self.get_response()
+        ):
+            weather_data = visual_crossing.get_weather(point)
+
+        current_conditions: Dict = VISUAL_CROSSING_RESPONSE[  # type: ignore
+            'currentConditions'
+        ]
+        assert weather_data == {
+            'icon': current_conditions['icon'],
+            'temperature': current_conditions['temp'],
+            'humidity': current_conditions['humidity'] / 100,
+            'wind': (current_conditions['windspeed'] * 1000) / 3600,
+            'windBearing': current_conditions['winddir'],
+        }
+
+    def test_it_returns_cached_data_for_nearby_point_at_same_hour(
+        self,
+    ) -> None:
+        time = datetime(2022, 11, 15, 13, 10, tzinfo=pytz.utc)
+        visual_crossing = VisualCrossing(api_key=self.api_key)
+        with patch.object(
+            weather_session, 'get', return_value=self.get_response()
+        ) as get_mock:
+            weather_data = visual_crossing.get_weather(
+                self.get_gpx_point(time)
+            )
+
+            cached_weather_data = visual_crossing.get_weather(
+                GPXTrackPoint(
+                    latitude=48.868,
+                    longitude=2.334,
+                    time=time + timedelta(minutes=15),
+                )
+            )
+
+        get_mock.assert_called_once()
+        assert cached_weather_data == weather_data
+
+    def test_it_calls_api_when_hour_is_different(self) -> None:
+        time = datetime(2022, 11, 15, 13, 10, tzinfo=pytz.utc)
+        visual_crossing = VisualCrossing(api_key=self.api_key)
+        with patch.object(
+            weather_session, 'get', return_value=self.get_response()
+        ) as get_mock:
+            visual_crossing.get_weather(self.get_gpx_point(time))
+
+            visual_crossing.get_weather(
+                self.get_gpx_point(time + timedelta(minutes=30))
+            )
+
+        assert get_mock.call_count == 2
+
+    def test_it_does_not_cache_data_on_error(self) -> None:
+        point = self.get_gpx_point(datetime.utcnow())
+        visual_crossing = VisualCrossing(api_key=self.api_key)
+        response_mock = self.get_response()
+        response_mock.raise_for_status.side_effect = Exception()
+        with patch.object(
+            weather_session, 'get', return_value=response_mock
+        ), pytest.raises(Exception):
+            visual_crossing.get_weather(point)
+
+        with patch.object(
+            weather_session, 'get', return_value=self.get_response()
+        ) as get_mock:
+            visual_crossing.get_weather(point)
+
+        get_mock.assert_called_once()
+
+    def test_it_returns_data_when_data_can_not_be_cached(self) -> None:
+        point = self.get_gpx_point(datetime.utcnow())
+        visual_crossing = VisualCrossing(api_key=self.api_key)
+        with patch.object(
+            weather_session, 'get', return_value=self.get_response()
+        ), patch.object(weather_cache, 'set', side_effect=Exception()):
             weather_data = visual_crossing.get_weather(point)
 
         current_conditions: Dict = VISUAL_CROSSING_RESPONSE[  # type: ignore
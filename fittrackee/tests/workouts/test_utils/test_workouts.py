@@ -1,18 +1,29 @@
+import gzip
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from statistics import mean
-from typing import List, Union
+from typing import Any, Dict, List, Union
+from unittest.mock import patch
 
 import pytest
 import pytz
 from flask import Flask
 from gpxpy.gpxfield import SimpleTZ
 
+from fittrackee import db
+from fittrackee.files import get_absolute_file_path
 from fittrackee.users.models import User
-from fittrackee.workouts.models import Sport, Workout
+from fittrackee.workouts.models import Record, Sport, Workout, WorkoutUpload
 from fittrackee.workouts.utils.workouts import (
+    compress_workouts_gpx_files,
     create_segment,
     get_average_speed,
+    get_parsing_executor,
     get_workout_datetime,
+    process_workout_upload,
+    rebuild_records,
+    save_workouts,
 )
 
 utc_datetime = datetime(
@@ -148,3 +159,336 @@ class TestCreateSegment:
         )
 
         assert segment.duration.microseconds == 0
+
+
+class TestGetParsingExecutor:
+    def test_it_returns_process_pool_when_processes_are_configured(
+        self,
+    ) -> None:
+        with get_parsing_executor(2) as executor:
+            assert isinstance(executor, ProcessPoolExecutor)
+            assert executor._max_workers == 2  # type: ignore
+
+    def test_it_returns_thread_pool_when_no_processes_are_configured(
+        self,
+    ) -> None:
+        with get_parsing_executor(0) as executor:
+            assert isinstance(executor, ThreadPoolExecutor)
+
+    def test_it_returns_shared_process_pool_using_spawn_method(
+        self,
+    ) -> None:
+        with get_parsing_executor(2) as executor:
+            pass
+        with get_parsing_executor(2) as other_executor:
+            assert other_executor is executor
+        assert (
+            executor._mp_context.get_start_method() == 'spawn'  # type: ignore
+        )
+
+    def test_it_returns_new_process_pool_when_processes_change(
+        self,
+    ) -> None:
+        with get_parsing_executor(2) as executor:
+            pass
+        with get_parsing_executor(3) as other_executor:
+            assert other_executor is not executor
+            assert other_executor._max_workers == 3  # type: ignore
+
+
+def get_file_content(file_path: str) -> bytes:
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+class TestProcessWorkoutUpload:
+    @staticmethod
+    def create_workout_upload(
+        user: User, file_name: str, content: bytes
+    ) -> WorkoutUpload:
+        extension = file_name.rsplit('.', 1)[1]
+        file_path = f'workouts/{user.id}/uploads/upload.{extension}'
+        absolute_file_path = get_absolute_file_path(file_path)
+        os.makedirs(os.path.dirname(absolute_file_path), exist_ok=True)
+        with open(absolute_file_path, 'wb') as f:
+            f.write(content)
+        workout_upload = WorkoutUpload(
+            user_id=user.id,
+            file_name=file_name,
+            file_path=file_path,
+            workout_data={'sport_id': 1},
+        )
+        db.session.add(workout_upload)
+        db.session.commit()
+        return workout_upload
+
+    @staticmethod
+    def assert_upload_files_are_deleted(user: User) -> None:
+        assert (
+            os.listdir(get_absolute_file_path(f'workouts/{user.id}/uploads'))
+            == []
+        )
+
+    def test_it_creates_workout_from_gpx_file(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        workout_upload = self.create_workout_upload(
+            user_1, 'test.gpx', str.encode(gpx_file)
+        )
+
+        workouts_ids = process_workout_upload(workout_upload.id)
+
+        workout = Workout.query.one()
+        assert workouts_ids == [workout.id]
+        assert workout_upload.status == 'successful'
+        assert workout_upload.files_count == 1
+        assert workout_upload.processed_files_count == 1
+        assert workout_upload.workouts == [workout.short_id]
+        assert workout_upload.errors == []
+        self.assert_upload_files_are_deleted(user_1)
+
+    def test_it_continues_processing_archive_when_a_file_is_invalid(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        workout_upload = self.create_workout_upload(
+            user_1,
+            'gpx_test.zip',
+            get_file_content(
+                os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+            ),
+        )
+        calls_count = 0
+
+        def create_segment_failing_on_second_workout(*args: Any) -> Any:
+            # archive workouts are saved at once (2nd call fails), then one
+            # by one to find workout in error (4th call fails)
+            nonlocal calls_count
+            calls_count += 1
+            if calls_count in [2, 4]:
+                raise Exception()
+            return create_segment(*args)
+
+        with patch(
+            'fittrackee.workouts.utils.workouts.create_segment',
+            side_effect=create_segment_failing_on_second_workout,
+        ):
+            process_workout_upload(workout_upload.id)
+
+        workouts = Workout.query.order_by(Workout.id).all()
+        assert len(workouts) == 2
+        assert workout_upload.status == 'successful'
+        assert workout_upload.files_count == 3
+        assert workout_upload.processed_files_count == 3
+        assert workout_upload.workouts == [
+            workout.short_id for workout in workouts
+        ]
+        assert workout_upload.errors == [
+            {'file': 'test_2.gpx', 'error': 'error when saving workout'}
+        ]
+        assert (
+            len(
+                [
+                    name
+                    for name in os.listdir(
+                        get_absolute_file_path(f'workouts/{user_1.id}')
+                    )
+                    if name.endswith('.gpx')
+                ]
+            )
+            == 2
+        )
+        self.assert_upload_files_are_deleted(user_1)
+
+    def test_it_updates_progress_after_each_saved_chunk(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        workout_upload = self.create_workout_upload(
+            user_1,
+            'gpx_test.zip',
+            get_file_content(
+                os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+            ),
+        )
+        processed_files_counts = []
+
+        def save_workouts_and_get_progress(*args: Any) -> Any:
+            processed_files_counts.append(workout_upload.processed_files_count)
+            return save_workouts(*args)
+
+        with patch(
+            'fittrackee.workouts.utils.workouts.WORKOUTS_SAVE_CHUNK_SIZE', 2
+        ), patch(
+            'fittrackee.workouts.utils.workouts.save_workouts',
+            side_effect=save_workouts_and_get_progress,
+        ):
+            process_workout_upload(workout_upload.id)
+
+        assert processed_files_counts == [0, 2]
+        assert workout_upload.status == 'successful'
+        assert workout_upload.processed_files_count == 3
+        assert len(workout_upload.workouts) == 3
+
+    def test_it_sets_errored_status_when_archive_exceeds_files_limit(
+        self,
+        app_with_max_workouts: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+    ) -> None:
+        workout_upload = self.create_workout_upload(
+            user_1,
+            'gpx_test.zip',
+            get_file_content(
+                os.path.join(
+                    app_with_max_workouts.root_path, 'tests/files/gpx_test.zip'
+                )
+            ),
+        )
+
+        process_workout_upload(workout_upload.id)
+
+        assert Workout.query.count() == 0
+        assert workout_upload.status == 'errored'
+        assert workout_upload.processed_files_count == 0
+        assert workout_upload.workouts == []
+        assert workout_upload.errors == [
+            {
+                'file': 'gpx_test.zip',
+                'error': (
+                    'the number of files in the archive exceeds the limit'
+                ),
+            }
+        ]
+        self.assert_upload_files_are_deleted(user_1)
+
+    def test_it_does_not_process_upload_twice(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        workout_upload = self.create_workout_upload(
+            user_1, 'test.gpx', str.encode(gpx_file)
+        )
+        workout_upload.status = 'in_progress'
+        db.session.commit()
+
+        process_workout_upload(workout_upload.id)
+
+        assert Workout.query.count() == 0
+        assert workout_upload.status == 'in_progress'
+
+
+class TestCompressWorkoutsGpxFiles:
+    @staticmethod
+    def store_gpx_file(workout: Workout, gpx_file: str) -> str:
+        workout.gpx = f'workouts/{workout.user_id}/{workout.id}.gpx'
+        gpx_filepath = get_absolute_file_path(workout.gpx)
+        os.makedirs(os.path.dirname(gpx_filepath), exist_ok=True)
+        with open(gpx_filepath, 'w') as f:
+            f.write(gpx_file)
+        db.session.commit()
+        return gpx_filepath
+
+    def test_it_compresses_gpx_files_and_updates_workouts(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        seven_workouts_user_1: List[Workout],
+        gpx_file: str,
+    ) -> None:
+        gpx_filepaths = [
+            self.store_gpx_file(workout, gpx_file)
+            for workout in seven_workouts_user_1[:3]
+        ]
+        batches: List[Dict] = []
+
+        counts = compress_workouts_gpx_files(
+            batch_size=2,
+            on_batch_end=lambda batch_counts: batches.append({**batch_counts}),
+        )
+
+        assert counts['compressed'] == 3
+        assert counts['errors'] == 0
+        assert counts['freed_space'] > 0
+        assert [batch['compressed'] for batch in batches] == [2, 3]
+        for workout, gpx_filepath in zip(
+            seven_workouts_user_1[:3], gpx_filepaths
+        ):
+            assert workout.gpx.endswith('.gpx.gz')
+            assert not os.path.exists(gpx_filepath)
+            with gzip.open(get_absolute_file_path(workout.gpx), 'rt') as f:
+                assert f.read() == gpx_file
+
+    def test_it_does_not_compress_compressed_gpx_files(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+        gpx_file: str,
+    ) -> None:
+        self.store_gpx_file(workout_cycling_user_1, gpx_file)
+        compress_workouts_gpx_files()
+
+        counts = compress_workouts_gpx_files()
+
+        assert counts['compressed'] == 0
+        assert workout_cycling_user_1.gpx.endswith('.gpx.gz')
+
+    def test_it_counts_error_when_gpx_file_is_missing(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout_cycling_user_1.gpx = 'workouts/1/missing.gpx'
+        db.session.commit()
+
+        counts = compress_workouts_gpx_files()
+
+        assert counts['compressed'] == 0
+        assert counts['errors'] == 1
+        assert workout_cycling_user_1.gpx == 'workouts/1/missing.gpx'
+
+
+class TestRebuildRecords:
+    def test_it_recomputes_records_of_all_users(
+        self,
+        app: Flask,
+        user_1: User,
+        user_2: User,
+        sport_1_cycling: Sport,
+        sport_2_running: Sport,
+        workout_cycling_user_1: Workout,
+        workout_running_user_1: Workout,
+        workout_cycling_user_2: Workout,
+    ) -> None:
+        expected_records = sorted(
+            (
+                record.user_id,
+                record.sport_id,
+                record.record_type,
+                record._value,
+            )
+            for record in Record.query.all()
+        )
+        Record.query.filter_by(sport_id=sport_2_running.id).delete()
+        Record.query.filter_by(record_type='FD').update({'_value': 1})
+        db.session.commit()
+        users: List[int] = []
+
+        users_count = rebuild_records(on_user_end=users.append)
+
+        assert users_count == 2
+        assert users == [user_1.id, user_2.id]
+        assert (
+            sorted(
+                (
+                    record.user_id,
+                    record.sport_id,
+                    record.record_type,
+                    record._value,
+                )
+                for record in Record.query.all()
+            )
+            == expected_records
+        )
@@ -1,15 +1,18 @@
+import gzip
 import json
+import os
 from datetime import timedelta
 from typing import List
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 from uuid import uuid4
 
 import pytest
 from flask import Flask
 
 from fittrackee import db
+from fittrackee.files import get_absolute_file_path
 from fittrackee.users.models import User
-from fittrackee.workouts.models import Sport, Workout
+from fittrackee.workouts.models import Sport, Workout, WorkoutUpload
 
 from ..mixins import ApiTestCaseMixin
 from ..utils import jsonify_dict
@@ -1448,6 +1451,88 @@ class TestDownloadWorkoutGpx(ApiTestCaseMixin):
             as_attachment=True,
         )
 
+    @staticmethod
+    def store_compressed_gpx_file(workout: Workout, gpx_file: str) -> None:
+        workout.gpx = f'workouts/{workout.user_id}/file.gpx.gz'
+        gpx_filepath = get_absolute_file_path(workout.gpx)
+        os.makedirs(os.path.dirname(gpx_filepath), exist_ok=True)
+        with gzip.open(gpx_filepath, 'wt') as f:
+            f.write(gpx_file)
+        db.session.commit()
+
+    def test_it_returns_compressed_gpx_file_when_client_accepts_gzip(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+        gpx_file: str,
+    ) -> None:
+        self.store_compressed_gpx_file(workout_cycling_user_1, gpx_file)
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        response = client.get(
+            f'/api/workouts/{workout_cycling_user_1.short_id}/gpx/download',
+            headers={
+                'Authorization': f'Bearer {auth_token}',
+                'Accept-Encoding': 'gzip, deflate',
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert 'filename=file.gpx' in response.headers['Content-Disposition']
+        assert gzip.decompress(response.data).decode() == gpx_file
+
+    def test_it_returns_decompressed_gpx_file_when_client_does_not_accept_gzip(  # noqa
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+        gpx_file: str,
+    ) -> None:
+        self.store_compressed_gpx_file(workout_cycling_user_1, gpx_file)
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        response = client.get(
+            f'/api/workouts/{workout_cycling_user_1.short_id}/gpx/download',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.headers['Content-Disposition'] == (
+            'attachment; filename=file.gpx'
+        )
+        assert response.data.decode() == gpx_file
+
+    def test_it_returns_404_if_compressed_gpx_file_does_not_exist(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        workout_cycling_user_1.gpx = 'workouts/1/missing.gpx.gz'
+        db.session.commit()
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        response = client.get(
+            f'/api/workouts/{workout_cycling_user_1.short_id}/gpx/download',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        self.assert_404_with_message(response, 'gpx file does not exist')
+
     @pytest.mark.parametrize(
         'client_scope, can_access',
         [
@@ -1485,3 +1570,219 @@ class TestDownloadWorkoutGpx(ApiTestCaseMixin):
         )
 
         self.assert_response_scope(response, can_access)
+
+
+class TestGetWorkoutUpload(ApiTestCaseMixin):
+    @staticmethod
+    def create_workout_upload(user: User) -> WorkoutUpload:
+        workout_upload = WorkoutUpload(
+            user_id=user.id,
+            file_name='workouts.zip',
+            file_path=f'workouts/{user.id}/uploads/workouts.zip',
+            workout_data={'sport_id': 1},
+        )
+        db.session.add(workout_upload)
+        db.session.commit()
+        return workout_upload
+
+    def test_it_returns_error_if_user_is_not_authenticated(
+        self, app: Flask, user_1: User
+    ) -> None:
+        workout_upload = self.create_workout_upload(user_1)
+        client = app.test_client()
+
+        response = client.get(
+            f'/api/workouts/uploads/{workout_upload.short_id}'
+        )
+
+        self.assert_401(response)
+
+    def test_it_returns_404_if_upload_does_not_exist(
+        self, app: Flask, user_1: User
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        upload_id = get_random_short_id()
+
+        response = client.get(
+            f'/api/workouts/uploads/{upload_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        self.assert_404_with_message(
+            response, f'upload not found (id: {upload_id})'
+        )
+
+    def test_it_returns_404_if_upload_belongs_to_another_user(
+        self, app: Flask, user_1: User, user_2: User
+    ) -> None:
+        workout_upload = self.create_workout_upload(user_2)
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        response = client.get(
+            f'/api/workouts/uploads/{workout_upload.short_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        self.assert_404_with_message(
+            response,
+            f'upload not found (id: {workout_upload.short_id})',
+        )
+
+    def test_it_returns_upload_progress(
+        self, app: Flask, user_1: User
+    ) -> None:
+        workout_upload = self.create_workout_upload(user_1)
+        workout_upload.status = 'in_progress'
+        workout_upload.files_count = 3
+        workout_upload.processed_files_count = 1
+        workout_upload.errors = [
+            {'file': 'test_1.gpx', 'error': 'no tracks in gpx file'}
+        ]
+        db.session.commit()
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        response = client.get(
+            f'/api/workouts/uploads/{workout_upload.short_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data.decode())
+        assert data['status'] == 'success'
+        assert data['data']['upload'] == jsonify_dict(
+            workout_upload.serialize()
+        )
+
+    @pytest.mark.parametrize(
+        'client_scope, can_access',
+        [
+            ('application:write', False),
+            ('profile:read', False),
+            ('profile:write', False),
+            ('users:read', False),
+            ('users:write', False),
+            ('workouts:read', True),
+            ('workouts:write', False),
+        ],
+    )
+    def test_expected_scopes_are_defined(
+        self,
+        app: Flask,
+        user_1: User,
+        client_scope: str,
+        can_access: bool,
+    ) -> None:
+        workout_upload = self.create_workout_upload(user_1)
+        (
+            client,
+            oauth_client,
+            access_token,
+            _,
+        ) = self.create_oauth2_client_and_issue_token(
+            app, user_1, scope=client_scope
+        )
+
+        response = client.get(
+            f'/api/workouts/uploads/{workout_upload.short_id}',
+            content_type='application/json',
+            headers=dict(Authorization=f'Bearer {access_token}'),
+        )
+
+        self.assert_response_scope(response, can_access)
+
+
+class TestGetMapTile(ApiTestCaseMixin):
+    @staticmethod
+    def get_tiles_session_mock(
+        status_code: int = 200, content: bytes = b'\x89PNG tile'
+    ) -> Mock:
+        session_mock = Mock()
+        session_mock.get.return_value = Mock(
+            status_code=status_code,
+            content=content,
+            headers={'content-type': 'image/png'},
+        )
+        return session_mock
+
+    def test_it_returns_tile_from_tile_server(self, app: Flask) -> None:
+        client = app.test_client()
+        session_mock = self.get_tiles_session_mock()
+
+        with patch(
+            'fittrackee.workouts.utils.maps.tiles_session', session_mock
+        ):
+            response = client.get('/api/workouts/map_tile/a/13/4109/2930.png')
+
+        assert response.status_code == 200
+        assert response.data == b'\x89PNG tile'
+        assert response.content_type == 'image/png'
+        assert response.headers['Cache-Control'] == 'public, max-age=86400'
+        assert response.headers['ETag']
+        session_mock.get.assert_called_once_with(
+            'https://a.tile.openstreetmap.org/13/4109/2930.png',
+            headers={'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:88.0)'},
+            timeout=30,
+        )
+
+    def test_it_returns_cached_tile_on_second_request(
+        self, app: Flask
+    ) -> None:
+        client = app.test_client()
+        session_mock = self.get_tiles_session_mock()
+
+        with patch(
+            'fittrackee.workouts.utils.maps.tiles_session', session_mock
+        ):
+            first_response = client.get(
+                '/api/workouts/map_tile/a/13/4109/2930.png'
+            )
+            response = client.get('/api/workouts/map_tile/b/13/4109/2930.png')
+
+        assert response.status_code == 200
+        assert response.data == b'\x89PNG tile'
+        assert response.content_type == 'image/png'
+        assert response.headers['ETag'] == first_response.headers['ETag']
+        session_mock.get.assert_called_once()
+
+    def test_it_returns_304_when_tile_matches_etag(self, app: Flask) -> None:
+        client = app.test_client()
+        session_mock = self.get_tiles_session_mock()
+
+        with patch(
+            'fittrackee.workouts.utils.maps.tiles_session', session_mock
+        ):
+            etag = client.get(
+                '/api/workouts/map_tile/a/13/4109/2930.png'
+            ).headers['ETag']
+            response = client.get(
+                '/api/workouts/map_tile/a/13/4109/2930.png',
+                headers={'If-None-Match': etag},
+            )
+
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_it_returns_tile_server_error_without_caching_it(
+        self, app: Flask
+    ) -> None:
+        client = app.test_client()
+        session_mock = self.get_tiles_session_mock(
+            status_code=404, content=b'not found'
+        )
+
+        with patch(
+            'fittrackee.workouts.utils.maps.tiles_session', session_mock
+        ):
+            client.get('/api/workouts/map_tile/a/13/4109/2930.png')
+            response = client.get('/api/workouts/map_tile/a/13/4109/2930.png')
+
+        assert response.status_code == 404
+        assert 'ETag' not in response.headers
+        assert 'Cache-Control' not in response.headers
+        assert session_mock.get.call_count == 2
@@ -1,16 +1,36 @@
+import gzip
 import json
 import os
 from datetime import datetime
 from io import BytesIO
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from unittest.mock import Mock, patch
+from uuid import uuid4
 
 import pytest
 from flask import Flask
+from PIL import Image
 
 from fittrackee import VERSION
+from fittrackee.files import get_absolute_file_path
 from fittrackee.users.models import User
-from fittrackee.workouts.models import Sport, Workout
+from fittrackee.workouts.models import (
+    Record,
+    Sport,
+    Workout,
+    WorkoutSegment,
+    WorkoutUpload,
+    update_records,
+)
+from fittrackee.workouts.tasks import generate_map_image
+from fittrackee.workouts.utils.gpx import chart_data_cache
+from fittrackee.workouts.utils.gpx_segments import get_segments_index_filepath
+from fittrackee.workouts.utils.track_data import get_track_data_filepath
+from fittrackee.workouts.utils.workouts import (
+    create_segment,
+    extract_gpx_file,
+    process_workout_upload,
+)
 
 from ..mixins import ApiTestCaseMixin, CallArgsMixin
 
@@ -365,6 +385,62 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
             == f"workouts/1/2018-03-13_12-44-45_1_{expected_suffix}.png"
         )
 
+    def test_it_stores_track_data_file_next_to_gpx_file(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+
+        workout = Workout.query.first()
+        assert os.path.exists(
+            get_track_data_filepath(get_absolute_file_path(workout.gpx))
+        )
+
+    def test_it_stores_compressed_gpx_file_when_compression_is_enabled(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        with patch.dict(app.config, {'GPX_COMPRESSION': True}):
+            response = client.post(
+                '/api/workouts',
+                data=dict(
+                    file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                    data='{"sport_id": 1}',
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+
+        assert response.status_code == 201
+        workout = Workout.query.first()
+        assert workout.gpx.endswith('.gpx.gz')
+        absolute_gpx_filepath = get_absolute_file_path(workout.gpx)
+        with gzip.open(absolute_gpx_filepath, 'rt') as f:
+            assert f.read() == gpx_file
+        assert not os.path.exists(absolute_gpx_filepath[: -len('.gz')])
+        assert os.path.exists(get_track_data_filepath(absolute_gpx_filepath))
+        assert os.path.exists(
+            get_segments_index_filepath(absolute_gpx_filepath)
+        )
+
     def test_it_adds_a_workout_with_gpx_without_name(
         self,
         app: Flask,
@@ -542,7 +618,7 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
         client, auth_token = self.get_test_client_and_auth_token(
             app, user_1.email
         )
-        client.post(
+        response = client.post(
             '/api/workouts',
             data=dict(
                 file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
@@ -554,6 +630,15 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
             ),
         )
 
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+
+        client.get(
+            f'/api/workouts/map/{map_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
         call_args = self.get_args(static_map_get_mock.call_args)
         assert (
             app.config['TILE_SERVER']['URL']
@@ -573,7 +658,7 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
         client, auth_token = self.get_test_client_and_auth_token(
             app, user_1.email
         )
-        client.post(
+        response = client.post(
             '/api/workouts',
             data=dict(
                 file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
@@ -585,6 +670,15 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
             ),
         )
 
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+
+        client.get(
+            f'/api/workouts/map/{map_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
         call_kwargs = self.get_kwargs(static_map_get_mock.call_args)
 
         assert call_kwargs['headers'] == {
@@ -602,7 +696,7 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
         client, auth_token = self.get_test_client_and_auth_token(
             app_default_static_map, user_1.email
         )
-        client.post(
+        response = client.post(
             '/api/workouts',
             data=dict(
                 file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
@@ -614,6 +708,15 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
             ),
         )
 
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+
+        client.get(
+            f'/api/workouts/map/{map_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
         call_args = self.get_args(static_map_get_mock.call_args)
         assert (
             app_default_static_map.config['TILE_SERVER']['URL']
@@ -633,7 +736,7 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
         client, auth_token = self.get_test_client_and_auth_token(
             app_default_static_map, user_1.email
         )
-        client.post(
+        response = client.post(
             '/api/workouts',
             data=dict(
                 file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
@@ -645,12 +748,79 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
             ),
         )
 
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+
+        client.get(
+            f'/api/workouts/map/{map_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
         call_kwargs = self.get_kwargs(static_map_get_mock.call_args)
 
         assert call_kwargs['headers'] == {
             'User-Agent': f'FitTrackee v{VERSION}'
         }
 
+    def test_it_does_not_generate_map_on_upload(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        static_map_get_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        static_map_get_mock.reset_mock()
+
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+
+        assert response.status_code == 201
+        static_map_get_mock.assert_not_called()
+        workout = Workout.query.first()
+        assert workout.map_id is not None
+        assert not os.path.exists(get_absolute_file_path(workout.map))
+
+    def test_it_queues_map_generation(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        with patch(
+            'fittrackee.workouts.workouts.generate_map_image'
+        ) as generate_map_image_mock:
+            client.post(
+                '/api/workouts',
+                data=dict(
+                    file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                    data='{"sport_id": 1}',
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+
+        workout = Workout.query.first()
+        generate_map_image_mock.send.assert_called_once_with(
+            workout_id=workout.id
+        )
+
     def test_it_returns_500_if_gpx_file_has_not_tracks(
         self,
         app: Flask,
@@ -855,7 +1025,7 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
         )
 
         with patch(
-            'fittrackee.workouts.utils.workouts.generate_map',
+            'fittrackee.workouts.utils.workouts.get_weather_data',
             side_effect=Exception(),
         ):
             client.post(
@@ -891,7 +1061,7 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
         )
 
         with patch(
-            'fittrackee.workouts.utils.workouts.generate_map',
+            'fittrackee.workouts.utils.workouts.get_weather_data',
             side_effect=Exception(),
         ):
             client.post(
@@ -906,7 +1076,9 @@ class TestPostWorkoutWithGpx(ApiTestCaseMixin, CallArgsMixin):
                 ),
             )
 
-        assert_files_are_deleted(app, user_1, expected_count=2)
+        # gpx, track data and segments index files of first workout (map
+        # image is not generated yet)
+        assert_files_are_deleted(app, user_1, expected_count=3)
         upload_directory = os.path.join(app.config["UPLOAD_FOLDER"])
         workout = Workout.query.first()
         os.path.exists(os.path.join(upload_directory, workout.gpx))
@@ -1382,6 +1554,86 @@ class TestPostWorkoutWithZipArchive(ApiTestCaseMixin):
             assert segment['moving'] == '0:04:10'
             assert segment['pauses'] is None
 
+    def test_it_does_not_extract_non_gpx_files(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        file_path = os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+        # 'gpx_test.zip' contains 3 gpx files (same data) and 1 non-gpx file
+        with open(file_path, 'rb') as zip_file, patch(
+            'fittrackee.workouts.utils.workouts.extract_gpx_file',
+            wraps=extract_gpx_file,
+        ) as extract_gpx_file_mock:
+            client, auth_token = self.get_test_client_and_auth_token(
+                app, user_1.email
+            )
+
+            response = client.post(
+                '/api/workouts',
+                data=dict(
+                    file=(zip_file, 'gpx_test.zip'), data='{"sport_id": 1}'
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+
+        assert response.status_code == 201
+        assert [
+            call.args[1].filename
+            for call in extract_gpx_file_mock.call_args_list
+        ] == ['test_1.gpx', 'test_2.gpx', 'test_3.gpx']
+        uploaded_files = [
+            file_name
+            for _, _, file_names in os.walk(app.config['UPLOAD_FOLDER'])
+            for file_name in file_names
+        ]
+        assert 'fichier.doc' not in uploaded_files
+        assert not [
+            file_name
+            for file_name in uploaded_files
+            if file_name.startswith('import_')
+        ]
+        # 3 gpx files, 3 track data files and 3 segments index files
+        assert_files_are_deleted(app, user_1, expected_count=9)
+
+    def test_it_updates_records_once_for_archive_workouts(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        file_path = os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+        # 'gpx_test.zip' contains 3 gpx files (same data) and 1 non-gpx file
+        with open(file_path, 'rb') as zip_file, patch(
+            'fittrackee.workouts.models.update_records',
+            wraps=update_records,
+        ) as update_records_mock:
+            client, auth_token = self.get_test_client_and_auth_token(
+                app, user_1.email
+            )
+
+            response = client.post(
+                '/api/workouts',
+                data=dict(
+                    file=(zip_file, 'gpx_test.zip'), data='{"sport_id": 1}'
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+
+        assert response.status_code == 201
+        update_records_mock.assert_called_once()
+        first_workout = Workout.query.order_by(Workout.id).first()
+        records = Record.query.all()
+        assert {record.record_type for record in records} == {
+            'AS',
+            'FD',
+            'HA',
+            'LD',
+            'MS',
+        }
+        assert all(record.workout_id == first_workout.id for record in records)
+
     def test_it_returns_400_if_folder_is_present_in_zip_archive(
         self, app: Flask, user_1: User, sport_1_cycling: Sport
     ) -> None:
@@ -1536,6 +1788,88 @@ class TestPostWorkoutWithZipArchive(ApiTestCaseMixin):
             )
             assert 'data' not in data
 
+    @pytest.mark.parametrize('input_processes', [0, 2])
+    def test_it_adds_workouts_with_configured_concurrency(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        input_processes: int,
+    ) -> None:
+        app.config['WORKOUTS_IMPORT_PROCESSES'] = input_processes
+        app.config['WORKOUTS_IMPORT_THREADS'] = 2
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        file_path = os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+        # 'gpx_test.zip' contains 3 gpx files (same data) and 1 non-gpx file
+        with open(file_path, 'rb') as zip_file:
+            response = client.post(
+                '/api/workouts',
+                data=dict(
+                    file=(zip_file, 'gpx_test.zip'), data='{"sport_id": 1}'
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 201
+        assert len(data['data']['workouts']) == 3
+        for workout in Workout.query.all():
+            assert os.path.exists(get_absolute_file_path(workout.gpx))
+            assert os.path.exists(
+                get_track_data_filepath(get_absolute_file_path(workout.gpx))
+            )
+            assert os.path.exists(
+                get_segments_index_filepath(
+                    get_absolute_file_path(workout.gpx)
+                )
+            )
+            assert workout.map is not None
+            assert workout.map_id is not None
+        # gpx, track data and segments index files (map images are not
+        # generated yet)
+        assert_files_are_deleted(app, user_1, expected_count=9)
+
+    def test_it_deletes_files_of_unsaved_workouts_on_error(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        file_path = os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+        created_segments: List[WorkoutSegment] = []
+
+        def create_only_one_segment(*args: Any) -> WorkoutSegment:
+            if created_segments:
+                raise ValueError()
+            created_segments.append(create_segment(*args))
+            return created_segments[0]
+
+        # 'gpx_test.zip' contains 3 gpx files (same data) and 1 non-gpx file
+        with open(file_path, 'rb') as zip_file, patch(
+            'fittrackee.workouts.utils.workouts.create_segment',
+            side_effect=create_only_one_segment,
+        ):
+            response = client.post(
+                '/api/workouts',
+                data=dict(
+                    file=(zip_file, 'gpx_test.zip'), data='{"sport_id": 1}'
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+
+        self.assert_500(response, 'error when saving workout')
+        # workouts are saved at once
+        assert Workout.query.count() == 0
+        assert_files_are_deleted(app, user_1)
+
     def test_it_cleans_uploaded_file_on_error(
         self, app: Flask, user_1: User, sport_1_cycling: Sport
     ) -> None:
@@ -1545,7 +1879,7 @@ class TestPostWorkoutWithZipArchive(ApiTestCaseMixin):
         file_path = os.path.join(app.root_path, 'tests/files/gpx_test.zip')
         # 'gpx_test.zip' contains 3 gpx files (same data) and 1 non-gpx file
         with open(file_path, 'rb') as zip_file, patch(
-            'fittrackee.workouts.utils.workouts.generate_map',
+            'fittrackee.workouts.utils.workouts.get_weather_data',
             side_effect=Exception(),
         ):
             client.post(
@@ -1562,15 +1896,21 @@ class TestPostWorkoutWithZipArchive(ApiTestCaseMixin):
         assert_files_are_deleted(app, user_1)
 
 
-class TestPostAndGetWorkoutWithGpx(ApiTestCaseMixin):
-    def workout_assertion(
-        self, app: Flask, user_1: User, gpx_file: str, with_segments: bool
+class TestPostWorkoutAsynchronously(ApiTestCaseMixin):
+    def test_it_returns_202_and_queues_gpx_file_processing(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        process_upload_mock: Mock,
     ) -> None:
         client, auth_token = self.get_test_client_and_auth_token(
             app, user_1.email
         )
+
         response = client.post(
-            '/api/workouts',
+            '/api/workouts?async=true',
             data=dict(
                 file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
                 data='{"sport_id": 1}',
@@ -1581,30 +1921,181 @@ class TestPostAndGetWorkoutWithGpx(ApiTestCaseMixin):
             ),
         )
 
+        assert response.status_code == 202
         data = json.loads(response.data.decode())
-        assert response.status_code == 201
-        assert 'created' in data['status']
-        assert len(data['data']['workouts']) == 1
-        assert 'just a workout' == data['data']['workouts'][0]['title']
-        if with_segments:
-            assert_workout_data_with_gpx_segments(data)
-        else:
-            assert_workout_data_with_gpx(data)
-        map_id = data['data']['workouts'][0]['map']
-        workout_short_id = data['data']['workouts'][0]['id']
-
-        response = client.get(
-            f'/api/workouts/{workout_short_id}/gpx',
-            headers=dict(Authorization=f'Bearer {auth_token}'),
+        assert data['status'] == 'success'
+        workout_upload = WorkoutUpload.query.one()
+        assert data['data']['upload'] == {
+            'created_at': workout_upload.created_at.strftime(
+                '%a, %d %b %Y %H:%M:%S GMT'
+            ),
+            'errors': [],
+            'file_name': 'example.gpx',
+            'files_count': None,
+            'id': workout_upload.short_id,
+            'processed_files_count': 0,
+            'status': 'queued',
+            'workouts': [],
+        }
+        assert os.path.exists(get_absolute_file_path(workout_upload.file_path))
+        assert Workout.query.count() == 0
+        process_upload_mock.send.assert_called_once_with(
+            upload_id=workout_upload.id
         )
 
-        data = json.loads(response.data.decode())
-        assert response.status_code == 200
-        assert 'success' in data['status']
-        assert '' in data['message']
-        assert len(data['data']['gpx']) != ''
+    def test_it_returns_500_when_sport_does_not_exist(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        process_upload_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
 
-        response = client.get(
+        response = client.post(
+            '/api/workouts?async=true',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 2}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+
+        self.assert_500(response, 'Sport id: 2 does not exist')
+        assert WorkoutUpload.query.count() == 0
+        process_upload_mock.send.assert_not_called()
+
+    def test_it_returns_500_and_deletes_upload_when_task_is_not_queued(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        process_upload_mock: Mock,
+    ) -> None:
+        process_upload_mock.send.side_effect = Exception('broker error')
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        response = client.post(
+            '/api/workouts?async=true',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+
+        self.assert_500(response, 'error when queuing workout file processing')
+        assert WorkoutUpload.query.count() == 0
+        assert (
+            os.listdir(get_absolute_file_path(f'workouts/{user_1.id}/uploads'))
+            == []
+        )
+
+    def test_it_creates_workouts_from_zip_archive_when_upload_is_processed(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        process_upload_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        file_path = os.path.join(app.root_path, 'tests/files/gpx_test.zip')
+        # 'gpx_test.zip' contains 3 gpx files (same data) and 1 non-gpx file
+        with open(file_path, 'rb') as zip_file:
+            response = client.post(
+                '/api/workouts?async=true',
+                data=dict(
+                    file=(zip_file, 'gpx_test.zip'), data='{"sport_id": 1}'
+                ),
+                headers=dict(
+                    content_type='multipart/form-data',
+                    Authorization=f'Bearer {auth_token}',
+                ),
+            )
+        upload_id = json.loads(response.data.decode())['data']['upload']['id']
+
+        process_workout_upload(
+            process_upload_mock.send.call_args.kwargs['upload_id']
+        )
+
+        response = client.get(
+            f'/api/workouts/uploads/{upload_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+        assert response.status_code == 200
+        upload = json.loads(response.data.decode())['data']['upload']
+        assert upload['status'] == 'successful'
+        assert upload['files_count'] == 3
+        assert upload['processed_files_count'] == 3
+        assert upload['errors'] == []
+        assert upload['workouts'] == [
+            workout.short_id
+            for workout in Workout.query.order_by(Workout.id).all()
+        ]
+        assert len(upload['workouts']) == 3
+        assert (
+            os.listdir(get_absolute_file_path(f'workouts/{user_1.id}/uploads'))
+            == []
+        )
+
+
+class TestPostAndGetWorkoutWithGpx(ApiTestCaseMixin):
+    def workout_assertion(
+        self, app: Flask, user_1: User, gpx_file: str, with_segments: bool
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 201
+        assert 'created' in data['status']
+        assert len(data['data']['workouts']) == 1
+        assert 'just a workout' == data['data']['workouts'][0]['title']
+        if with_segments:
+            assert_workout_data_with_gpx_segments(data)
+        else:
+            assert_workout_data_with_gpx(data)
+        map_id = data['data']['workouts'][0]['map']
+        workout_short_id = data['data']['workouts'][0]['id']
+
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/gpx',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert 'success' in data['status']
+        assert '' in data['message']
+        assert len(data['data']['gpx']) != ''
+
+        response = client.get(
             f'/api/workouts/{workout_short_id}/gpx/segment/1',
             headers=dict(Authorization=f'Bearer {auth_token}'),
         )
@@ -1621,6 +2112,292 @@ class TestPostAndGetWorkoutWithGpx(ApiTestCaseMixin):
         )
         assert response.status_code == 200
 
+    def test_it_generates_map_on_first_request(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        static_map_get_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+        static_map_get_mock.reset_mock()
+
+        response = client.get(
+            f'/api/workouts/map/{map_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 200
+        assert response.data.startswith(b'\x89PNG')
+        static_map_get_mock.assert_called()
+        workout = Workout.query.first()
+        with open(get_absolute_file_path(workout.map), 'rb') as f:
+            assert f.read() == response.data
+
+    def test_it_does_not_generate_again_an_existing_map(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        static_map_get_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+        generate_map_image(workout_id=Workout.query.first().id)
+        static_map_get_mock.reset_mock()
+
+        response = client.get(
+            f'/api/workouts/map/{map_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 200
+        static_map_get_mock.assert_not_called()
+
+    def test_it_returns_map_with_cache_headers(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        static_map_get_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+
+        response = client.get(
+            f'/api/workouts/map/{map_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == (
+            'private, max-age=31536000, immutable'
+        )
+        assert response.headers['Vary'] == 'Accept'
+        assert response.headers['ETag']
+
+    def test_it_returns_304_when_map_is_not_modified(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        static_map_get_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+        response = client.get(
+            f'/api/workouts/map/{map_id}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        response = client.get(
+            f'/api/workouts/map/{map_id}',
+            headers={
+                'Authorization': f'Bearer {auth_token}',
+                'If-None-Match': response.headers['ETag'],
+            },
+        )
+
+        assert response.status_code == 304
+
+    def test_it_returns_webp_map_when_accepted(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        static_map_get_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+
+        response = client.get(
+            f'/api/workouts/map/{map_id}',
+            headers=dict(
+                Accept='image/avif,image/webp,*/*',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == 'image/webp'
+        assert response.data.startswith(b'RIFF')
+
+    def test_it_returns_png_map_when_format_is_provided(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        static_map_get_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+
+        response = client.get(
+            f'/api/workouts/map/{map_id}?format=png',
+            headers=dict(
+                Accept='image/webp,*/*',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == 'image/png'
+        assert 'Vary' not in response.headers
+
+    def test_it_returns_map_with_given_size(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        static_map_get_mock: Mock,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        map_id = json.loads(response.data.decode())['data']['workouts'][0][
+            'map'
+        ]
+
+        response = client.get(
+            f'/api/workouts/map/{map_id}?size=small',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        assert response.status_code == 200
+        with Image.open(BytesIO(response.data)) as image:
+            assert image.size == (200, 113)
+
+    @pytest.mark.parametrize(
+        'input_args, expected_message',
+        [('size=large', 'invalid size'), ('format=gif', 'invalid format')],
+    )
+    def test_it_returns_400_when_map_size_or_format_is_invalid(
+        self,
+        app: Flask,
+        user_1: User,
+        input_args: str,
+        expected_message: str,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+
+        response = client.get(
+            f'/api/workouts/map/{uuid4().hex}?{input_args}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        self.assert_400(response, expected_message)
+
     def test_it_gets_a_workout_created_with_gpx(
         self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
     ) -> None:
@@ -1699,6 +2476,239 @@ class TestPostAndGetWorkoutWithGpx(ApiTestCaseMixin):
         assert data['message'] == ''
         assert data['data']['chart_data'] != ''
 
+    @pytest.mark.parametrize(
+        'input_url',
+        [
+            '/api/workouts/{workout_short_id}/chart_data',
+            '/api/workouts/{workout_short_id}/chart_data/segment/1',
+        ],
+    )
+    def test_it_gets_downsampled_chart_data(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        input_url: str,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        workout_short_id = json.loads(response.data.decode())['data'][
+            'workouts'
+        ][0]['id']
+
+        response = client.get(
+            f'{input_url.format(workout_short_id=workout_short_id)}'
+            '?max_points=10',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        assert len(data['data']['chart_data']) == 10
+        assert data['data']['chart_data'][0]['duration'] == 0
+        assert data['data']['chart_data'][-1]['duration'] == 250
+
+    def test_it_gets_columnar_chart_data(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        workout_short_id = json.loads(response.data.decode())['data'][
+            'workouts'
+        ][0]['id']
+
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data'
+            '?format=columnar&polyline=true',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        data = json.loads(response.data.decode())
+        assert response.status_code == 200
+        chart_data = data['data']['chart_data']
+        assert chart_data['start'] == 'Tue, 13 Mar 2018 12:44:45 GMT'
+        assert chart_data['time_offsets'][0] == 0
+        assert chart_data['time_offsets'][-1] == 250000
+        assert chart_data['duration'][-1] == 250
+        assert len(chart_data['distance']) == 25
+        assert chart_data['polyline'].startswith('}vuoGmgad@')
+
+    def test_it_returns_400_when_chart_data_format_is_invalid(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        workout_short_id = json.loads(response.data.decode())['data'][
+            'workouts'
+        ][0]['id']
+
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data?format=invalid',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        self.assert_400(
+            response, 'invalid format, must be one of: objects, columnar'
+        )
+
+    @pytest.mark.parametrize('input_max_points', ['2', '-1', 'invalid'])
+    def test_it_returns_400_when_max_points_is_invalid(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        gpx_file: str,
+        input_max_points: str,
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        workout_short_id = json.loads(response.data.decode())['data'][
+            'workouts'
+        ][0]['id']
+
+        response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data'
+            f'?max_points={input_max_points}',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        self.assert_400(
+            response,
+            'max_points must be an integer greater than or equal to 3',
+        )
+
+    def test_it_returns_chart_data_from_cache_on_second_request(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        workout_short_id = json.loads(response.data.decode())['data'][
+            'workouts'
+        ][0]['id']
+        first_response = client.get(
+            f'/api/workouts/{workout_short_id}/chart_data',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        with patch(
+            'fittrackee.workouts.utils.gpx.get_chart_data'
+        ) as get_chart_data_mock:
+            response = client.get(
+                f'/api/workouts/{workout_short_id}/chart_data',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        get_chart_data_mock.assert_not_called()
+        assert response.status_code == 200
+        assert response.data == first_response.data
+        cache_stats = chart_data_cache.get_stats()
+        assert cache_stats['hits'] == 1
+        assert cache_stats['misses'] == 1
+        assert cache_stats['entries'] == 1
+
+    def test_it_does_not_return_cached_chart_data_after_workout_update(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        client, auth_token = self.get_test_client_and_auth_token(
+            app, user_1.email
+        )
+        response = client.post(
+            '/api/workouts',
+            data=dict(
+                file=(BytesIO(str.encode(gpx_file)), 'example.gpx'),
+                data='{"sport_id": 1}',
+            ),
+            headers=dict(
+                content_type='multipart/form-data',
+                Authorization=f'Bearer {auth_token}',
+            ),
+        )
+        workout_short_id = json.loads(response.data.decode())['data'][
+            'workouts'
+        ][0]['id']
+        client.get(
+            f'/api/workouts/{workout_short_id}/chart_data',
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+        client.patch(
+            f'/api/workouts/{workout_short_id}',
+            content_type='application/json',
+            data=json.dumps(dict(title='new title')),
+            headers=dict(Authorization=f'Bearer {auth_token}'),
+        )
+
+        with patch(
+            'fittrackee.workouts.utils.gpx.get_chart_data', return_value=[]
+        ) as get_chart_data_mock:
+            response = client.get(
+                f'/api/workouts/{workout_short_id}/chart_data',
+                headers=dict(Authorization=f'Bearer {auth_token}'),
+            )
+
+        get_chart_data_mock.assert_called_once()
+        assert response.status_code == 200
+
     def test_it_returns_403_on_getting_chart_data_if_workout_belongs_to_another_user(  # noqa
         self,
         app: Flask,
@@ -1,8 +1,13 @@
+import os
+
 import pytest
 from flask import Flask
 
+from fittrackee.files import get_absolute_file_path
 from fittrackee.users.models import User
 from fittrackee.workouts.models import Sport, Workout
+from fittrackee.workouts.utils.gpx import chart_data_cache
+from fittrackee.workouts.utils.track_data import get_track_data_filepath
 
 from ..mixins import ApiTestCaseMixin
 from .utils import get_random_short_id, post_a_workout
@@ -27,6 +32,39 @@ class TestDeleteWorkoutWithGpx(ApiTestCaseMixin):
 
         assert response.status_code == 204
 
+    def test_it_deletes_track_data_file(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        token, workout_short_id = post_a_workout(app, gpx_file)
+        track_data_filepath = get_track_data_filepath(
+            get_absolute_file_path(Workout.query.first().gpx)
+        )
+        client = app.test_client()
+
+        client.delete(
+            f'/api/workouts/{workout_short_id}',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        assert not os.path.exists(track_data_filepath)
+
+    def test_it_evicts_cached_chart_data(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport, gpx_file: str
+    ) -> None:
+        token, workout_short_id = post_a_workout(app, gpx_file)
+        client = app.test_client()
+        client.get(
+            f'/api/workouts/{workout_short_id}/chart_data',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        client.delete(
+            f'/api/workouts/{workout_short_id}',
+            headers=dict(Authorization=f'Bearer {token}'),
+        )
+
+        assert chart_data_cache.get_stats()['entries'] == 0
+
     def test_it_returns_403_when_deleting_a_workout_from_different_user(
         self,
         app: Flask,
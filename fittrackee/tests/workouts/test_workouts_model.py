@@ -1,4 +1,5 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
+from unittest.mock import patch
 
 from flask import Flask
 
@@ -211,3 +212,54 @@ class TestWorkoutModel:
             serialized_workout['next_workout']
             == workout_running_user_1.short_id
         )
+
+
+class TestWorkoutStatsCacheInvalidation:
+    def test_it_invalidates_user_stats_on_commit(
+        self, app: Flask, user_1: User, sport_1_cycling: Sport
+    ) -> None:
+        workout = Workout(
+            user_id=user_1.id,
+            sport_id=sport_1_cycling.id,
+            workout_date=datetime(2018, 1, 1),
+            distance=10,
+            duration=timedelta(seconds=3600),
+        )
+
+        with patch('fittrackee.workouts.models.stats_cache') as cache_mock:
+            db.session.add(workout)
+            db.session.flush()
+            cache_mock.invalidate.assert_not_called()
+            db.session.commit()
+
+        cache_mock.invalidate.assert_called_once_with(user_1.id)
+
+    def test_it_invalidates_user_stats_on_workout_update_and_deletion(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        with patch('fittrackee.workouts.models.stats_cache') as cache_mock:
+            workout_cycling_user_1.distance = 12
+            db.session.commit()
+            db.session.delete(workout_cycling_user_1)
+            db.session.commit()
+
+        assert cache_mock.invalidate.call_count == 2
+
+    def test_it_does_not_invalidate_user_stats_on_rollback(
+        self,
+        app: Flask,
+        user_1: User,
+        sport_1_cycling: Sport,
+        workout_cycling_user_1: Workout,
+    ) -> None:
+        with patch('fittrackee.workouts.models.stats_cache') as cache_mock:
+            workout_cycling_user_1.distance = 12
+            db.session.flush()
+            db.session.rollback()
+            db.session.commit()
+
+        cache_mock.invalidate.assert_not_called()
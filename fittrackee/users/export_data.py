@@ -10,6 +10,11 @@ from flask import current_app
 from fittrackee import appLog, db
 from fittrackee.emails.tasks import data_export_email
 from fittrackee.files import get_absolute_file_path
+from fittrackee.workouts.utils.gpx_storage import (
+    get_uncompressed_gpx_filepath,
+    is_gpx_file_compressed,
+    iter_gpx_file,
+)
 
 from .models import User, UserDataExport
 from .utils.language import get_language
@@ -21,7 +26,7 @@ class UserDataExporter:
     - user info from database (json file)
     - data from database for all workouts if exist (json file)
     - profile picture file if exists
-    - gpx files if exist
+    - gpx files if exist (decompressed if stored compressed)
     """
 
     def __init__(self, user: User) -> None:
@@ -43,7 +48,9 @@ class UserDataExporter:
             workout_data = workout.get_workout_data()
             workout_data["sport_label"] = workout.sport.label
             workout_data["gpx"] = (
-                workout.gpx.split('/')[-1] if workout.gpx else None
+                get_uncompressed_gpx_filepath(workout.gpx).split('/')[-1]
+                if workout.gpx
+                else None
             )
             workouts_data.append(workout_data)
         return workouts_data
@@ -79,13 +86,20 @@ class UserDataExporter:
                         )
                 if os.path.exists(self.workouts_directory):
                     for file in os.listdir(self.workouts_directory):
-                        if os.path.isfile(
-                            os.path.join(self.workouts_directory, file)
-                        ) and file.endswith('.gpx'):
-                            zip_object.write(
-                                os.path.join(self.workouts_directory, file),
-                                f"gpx/{file}",
-                            )
+                        file_path = os.path.join(self.workouts_directory, file)
+                        gpx_file_name = get_uncompressed_gpx_filepath(file)
+                        if not os.path.isfile(
+                            file_path
+                        ) or not gpx_file_name.endswith('.gpx'):
+                            continue
+                        if not is_gpx_file_compressed(file):
+                            zip_object.write(file_path, f"gpx/{file}")
+                            continue
+                        with zip_object.open(
+                            f"gpx/{gpx_file_name}", 'w'
+                        ) as archive_file:
+                            for chunk in iter_gpx_file(file_path):
+                                archive_file.write(chunk)
 
             file_exists = os.path.exists(zip_path)
             os.remove(user_data_file_name)
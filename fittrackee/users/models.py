@@ -4,18 +4,22 @@ from typing import Any, Dict, Optional, Union
 
 import jwt
 from flask import current_app
-from sqlalchemy import func
+from sqlalchemy import func, inspect
 from sqlalchemy.engine.base import Connection
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import DeclarativeMeta
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm.mapper import Mapper
-from sqlalchemy.orm.session import Session
+from sqlalchemy.orm.session import Session, object_session
 from sqlalchemy.sql.expression import select
 
 from fittrackee import appLog, bcrypt, db
 from fittrackee.files import get_absolute_file_path
-from fittrackee.workouts.models import Workout
+from fittrackee.workouts.models import (
+    Workout,
+    invalidate_user_stats,
+    rebuild_user_daily_stats,
+)
 
 from .exceptions import UserNotFoundException
 from .roles import UserRole
@@ -345,3 +349,11 @@ def on_users_data_export_delete(
                 os.remove(get_absolute_file_path(file_path))
             except OSError:
                 appLog.error('archive found when deleting export request')
+
+
+@listens_for(User, 'after_update')
+def on_user_update(mapper: Mapper, connection: Connection, user: User) -> None:
+    # daily statistics are stored by date in user timezone
+    if inspect(user).attrs.timezone.history.has_changes():
+        rebuild_user_daily_stats(connection, user.id)
+        invalidate_user_stats(object_session(user), user.id)
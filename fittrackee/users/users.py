@@ -22,7 +22,12 @@ from fittrackee.responses import (
     handle_error_and_return_response,
 )
 from fittrackee.utils import get_readable_duration
-from fittrackee.workouts.models import Record, Workout, WorkoutSegment
+from fittrackee.workouts.models import (
+    Record,
+    UserSportDailyStats,
+    Workout,
+    WorkoutSegment,
+)
 
 from .exceptions import InvalidEmailException, UserNotFoundException
 from .models import User, UserDataExport, UserSportPreference
@@ -663,6 +668,9 @@ def delete_user(
             UserSportPreference.user_id == user.id
         ).delete()
         db.session.query(Record).filter(Record.user_id == user.id).delete()
+        db.session.query(UserSportDailyStats).filter(
+            UserSportDailyStats.user_id == user.id
+        ).delete()
         db.session.query(WorkoutSegment).filter(
             WorkoutSegment.workout_id == Workout.id, Workout.user_id == user.id
         ).delete(synchronize_session=False)
@@ -0,0 +1,155 @@
+import logging
+from typing import Dict, Optional
+
+import click
+from humanize import naturalsize
+
+from fittrackee.cli.app import app
+
+from .utils.weather import WeatherService
+from .utils.weather_backfill import backfill_weather
+from .utils.workouts import (
+    compress_workouts_gpx_files,
+    rebuild_daily_stats,
+    rebuild_records,
+)
+
+handler = logging.StreamHandler()
+logger = logging.getLogger('fittrackee_workouts_cli')
+logger.setLevel(logging.INFO)
+logger.addHandler(handler)
+
+
+@click.group(name='workouts')
+def workouts_cli() -> None:
+    """Manage workouts."""
+    pass
+
+
+@click.group(name='records')
+def records_cli() -> None:
+    """Manage records."""
+    pass
+
+
+@workouts_cli.command('weather_backfill')
+@click.option(
+    '--batch-size',
+    type=int,
+    default=100,
+    show_default=True,
+    help='Number of workouts updated at once.',
+)
+@click.option(
+    '--workers',
+    type=int,
+    default=4,
+    show_default=True,
+    help='Number of concurrent requests to weather API.',
+)
+@click.option(
+    '--rate',
+    type=float,
+    default=5,
+    show_default=True,
+    help='Maximum number of requests per second to weather API.',
+)
+@click.option(
+    '--from-id',
+    type=int,
+    default=0,
+    show_default=True,
+    help='Process only workouts with id greater than this id '
+    '(to resume a previous run).',
+)
+@click.option(
+    '--max',
+    'max_workouts',
+    type=int,
+    help='Maximum number of workouts to process.',
+)
+def weather_backfill(
+    batch_size: int,
+    workers: int,
+    rate: float,
+    from_id: int,
+    max_workouts: Optional[int],
+) -> None:
+    """
+    Get weather data for workouts with gpx file and missing weather data.
+    """
+    weather_api = WeatherService().weather_api
+    if not weather_api:
+        click.echo('No weather API configured.', err=True)
+        return
+
+    def log_progress(counts: Dict) -> None:
+        logger.info(
+            f'Processed workouts: {counts["processed"]} '
+            f'(last workout id: {counts["last_workout_id"]}).'
+        )
+
+    with app.app_context():
+        counts = backfill_weather(
+            weather_api,
+            batch_size=batch_size,
+            workers=workers,
+            max_requests_per_second=rate,
+            from_id=from_id,
+            limit=max_workouts,
+            on_batch_end=log_progress,
+        )
+        logger.info(f'Updated workouts: {counts["updated"]}.')
+        logger.info(f'Workouts with errors: {counts["errors"]}.')
+
+
+@workouts_cli.command('compress_gpx_files')
+@click.option(
+    '--batch-size',
+    type=int,
+    default=100,
+    show_default=True,
+    help='Number of workouts updated at once.',
+)
+def compress_gpx_files(batch_size: int) -> None:
+    """
+    Compress existing uncompressed gpx files with gzip.
+    """
+
+    def log_progress(counts: Dict) -> None:
+        logger.info(f'Compressed gpx files: {counts["compressed"]}.')
+
+    with app.app_context():
+        counts = compress_workouts_gpx_files(
+            batch_size=batch_size, on_batch_end=log_progress
+        )
+        logger.info(f'Gpx files with errors: {counts["errors"]}.')
+        logger.info(f'Freed space: {naturalsize(counts["freed_space"])}.')
+
+
+@workouts_cli.command('rebuild_stats')
+def rebuild_stats() -> None:
+    """
+    Recompute daily statistics of all users.
+    """
+    with app.app_context():
+        users_count = rebuild_daily_stats(
+            on_user_end=lambda user_id: logger.info(
+                f'Statistics rebuilt for user {user_id}.'
+            )
+        )
+        logger.info(f'Rebuilt statistics for {users_count} user(s).')
+
+
+@records_cli.command('rebuild')
+def rebuild() -> None:
+    """
+    Recompute records of all users.
+    """
+    with app.app_context():
+        users_count = rebuild_records(
+            on_user_end=lambda user_id: logger.info(
+                f'Records rebuilt for user {user_id}.'
+            )
+        )
+        logger.info(f'Rebuilt records for {users_count} user(s).')
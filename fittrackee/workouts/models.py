@@ -1,13 +1,18 @@
 import datetime
 import os
-from typing import Any, Dict, Optional, Union
+from contextlib import contextmanager
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
 from uuid import UUID, uuid4
 
+import pytz
+from sqlalchemy import and_, func, inspect, literal, or_
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.engine.base import Connection
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import DeclarativeMeta
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import column_property
 from sqlalchemy.orm.mapper import Mapper
 from sqlalchemy.orm.session import Session, object_session
 from sqlalchemy.types import JSON, Enum
@@ -16,9 +21,15 @@ from fittrackee import appLog, db
 from fittrackee.files import get_absolute_file_path
 
 from .utils.convert import convert_in_duration, convert_value_to_integer
+from .utils.gpx import chart_data_cache
+from .utils.gpx_segments import get_segments_index_filepath
+from .utils.maps import get_map_variants_filepaths
 from .utils.short_id import encode_uuid
+from .utils.stats_cache import stats_cache
+from .utils.track_data import get_track_data_filepath
 
 BaseModel: DeclarativeMeta = db.Model
+UPLOAD_STATUSES = ['queued', 'in_progress', 'successful', 'errored']
 record_types = [
     'AS',  # 'Best Average Speed'
     'FD',  # 'Farthest Distance'
@@ -26,45 +37,466 @@ record_types = [
     'LD',  # 'Longest Duration'
     'MS',  # 'Max speed'
 ]
+record_types_columns = {
+    'AS': 'ave_speed',  # 'Average speed'
+    'FD': 'distance',  # 'Farthest Distance'
+    'HA': 'ascent',  # 'Highest Ascent'
+    'LD': 'moving',  # 'Longest Duration'
+    'MS': 'max_speed',  # 'Max speed'
+}
+daily_stats_columns = [
+    'nb_workouts',
+    'total_distance',
+    'total_duration',
+    'total_ascent',
+    'total_descent',
+    'total_average_speed',
+]
+daily_stats_workout_attributes = [
+    'sport_id',
+    'workout_date',
+    'distance',
+    'moving',
+    'ascent',
+    'descent',
+    'ave_speed',
+]
+# session info key for (user id, sport id) pairs whose records update is
+# deferred
+DEFERRED_RECORDS_UPDATES = 'deferred_records_updates'
+# session info key for (user id, sport id, date) whose daily statistics
+# update is deferred
+DEFERRED_DAILY_STATS_UPDATES = 'deferred_daily_stats_updates'
+# session info key for users whose statistics and records cached responses
+# are invalidated on commit
+USERS_STATS_TO_INVALIDATE = 'users_stats_to_invalidate'
+# session info key for workouts inserted or updated during flush, whose
+# records are updated after flush
+WORKOUTS_RECORDS_TO_UPDATE = 'workouts_records_to_update'
+
+
+def _update_record(
+    connection: Connection, record_id: int, value: int, workout: 'Workout'
+) -> None:
+    record_table = Record.__table__
+    connection.execute(
+        record_table.update()
+        .where(record_table.c.id == record_id)
+        .values(
+            value=value,
+            workout_id=workout.id,
+            workout_uuid=workout.uuid,
+            workout_date=workout.workout_date,
+        )
+    )
 
 
 def update_records(
-    user_id: int, sport_id: int, connection: Connection, session: Session
+    user_id: int,
+    sport_id: Optional[int],
+    connection: Connection,
+    session: Session,
 ) -> None:
+    """
+    Recompute all records for given user and sport (or all user sports if
+    sport id is not provided)
+    """
     record_table = Record.__table__
-    new_records = Workout.get_user_workout_records(user_id, sport_id)
-    for record_type, record_data in new_records.items():
-        if record_data['record_value']:
-            record = Record.query.filter_by(
-                user_id=user_id, sport_id=sport_id, record_type=record_type
-            ).first()
+    sports_records = Workout.get_user_sports_workout_records(user_id, sport_id)
+    records_query = Record.query.filter_by(user_id=user_id)
+    if sport_id is not None:
+        records_query = records_query.filter_by(sport_id=sport_id)
+    existing_records = {
+        (record.sport_id, record.record_type): record
+        for record in records_query.all()
+    }
+
+    for (record_sport_id, record_type), record in existing_records.items():
+        record_data = sports_records.get(record_sport_id, {}).get(record_type)
+        if not record_data or not record_data['record_value']:
+            connection.execute(
+                record_table.delete().where(record_table.c.id == record.id)
+            )
+
+    for record_sport_id, records in sports_records.items():
+        for record_type, record_data in records.items():
+            value = convert_value_to_integer(
+                record_type, record_data['record_value']
+            )
+            if not record_data['record_value'] or value is None:
+                continue
+            record = existing_records.get((record_sport_id, record_type))
             if record:
-                value = convert_value_to_integer(
-                    record_type, record_data['record_value']
-                )
-                connection.execute(
-                    record_table.update()
-                    .where(record_table.c.id == record.id)
-                    .values(
-                        value=value,
-                        workout_id=record_data['workout'].id,
-                        workout_uuid=record_data['workout'].uuid,
-                        workout_date=record_data['workout'].workout_date,
+                if (
+                    record._value != value
+                    or record.workout_id != record_data['workout'].id
+                ):
+                    _update_record(
+                        connection, record.id, value, record_data['workout']
                     )
-                )
             else:
                 new_record = Record(
                     workout=record_data['workout'], record_type=record_type
                 )
-                new_record.value = record_data['record_value']  # type: ignore
+                new_record._value = value
                 session.add(new_record)
+
+
+def get_workout_record_value(
+    workout: 'Workout', record_type: str
+) -> Optional[int]:
+    """
+    Return workout value for given record type, as stored in records.
+    Numeric values are rounded as stored in database, since workout may
+    not be reloaded after flush.
+    """
+    column = record_types_columns[record_type]
+    value = getattr(workout, column)
+    if value is None:
+        return None
+    scale = getattr(Workout.__table__.c[column].type, 'scale', None)
+    if scale is not None:
+        value = Decimal(str(value)).quantize(
+            Decimal(1).scaleb(-scale), rounding=ROUND_HALF_UP
+        )
+    return convert_value_to_integer(record_type, value)
+
+
+def update_records_with_workout(
+    workout: 'Workout', connection: Connection, session: Session
+) -> None:
+    """
+    Update records with inserted or updated workout values, comparing them
+    only with existing records.
+    Records are fully recomputed only when workout holds a record and its
+    value decreases (or workout date or sport changes).
+    """
+    records = Record.query.filter(
+        or_(
+            and_(
+                Record.user_id == workout.user_id,
+                Record.sport_id == workout.sport_id,
+            ),
+            Record.workout_id == workout.id,
+        )
+    ).all()
+
+    sports_to_update = set()
+    sport_records = {}
+    for record in records:
+        if record.sport_id != workout.sport_id:
+            # workout sport has changed
+            sports_to_update.add(record.sport_id)
         else:
-            connection.execute(
-                record_table.delete()
-                .where(record_table.c.user_id == user_id)
-                .where(record_table.c.sport_id == sport_id)
-                .where(record_table.c.record_type == record_type)
+            sport_records[record.record_type] = record
+
+    records_to_update = []
+    for record_type in record_types:
+        value = get_workout_record_value(workout, record_type)
+        record = sport_records.get(record_type)
+        if record and record.workout_id == workout.id:
+            if (
+                not value
+                or value < record._value
+                or workout.workout_date > record.workout_date
+            ):
+                sports_to_update.add(workout.sport_id)
+                break
+            if (
+                value > record._value
+                or workout.workout_date < record.workout_date
+            ):
+                records_to_update.append((record_type, record, value))
+        elif value and (
+            record is None
+            or value > record._value
+            or (
+                value == record._value
+                and workout.workout_date < record.workout_date
             )
+        ):
+            records_to_update.append((record_type, record, value))
+
+    if workout.sport_id not in sports_to_update:
+        for record_type, record, value in records_to_update:
+            if record:
+                _update_record(connection, record.id, value, workout)
+            else:
+                new_record = Record(workout=workout, record_type=record_type)
+                new_record._value = value
+                session.add(new_record)
+    for sport_id in sorted(sports_to_update):
+        update_records(workout.user_id, sport_id, connection, session)
+
+
+def update_records_with_workouts(
+    workouts: List['Workout'], connection: Connection, session: Session
+) -> None:
+    """
+    Update records with workouts inserted or updated during a flush.
+    When a user has several workouts, records are recomputed once per sport
+    (otherwise the same record could be created for each workout).
+    """
+    users_workouts: Dict[int, Dict[int, 'Workout']] = {}
+    for workout in workouts:
+        users_workouts.setdefault(workout.user_id, {})[workout.id] = workout
+
+    for user_id, user_workouts in sorted(users_workouts.items()):
+        if len(user_workouts) == 1:
+            update_records_with_workout(
+                next(iter(user_workouts.values())), connection, session
+            )
+            continue
+        sports_to_update = {
+            workout.sport_id for workout in user_workouts.values()
+        }
+        # workouts sport may have changed
+        sports_to_update.update(
+            record.sport_id
+            for record in Record.query.filter(
+                Record.workout_id.in_(user_workouts.keys())
+            ).all()
+        )
+        for sport_id in sorted(sports_to_update):
+            update_records(user_id, sport_id, connection, session)
+
+
+def get_user_timezone(connection: Connection, user_id: int) -> str:
+    """
+    Return user timezone ('UTC' if not set)
+    """
+    users_table = BaseModel.metadata.tables['users']
+    user_timezone = connection.execute(
+        db.select(users_table.c.timezone).where(users_table.c.id == user_id)
+    ).scalar()
+    return user_timezone if user_timezone else 'UTC'
+
+
+def get_local_date(
+    workout_date: datetime.datetime, user_timezone: str
+) -> datetime.date:
+    """
+    Return date in user timezone of workout date (stored in UTC)
+    """
+    return (
+        pytz.utc.localize(workout_date)
+        .astimezone(pytz.timezone(user_timezone))
+        .date()
+    )
+
+
+def get_local_date_column(date_column: Any, timezone_column: Any) -> Any:
+    """
+    Return SQL expression returning date in user timezone of date column
+    (stored in UTC)
+    """
+    return func.date(
+        func.timezone(
+            func.coalesce(timezone_column, 'UTC'),
+            func.timezone('UTC', date_column),
+        )
+    )
+
+
+def update_daily_stats(
+    connection: Connection,
+    user_id: int,
+    sport_id: int,
+    date: datetime.date,
+) -> None:
+    """
+    Recompute user statistics for given sport and day (in user timezone)
+    from workouts
+    """
+    stats_table = UserSportDailyStats.__table__
+    workouts_table = Workout.__table__
+    user_timezone = pytz.timezone(get_user_timezone(connection, user_id))
+    day_start, day_end = [
+        user_timezone.localize(datetime.datetime.combine(day, datetime.time()))
+        .astimezone(pytz.utc)
+        .replace(tzinfo=None)
+        for day in [date, date + datetime.timedelta(days=1)]
+    ]
+    insert_statement = postgresql.insert(stats_table).from_select(
+        ['user_id', 'sport_id', 'date', *daily_stats_columns],
+        db.select(
+            literal(user_id),
+            literal(sport_id),
+            literal(date),
+            *get_daily_stats_aggregates(workouts_table),
+        )
+        .where(
+            workouts_table.c.user_id == user_id,
+            workouts_table.c.sport_id == sport_id,
+            workouts_table.c.workout_date >= day_start,
+            workouts_table.c.workout_date < day_end,
+        )
+        .having(func.count(workouts_table.c.id) > 0),
+    )
+    result = connection.execute(
+        insert_statement.on_conflict_do_update(
+            index_elements=['user_id', 'sport_id', 'date'],
+            set_={
+                column: insert_statement.excluded[column]
+                for column in daily_stats_columns
+            },
+        )
+    )
+    # no workouts left for this day
+    if result.rowcount == 0:
+        connection.execute(
+            stats_table.delete().where(
+                stats_table.c.user_id == user_id,
+                stats_table.c.sport_id == sport_id,
+                stats_table.c.date == date,
+            )
+        )
+
+
+def get_daily_stats_aggregates(workouts_table: Any) -> List:
+    """
+    Return aggregates of workouts values stored in daily statistics (in
+    the same order as daily statistics columns)
+    """
+    return [
+        func.count(workouts_table.c.id),
+        func.coalesce(func.sum(workouts_table.c.distance), 0),
+        func.coalesce(
+            func.sum(func.extract('epoch', workouts_table.c.moving)), 0
+        ),
+        func.coalesce(func.sum(workouts_table.c.ascent), 0),
+        func.coalesce(func.sum(workouts_table.c.descent), 0),
+        func.coalesce(func.sum(workouts_table.c.ave_speed), 0),
+    ]
+
+
+def rebuild_user_daily_stats(connection: Connection, user_id: int) -> None:
+    """
+    Recompute all user daily statistics from workouts (for instance when
+    user timezone changes)
+    """
+    stats_table = UserSportDailyStats.__table__
+    workouts_table = Workout.__table__
+    users_table = BaseModel.metadata.tables['users']
+    workout_day = get_local_date_column(
+        workouts_table.c.workout_date, users_table.c.timezone
+    )
+    connection.execute(
+        stats_table.delete().where(stats_table.c.user_id == user_id)
+    )
+    connection.execute(
+        stats_table.insert().from_select(
+            ['user_id', 'sport_id', 'date', *daily_stats_columns],
+            db.select(
+                workouts_table.c.user_id,
+                workouts_table.c.sport_id,
+                workout_day,
+                *get_daily_stats_aggregates(workouts_table),
+            )
+            .select_from(
+                workouts_table.join(
+                    users_table, users_table.c.id == workouts_table.c.user_id
+                )
+            )
+            .where(workouts_table.c.user_id == user_id)
+            .group_by(
+                workouts_table.c.user_id,
+                workouts_table.c.sport_id,
+                workout_day,
+            ),
+        )
+    )
+
+
+def update_workout_daily_stats(
+    connection: Connection, workout: 'Workout', is_update: bool = False
+) -> None:
+    """
+    Update daily statistics for workout day and sport, and for previous
+    day and sport on workout update (if changed)
+    """
+    state = inspect(workout)
+    if is_update and not any(
+        state.attrs[attribute].history.has_changes()
+        for attribute in daily_stats_workout_attributes
+    ):
+        return
+    sport_ids = {workout.sport_id}
+    workout_dates = {workout.workout_date}
+    if is_update:
+        sport_ids.update(state.attrs.sport_id.history.deleted)
+        workout_dates.update(state.attrs.workout_date.history.deleted)
+    user_timezone = get_user_timezone(connection, workout.user_id)
+    daily_stats_keys = {
+        (
+            workout.user_id,
+            sport_id,
+            get_local_date(workout_date, user_timezone),
+        )
+        for sport_id in sport_ids
+        for workout_date in workout_dates
+    }
+    daily_stats_to_update = object_session(workout).info.get(
+        DEFERRED_DAILY_STATS_UPDATES
+    )
+    if daily_stats_to_update is not None:
+        daily_stats_to_update.update(daily_stats_keys)
+        return
+    for user_id, sport_id, date in daily_stats_keys:
+        update_daily_stats(connection, user_id, sport_id, date)
+
+
+def invalidate_user_stats(session: Session, user_id: int) -> None:
+    """
+    Invalidate user statistics and records cached responses once changes
+    are committed (otherwise, a response computed before commit could be
+    cached after invalidation)
+    """
+    session.info.setdefault(USERS_STATS_TO_INVALIDATE, set()).add(user_id)
+
+
+@listens_for(db.Session, 'after_commit')
+def on_session_commit(session: Session) -> None:
+    for user_id in session.info.pop(USERS_STATS_TO_INVALIDATE, set()):
+        stats_cache.invalidate(user_id)
+
+
+@listens_for(db.Session, 'after_rollback')
+def on_session_rollback(session: Session) -> None:
+    session.info.pop(USERS_STATS_TO_INVALIDATE, None)
+    session.info.pop(WORKOUTS_RECORDS_TO_UPDATE, None)
+
+
+@listens_for(db.Session, 'after_flush')
+def on_session_flush(session: Session, context: Any) -> None:
+    workouts = session.info.pop(WORKOUTS_RECORDS_TO_UPDATE, None)
+    if workouts:
+        update_records_with_workouts(workouts, session.connection(), session)
+
+
+@contextmanager
+def deferred_records_update(session: Session) -> Iterator[None]:
+    """
+    Do not update records and daily statistics after each workout insertion
+    but only once per user and sport (and day for daily statistics) when
+    exiting context (for bulk insertion)
+    """
+    records_to_update: Set[Tuple[int, int]] = set()
+    daily_stats_to_update: Set[Tuple[int, int, datetime.date]] = set()
+    session.info[DEFERRED_RECORDS_UPDATES] = records_to_update
+    session.info[DEFERRED_DAILY_STATS_UPDATES] = daily_stats_to_update
+    try:
+        yield
+        session.flush()
+    finally:
+        session.info.pop(DEFERRED_RECORDS_UPDATES, None)
+        session.info.pop(DEFERRED_DAILY_STATS_UPDATES, None)
+    connection = session.connection()
+    for user_id, sport_id, date in sorted(daily_stats_to_update):
+        update_daily_stats(connection, user_id, sport_id, date)
+    for user_id, sport_id in sorted(records_to_update):
+        update_records(user_id, sport_id, connection, session)
+    session.flush()
 
 
 class Sport(BaseModel):
@@ -132,8 +564,13 @@ class Workout(BaseModel):
     user_id = db.Column(
         db.Integer, db.ForeignKey('users.id'), index=True, nullable=False
     )
-    sport_id = db.Column(
-        db.Integer, db.ForeignKey('sports.id'), index=True, nullable=False
+    # previous values of sport and date are loaded on change, to update
+    # previous daily statistics
+    sport_id = column_property(
+        db.Column(
+            db.Integer, db.ForeignKey('sports.id'), index=True, nullable=False
+        ),
+        active_history=True,
     )
     title = db.Column(db.String(255), nullable=True)
     gpx = db.Column(db.String(255), nullable=True)
@@ -141,7 +578,10 @@ class Workout(BaseModel):
     modification_date = db.Column(
         db.DateTime, onupdate=datetime.datetime.utcnow
     )
-    workout_date = db.Column(db.DateTime, index=True, nullable=False)
+    workout_date = column_property(
+        db.Column(db.DateTime, index=True, nullable=False),
+        active_history=True,
+    )
     duration = db.Column(db.Interval, nullable=False)
     pauses = db.Column(db.Interval, nullable=True)
     moving = db.Column(db.Interval, nullable=True)
@@ -325,6 +765,68 @@ class Workout(BaseModel):
         workout["with_gpx"] = self.gpx is not None
         return workout
 
+    @classmethod
+    def get_user_sports_workout_records(
+        cls, user_id: int, sport_id: Optional[int] = None
+    ) -> Dict[int, Dict]:
+        """
+        Return records workouts for each user sport (or only given sport) in
+        a single query, ranking workouts by sport for each record type
+        (the earliest workout is kept when values are equal)
+
+        Note:
+        Values for ascent are null for workouts without gpx
+        """
+        ranks = [
+            func.row_number()
+            .over(
+                partition_by=Workout.sport_id,
+                order_by=(
+                    getattr(Workout, column).desc().nullslast(),
+                    Workout.workout_date,
+                ),
+            )
+            .label(f'rank_{record_type.lower()}')
+            for record_type, column in record_types_columns.items()
+        ]
+        ranked_workouts_query = db.session.query(
+            Workout.id.label('workout_id'), *ranks
+        ).filter(Workout.user_id == user_id)
+        if sport_id is not None:
+            ranked_workouts_query = ranked_workouts_query.filter(
+                Workout.sport_id == sport_id
+            )
+        ranked_workouts = ranked_workouts_query.subquery()
+        ranks_columns = [
+            ranked_workouts.c[f'rank_{record_type.lower()}']
+            for record_type in record_types_columns
+        ]
+        records_workouts = (
+            db.session.query(Workout, *ranks_columns)
+            .join(ranked_workouts, Workout.id == ranked_workouts.c.workout_id)
+            .filter(or_(*[rank == 1 for rank in ranks_columns]))
+            .all()
+        )
+
+        sports_records: Dict[int, Dict] = {}
+        for workout, *workout_ranks in records_workouts:
+            records = sports_records.setdefault(
+                workout.sport_id,
+                {
+                    record_type: dict(record_value=None, workout=None)
+                    for record_type in record_types_columns
+                },
+            )
+            for (record_type, column), rank in zip(
+                record_types_columns.items(), workout_ranks
+            ):
+                value = getattr(workout, column)
+                if rank == 1 and value is not None:
+                    records[record_type] = dict(
+                        record_value=value, workout=workout
+                    )
+        return sports_records
+
     @classmethod
     def get_user_workout_records(
         cls, user_id: int, sport_id: int, as_integer: Optional[bool] = False
@@ -333,43 +835,30 @@ class Workout(BaseModel):
         Note:
         Values for ascent are null for workouts without gpx
         """
-        record_types_columns = {
-            'AS': 'ave_speed',  # 'Average speed'
-            'FD': 'distance',  # 'Farthest Distance'
-            'HA': 'ascent',  # 'Highest Ascent'
-            'LD': 'moving',  # 'Longest Duration'
-            'MS': 'max_speed',  # 'Max speed'
-        }
-        records = {}
-        for record_type, column in record_types_columns.items():
-            column_sorted = getattr(getattr(Workout, column), 'desc')()
-            record_workout = (
-                Workout.query.filter(
-                    Workout.user_id == user_id,
-                    Workout.sport_id == sport_id,
-                    getattr(Workout, column) != None,  # noqa
-                )
-                .order_by(column_sorted, Workout.workout_date)
-                .first()
-            )
-            records[record_type] = dict(
-                record_value=(
-                    getattr(record_workout, column) if record_workout else None
-                ),
-                workout=record_workout,
-            )
-        return records
+        return cls.get_user_sports_workout_records(user_id, sport_id).get(
+            sport_id,
+            {
+                record_type: dict(record_value=None, workout=None)
+                for record_type in record_types_columns
+            },
+        )
 
 
 @listens_for(Workout, 'after_insert')
 def on_workout_insert(
     mapper: Mapper, connection: Connection, workout: Workout
 ) -> None:
-    @listens_for(db.Session, 'after_flush', once=True)
-    def receive_after_flush(session: Session, context: Any) -> None:
-        update_records(
-            workout.user_id, workout.sport_id, connection, session
-        )  # noqa
+    update_workout_daily_stats(connection, workout)
+    invalidate_user_stats(object_session(workout), workout.user_id)
+    records_to_update = object_session(workout).info.get(
+        DEFERRED_RECORDS_UPDATES
+    )
+    if records_to_update is not None:
+        records_to_update.add((workout.user_id, workout.sport_id))
+        return
+    object_session(workout).info.setdefault(
+        WORKOUTS_RECORDS_TO_UPDATE, []
+    ).append(workout)
 
 
 @listens_for(Workout, 'after_update')
@@ -379,34 +868,55 @@ def on_workout_update(
     if object_session(workout).is_modified(
         workout, include_collections=True
     ):  # noqa
-
-        @listens_for(db.Session, 'after_flush', once=True)
-        def receive_after_flush(session: Session, context: Any) -> None:
-            sports_list = [workout.sport_id]
-            records = Record.query.filter_by(workout_id=workout.id).all()
-            for rec in records:
-                if rec.sport_id not in sports_list:
-                    sports_list.append(rec.sport_id)
-            for sport_id in sports_list:
-                update_records(workout.user_id, sport_id, connection, session)
+        chart_data_cache.delete(str(workout.uuid))
+        update_workout_daily_stats(connection, workout, is_update=True)
+        invalidate_user_stats(object_session(workout), workout.user_id)
+        object_session(workout).info.setdefault(
+            WORKOUTS_RECORDS_TO_UPDATE, []
+        ).append(workout)
 
 
 @listens_for(Workout, 'after_delete')
 def on_workout_delete(
     mapper: Mapper, connection: Connection, old_record: 'Record'
 ) -> None:
+    chart_data_cache.delete(str(old_record.uuid))
+    update_daily_stats(
+        connection,
+        old_record.user_id,
+        old_record.sport_id,
+        get_local_date(
+            old_record.workout_date,
+            get_user_timezone(connection, old_record.user_id),
+        ),
+    )
+    invalidate_user_stats(object_session(old_record), old_record.user_id)
+
     @listens_for(db.Session, 'after_flush', once=True)
     def receive_after_flush(session: Session, context: Any) -> None:
+        # map image may not exist yet (generated in background)
         if old_record.map:
-            try:
-                os.remove(get_absolute_file_path(old_record.map))
-            except OSError:
-                appLog.error('map file not found when deleting workout')
+            map_filepath = get_absolute_file_path(old_record.map)
+            for filepath in [
+                map_filepath,
+                *get_map_variants_filepaths(map_filepath),
+            ]:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
         if old_record.gpx:
             try:
                 os.remove(get_absolute_file_path(old_record.gpx))
             except OSError:
                 appLog.error('gpx file not found when deleting workout')
+            # track data and segments index files may not exist yet
+            # (generated on first read)
+            gpx_filepath = get_absolute_file_path(old_record.gpx)
+            for filepath in [
+                get_track_data_filepath(gpx_filepath),
+                get_segments_index_filepath(gpx_filepath),
+            ]:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
 
 
 class WorkoutSegment(BaseModel):
@@ -546,3 +1056,105 @@ def on_record_delete(
                 )
                 new_record.value = record_data['record_value']  # type: ignore
                 session.add(new_record)
+
+
+class UserSportDailyStats(BaseModel):
+    """
+    Workouts statistics by user, sport and day (workout date in user
+    timezone), updated on workout insertion, update and deletion, and on
+    user timezone change
+    """
+
+    __tablename__ = 'user_sport_daily_stats'
+    __table_args__ = (
+        db.Index('user_sport_daily_stats_user_date', 'user_id', 'date'),
+    )
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('users.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    sport_id = db.Column(
+        db.Integer,
+        db.ForeignKey('sports.id', ondelete='CASCADE'),
+        primary_key=True,
+    )
+    date = db.Column(db.Date, primary_key=True)
+    nb_workouts = db.Column(db.Integer, nullable=False)
+    total_distance = db.Column(db.Numeric(12, 3), nullable=False)  # km
+    total_duration = db.Column(db.Integer, nullable=False)  # moving, seconds
+    total_ascent = db.Column(db.Numeric(14, 3), nullable=False)  # meters
+    total_descent = db.Column(db.Numeric(14, 3), nullable=False)  # meters
+    # sum of workouts average speeds (km/h)
+    total_average_speed = db.Column(db.Numeric(12, 2), nullable=False)
+
+
+class WorkoutUpload(BaseModel):
+    """
+    Workout file (gpx file or zip archive) uploaded to be processed
+    asynchronously
+    """
+
+    __tablename__ = 'workouts_uploads'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    uuid = db.Column(
+        postgresql.UUID(as_uuid=True),
+        default=uuid4,
+        unique=True,
+        nullable=False,
+    )
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('users.id', ondelete='CASCADE'),
+        index=True,
+        nullable=False,
+    )
+    created_at = db.Column(
+        db.DateTime, nullable=False, default=datetime.datetime.utcnow
+    )
+    updated_at = db.Column(
+        db.DateTime, nullable=True, onupdate=datetime.datetime.utcnow
+    )
+    status = db.Column(
+        db.String(20), nullable=False, default=UPLOAD_STATUSES[0]
+    )
+    file_name = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(255), nullable=False)
+    workout_data = db.Column(JSON, nullable=False)
+    files_count = db.Column(db.Integer, nullable=True)
+    processed_files_count = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(JSON, nullable=False, default=list)
+    workouts = db.Column(JSON, nullable=False, default=list)
+
+    def __init__(
+        self,
+        user_id: int,
+        file_name: str,
+        file_path: str,
+        workout_data: Dict,
+    ) -> None:
+        self.uuid = uuid4()
+        self.user_id = user_id
+        self.file_name = file_name
+        self.file_path = file_path
+        self.workout_data = workout_data
+        self.status = UPLOAD_STATUSES[0]
+        self.processed_files_count = 0
+        self.errors = []
+        self.workouts = []
+
+    @property
+    def short_id(self) -> str:
+        return encode_uuid(self.uuid)
+
+    def serialize(self) -> Dict:
+        return {
+            'id': self.short_id,
+            'created_at': self.created_at,
+            'status': self.status,
+            'file_name': self.file_name,
+            'files_count': self.files_count,
+            'processed_files_count': self.processed_files_count,
+            'errors': self.errors,
+            'workouts': self.workouts,
+        }
@@ -6,6 +6,12 @@ from fittrackee.oauth2.server import require_auth
 from fittrackee.users.models import User
 
 from .models import Record
+from .utils.stats_cache import (
+    cache_response,
+    get_cached_response,
+    get_stats_cache_key,
+    stats_cache,
+)
 
 records_blueprint = Blueprint('records', __name__)
 
@@ -117,12 +123,20 @@ def get_records(auth_user: User) -> Dict:
         - invalid token, please log in again
 
     """
+    cache_namespace = stats_cache.get_namespace(auth_user.id)
+    cache_key = get_stats_cache_key('records')
+    cached_response = get_cached_response(cache_namespace, cache_key)
+    if cached_response:
+        return cached_response
+
     records = (
         Record.query.filter_by(user_id=auth_user.id)
         .order_by(Record.sport_id.asc(), Record.record_type.asc())
         .all()
     )
-    return {
+    response = {
         'status': 'success',
         'data': {'records': [record.serialize() for record in records]},
     }
+    cache_response(cache_namespace, cache_key, response)
+    return response
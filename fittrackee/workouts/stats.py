@@ -1,8 +1,10 @@
-from datetime import datetime, timedelta
-from typing import Dict, Union
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Union
 
 from flask import Blueprint, request
-from sqlalchemy import func
+from sqlalchemy import func, literal_column, true
+from sqlalchemy.sql.elements import Label
+from sqlalchemy.sql.selectable import Subquery
 
 from fittrackee import db
 from fittrackee.oauth2.server import require_auth
@@ -15,29 +17,116 @@ from fittrackee.responses import (
 )
 from fittrackee.users.models import User
 
-from .models import Sport, Workout
-from .utils.convert import convert_timedelta_to_integer
+from .models import Sport, UserSportDailyStats, Workout
+from .utils.gpx import chart_data_cache
+from .utils.maps import map_tiles_cache
+from .utils.stats_cache import (
+    cache_response,
+    get_cached_response,
+    get_stats_cache_key,
+    stats_cache,
+)
 from .utils.uploads import get_upload_dir_size
-from .utils.workouts import get_average_speed, get_datetime_from_request_args
 
 stats_blueprint = Blueprint('stats', __name__)
 
 
+def get_time_period(time: Optional[str], date_column: Any) -> Optional[Label]:
+    """
+    Return SQL expression returning time period (formatted start date of
+    period) for given date column, or None if time period is invalid.
+    Date column must contain dates in user timezone (like daily statistics
+    dates), for periods to start at midnight in user timezone.
+
+    Note: constants are rendered inline, for the expression to be identical
+    in SELECT and GROUP BY clauses
+    """
+    if time == 'week':  # week start Sunday
+        period_start = func.date_trunc(
+            literal_column("'week'"),
+            date_column + literal_column("interval '1 day'"),
+        ) - literal_column("interval '1 day'")
+        period_format = 'YYYY-MM-DD'
+    elif time == 'weekm':  # week start Monday
+        period_start = func.date_trunc(literal_column("'week'"), date_column)
+        period_format = 'YYYY-MM-DD'
+    elif time == 'month':
+        period_start = date_column
+        period_format = 'YYYY-MM'
+    elif time == 'year' or not time:
+        period_start = date_column
+        period_format = 'YYYY'
+    else:
+        return None
+    return func.to_char(
+        period_start, literal_column(f"'{period_format}'")
+    ).label('time_period')
+
+
+def get_daily_stats(
+    user_id: int,
+    sport_id: Optional[str],
+    date_from: Optional[date],
+    date_to: Optional[date],
+) -> Subquery:
+    """
+    Return user daily statistics for given date range (dates in user
+    timezone, like daily statistics dates)
+    """
+    return (
+        db.select(
+            UserSportDailyStats.date,
+            UserSportDailyStats.sport_id,
+            UserSportDailyStats.nb_workouts,
+            UserSportDailyStats.total_distance,
+            UserSportDailyStats.total_duration,
+            UserSportDailyStats.total_ascent,
+            UserSportDailyStats.total_descent,
+            UserSportDailyStats.total_average_speed,
+        )
+        .where(
+            UserSportDailyStats.user_id == user_id,
+            UserSportDailyStats.date >= date_from if date_from else true(),
+            UserSportDailyStats.date <= date_to if date_to else true(),
+            UserSportDailyStats.sport_id == sport_id if sport_id else true(),
+        )
+        .subquery()
+    )
+
+
 def get_workouts(
     user_name: str, filter_type: str
 ) -> Union[Dict, HttpResponse]:
     """
-    Return user workouts by sport or by time
+    Return user workouts statistics by sport or by time, rolling up daily
+    statistics
     """
     try:
         user = User.query.filter_by(username=user_name).first()
         if not user:
             return UserNotFoundErrorResponse()
 
+        cache_namespace = stats_cache.get_namespace(user.id)
+        cache_key = get_stats_cache_key(
+            filter_type,
+            {
+                arg: request.args.get(arg)
+                for arg in ['from', 'sport_id', 'time', 'to']
+            },
+            user.timezone,
+        )
+        cached_response = get_cached_response(cache_namespace, cache_key)
+        if cached_response:
+            return cached_response
+
         params = request.args.copy()
-        date_from, date_to = get_datetime_from_request_args(params, user)
+        date_from, date_to = [
+            datetime.strptime(params[arg], '%Y-%m-%d').date()
+            if params.get(arg)
+            else None
+            for arg in ['from', 'to']
+        ]
         sport_id = params.get('sport_id')
-        time = params.get('time')
 
         if filter_type == 'by_sport':
             if sport_id:
@@ -45,130 +134,72 @@ def get_workouts(
                 if not sport:
                     return NotFoundErrorResponse('sport does not exist')
 
-        workouts = (
-            Workout.query.filter(
-                Workout.user_id == user.id,
-                Workout.workout_date >= date_from if date_from else True,
-                Workout.workout_date < date_to + timedelta(seconds=1)
-                if date_to
-                else True,
-                Workout.sport_id == sport_id if sport_id else True,
+        daily_stats = get_daily_stats(user.id, sport_id, date_from, date_to)
+        if filter_type == 'by_sport':
+            group_columns = [daily_stats.c.sport_id]
+        else:
+            time_period = get_time_period(
+                params.get('time'), daily_stats.c.date
             )
-            .order_by(Workout.workout_date.asc())
+            if time_period is None:
+                return InvalidPayloadErrorResponse(
+                    'Invalid time period.', 'fail'
+                )
+            group_columns = [time_period, daily_stats.c.sport_id]
+
+        rows = (
+            db.session.query(
+                *group_columns,
+                func.sum(daily_stats.c.nb_workouts).label('nb_workouts'),
+                func.round(
+                    func.sum(daily_stats.c.total_average_speed)
+                    / func.sum(daily_stats.c.nb_workouts),
+                    2,
+                ).label('average_speed'),
+                func.coalesce(func.sum(daily_stats.c.total_distance), 0).label(
+                    'total_distance'
+                ),
+                func.coalesce(func.sum(daily_stats.c.total_duration), 0).label(
+                    'total_duration'
+                ),
+                func.coalesce(func.sum(daily_stats.c.total_ascent), 0).label(
+                    'total_ascent'
+                ),
+                func.coalesce(func.sum(daily_stats.c.total_descent), 0).label(
+                    'total_descent'
+                ),
+            )
+            .group_by(*group_columns)
+            .order_by(*group_columns)
             .all()
         )
 
-        workouts_list_by_sport = {}
-        workouts_list_by_time = {}  # type: ignore
-        for workout in workouts:
+        statistics: Dict = {}
+        for row in rows:
+            sport_statistics = {
+                'average_speed': (
+                    float(row.average_speed)
+                    if row.average_speed is not None
+                    else 0.0
+                ),
+                'nb_workouts': int(row.nb_workouts),
+                'total_distance': float(row.total_distance),
+                'total_duration': int(row.total_duration),
+                'total_ascent': float(row.total_ascent),
+                'total_descent': float(row.total_descent),
+            }
             if filter_type == 'by_sport':
-                sport_id = workout.sport_id
-                if sport_id not in workouts_list_by_sport:
-                    workouts_list_by_sport[sport_id] = {
-                        'average_speed': 0.0,
-                        'nb_workouts': 0,
-                        'total_distance': 0.0,
-                        'total_duration': 0,
-                        'total_ascent': 0.0,
-                        'total_descent': 0.0,
-                    }
-                workouts_list_by_sport[sport_id]['nb_workouts'] += 1
-                workouts_list_by_sport[sport_id][
-                    'average_speed'
-                ] = get_average_speed(
-                    workouts_list_by_sport[sport_id]['nb_workouts'],  # type: ignore  # noqa
-                    workouts_list_by_sport[sport_id]['average_speed'],
-                    workout.ave_speed,
-                )
-                workouts_list_by_sport[sport_id]['total_distance'] += float(
-                    workout.distance
-                )
-                workouts_list_by_sport[sport_id][
-                    'total_duration'
-                ] += convert_timedelta_to_integer(workout.moving)
-                if workout.ascent:
-                    workouts_list_by_sport[sport_id]['total_ascent'] += float(
-                        workout.ascent
-                    )
-                if workout.descent:
-                    workouts_list_by_sport[sport_id]['total_descent'] += float(
-                        workout.descent
-                    )
-
-            # filter_type == 'by_time'
+                statistics[row.sport_id] = sport_statistics
             else:
-                if time == 'week':
-                    workout_date = workout.workout_date - timedelta(
-                        days=(
-                            workout.workout_date.isoweekday()
-                            if workout.workout_date.isoweekday() < 7
-                            else 0
-                        )
-                    )
-                    time_period = datetime.strftime(workout_date, "%Y-%m-%d")
-                elif time == 'weekm':  # week start Monday
-                    workout_date = workout.workout_date - timedelta(
-                        days=workout.workout_date.weekday()
-                    )
-                    time_period = datetime.strftime(workout_date, "%Y-%m-%d")
-                elif time == 'month':
-                    time_period = datetime.strftime(
-                        workout.workout_date, "%Y-%m"
-                    )
-                elif time == 'year' or not time:
-                    time_period = datetime.strftime(workout.workout_date, "%Y")
-                else:
-                    return InvalidPayloadErrorResponse(
-                        'Invalid time period.', 'fail'
-                    )
-                sport_id = workout.sport_id
-                if time_period not in workouts_list_by_time:
-                    workouts_list_by_time[time_period] = {}
-                if sport_id not in workouts_list_by_time[time_period]:
-                    workouts_list_by_time[time_period][sport_id] = {
-                        'average_speed': 0.0,
-                        'nb_workouts': 0,
-                        'total_distance': 0.0,
-                        'total_duration': 0,
-                        'total_ascent': 0.0,
-                        'total_descent': 0.0,
-                    }
-                workouts_list_by_time[time_period][sport_id][
-                    'nb_workouts'
-                ] += 1
-                workouts_list_by_time[time_period][sport_id][
-                    'average_speed'
-                ] = get_average_speed(
-                    workouts_list_by_time[time_period][sport_id][
-                        'nb_workouts'
-                    ],
-                    workouts_list_by_time[time_period][sport_id][
-                        'average_speed'
-                    ],
-                    workout.ave_speed,
-                )
-                workouts_list_by_time[time_period][sport_id][
-                    'total_distance'
-                ] += float(workout.distance)
-                workouts_list_by_time[time_period][sport_id][
-                    'total_duration'
-                ] += convert_timedelta_to_integer(workout.moving)
-                if workout.ascent:
-                    workouts_list_by_time[time_period][sport_id][
-                        'total_ascent'
-                    ] += float(workout.ascent)
-                if workout.descent:
-                    workouts_list_by_time[time_period][sport_id][
-                        'total_descent'
-                    ] += float(workout.descent)
-        return {
+                statistics.setdefault(row.time_period, {})[
+                    row.sport_id
+                ] = sport_statistics
+        response = {
             'status': 'success',
-            'data': {
-                'statistics': workouts_list_by_sport
-                if filter_type == 'by_sport'
-                else workouts_list_by_time
-            },
+            'data': {'statistics': statistics},
         }
+        cache_response(cache_namespace, cache_key, response)
+        return response
     except Exception as e:
         return handle_error_and_return_response(e)
 
@@ -404,6 +435,18 @@ def get_application_stats(auth_user: User) -> Dict:
 
       {
         "data": {
+          "chart_data_cache": {
+            "backend": "redis",
+            "hits": 12,
+            "misses": 3
+          },
+          "map_tiles_cache": {
+            "backend": "disk",
+            "entries": 120,
+            "hits": 1458,
+            "misses": 120,
+            "size": 3145728
+          },
           "sports": 3,
           "uploads_dir_size": 1000,
           "users": 2,
@@ -436,5 +479,7 @@ def get_application_stats(auth_user: User) -> Dict:
             'sports': nb_sports,
             'users': nb_users,
             'uploads_dir_size': get_upload_dir_size(),
+            'chart_data_cache': chart_data_cache.get_stats(),
+            'map_tiles_cache': map_tiles_cache.get_stats(),
         },
     }
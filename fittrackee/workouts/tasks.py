@@ -0,0 +1,19 @@
+from fittrackee import dramatiq
+from fittrackee.workouts.models import Workout
+from fittrackee.workouts.utils.workouts import (
+    generate_workout_map,
+    process_workout_upload,
+)
+
+
+@dramatiq.actor(queue_name='fittrackee_workouts')
+def generate_map_image(workout_id: int) -> None:
+    workout = Workout.query.filter_by(id=workout_id).first()
+    if workout:
+        generate_workout_map(workout)
+
+
+@dramatiq.actor(queue_name='fittrackee_workouts')
+def process_upload(upload_id: int) -> None:
+    for workout_id in process_workout_upload(upload_id):
+        generate_map_image.send(workout_id=workout_id)
@@ -8,9 +8,15 @@ def convert_in_duration(value: str) -> timedelta:
     return timedelta(seconds=(hours * 3600 + minutes * 60))
 
 
-def convert_timedelta_to_integer(value: str) -> int:
-    hours, minutes, seconds = str(value).split(':')
-    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+def convert_timedelta_to_integer(value: Union[str, timedelta]) -> int:
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    days = 0
+    if ',' in value:  # for instance '1 day, 1:00:00'
+        days_value, value = value.split(',')
+        days = int(days_value.split()[0])
+    hours, minutes, seconds = value.split(':')
+    return days * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
 
 
 def convert_value_to_integer(
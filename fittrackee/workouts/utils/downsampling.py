@@ -0,0 +1,110 @@
+import math
+from typing import List
+
+import numpy as np
+
+
+def _normalize(values: np.ndarray) -> np.ndarray:
+    values = np.nan_to_num(values, nan=0.0)
+    values_range = values.max() - values.min()
+    if not values_range:
+        return np.zeros(values.size)
+    return (values - values.min()) / values_range
+
+
+def get_lttb_indices(
+    x_values: np.ndarray, y_values: List[np.ndarray], max_points: int
+) -> np.ndarray:
+    """
+    Return indices of points selected with Largest-Triangle-Three-Buckets
+    algorithm (first and last points are always kept).
+
+    When several y series are provided (for instance elevation and speed),
+    they are normalized and the selected point in each bucket is the one
+    with the largest sum of triangles areas.
+
+    Missing values (NaN) are handled as 0.
+    """
+    points_count = x_values.size
+    if max_points >= points_count or max_points < 3:
+        return np.arange(points_count)
+
+    normalized_y_values = [_normalize(values) for values in y_values]
+    bucket_size = (points_count - 2) / (max_points - 2)
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = points_count - 1
+    selected_index = 0
+
+    for bucket in range(max_points - 2):
+        bucket_start = math.floor(bucket * bucket_size) + 1
+        bucket_end = math.floor((bucket + 1) * bucket_size) + 1
+        next_bucket_end = min(
+            math.floor((bucket + 2) * bucket_size) + 1, points_count
+        )
+
+        # average point of next bucket (last point for last bucket)
+        next_x_average = x_values[bucket_end:next_bucket_end].mean()
+        selected_x = x_values[selected_index]
+        bucket_x_values = x_values[bucket_start:bucket_end]
+
+        areas = np.zeros(bucket_end - bucket_start)
+        for values in normalized_y_values:
+            next_y_average = values[bucket_end:next_bucket_end].mean()
+            selected_y = values[selected_index]
+            areas += np.abs(
+                (selected_x - next_x_average)
+                * (values[bucket_start:bucket_end] - selected_y)
+                - (selected_x - bucket_x_values)
+                * (next_y_average - selected_y)
+            )
+
+        selected_index = bucket_start + int(areas.argmax())
+        indices[bucket + 1] = selected_index
+
+    return indices
+
+
+def get_douglas_peucker_indices(
+    x_values: np.ndarray, y_values: np.ndarray, tolerance: float
+) -> np.ndarray:
+    """
+    Return indices of points kept by Ramer-Douglas-Peucker algorithm
+    (first and last points are always kept): points closer than tolerance
+    to the line between kept points are removed.
+
+    Ranges are processed with a stack instead of recursion, and distances
+    of all points in a range are calculated at once.
+    """
+    points_count = x_values.size
+    if points_count < 3 or tolerance <= 0:
+        return np.arange(points_count)
+
+    kept = np.zeros(points_count, dtype=bool)
+    kept[0] = kept[-1] = True
+    ranges = [(0, points_count - 1)]
+    while ranges:
+        start, end = ranges.pop()
+        if end - start < 2:
+            continue
+        delta_x = x_values[end] - x_values[start]
+        delta_y = y_values[end] - y_values[start]
+        points_range = slice(start + 1, end)
+        points_delta_x = x_values[points_range] - x_values[start]
+        points_delta_y = y_values[points_range] - y_values[start]
+        length = math.hypot(delta_x, delta_y)
+        if length:
+            distances = (
+                np.abs(delta_x * points_delta_y - delta_y * points_delta_x)
+                / length
+            )
+        else:
+            distances = np.hypot(points_delta_x, points_delta_y)
+        farthest_index = int(distances.argmax())
+        if distances[farthest_index] > tolerance:
+            index = start + 1 + farthest_index
+            kept[index] = True
+            ranges.append((start, index))
+            ranges.append((index, end))
+
+    return np.flatnonzero(kept)
@@ -1,167 +1,190 @@
-from datetime import datetime, timedelta, timezone
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 import gpxpy.gpx
+import numpy as np
+from flask import current_app
+
+from fittrackee.cache import Cache
 
 from ..exceptions import InvalidGPXException, WorkoutGPXException
+from .downsampling import get_lttb_indices
+from .gpx_metrics import (
+    EPOCH_UTC,
+    GpxMetrics,
+    SegmentPoints,
+    get_gpx_metrics,
+    get_segment_metrics,
+)
+from .gpx_parser import GpxPoint, GpxStreamParser
+from .gpx_segments import get_segments_index, read_segment
+from .polyline import encode_polyline
+from .track_data import (
+    DISTANCE,
+    ELEVATION,
+    LATITUDE,
+    LONGITUDE,
+    SEGMENT,
+    SPEED,
+    TIME,
+    get_track_data,
+)
 from .weather import WeatherService
 
 weather_service = WeatherService()
-
-
-def open_gpx_file(gpx_file: str) -> Optional[gpxpy.gpx.GPX]:
-    gpx_file = open(gpx_file, 'r')  # type: ignore
-    gpx = gpxpy.parse(gpx_file)
-    if len(gpx.tracks) == 0:
-        return None
-    return gpx
+chart_data_cache = Cache(
+    'chart_data',
+    max_size=int(os.getenv('CHART_DATA_CACHE_MAX_SIZE', 50)) * 1024 * 1024,
+    ttl=int(os.getenv('CHART_DATA_CACHE_TTL', 86400)),
+)
 
 
 def get_gpx_data(
-    parsed_gpx: Union[gpxpy.gpx.GPX, gpxpy.gpx.GPXTrackSegment],
+    gpx_metrics: GpxMetrics,
     max_speed: float,
     start: Union[datetime, None],
     stopped_time_between_seg: timedelta,
-    stopped_speed_threshold: float,
 ) -> Dict:
     """
-    Returns data from parsed gpx file
+    Returns data from gpx file metrics
     """
     gpx_data: Dict[str, Any] = {
         'max_speed': (max_speed / 1000) * 3600,
         'start': start,
     }
 
-    duration = parsed_gpx.get_duration()
+    duration = gpx_metrics.duration
     gpx_data['duration'] = (
         timedelta(seconds=duration if duration else 0)
         + stopped_time_between_seg
     )
 
-    ele = parsed_gpx.get_elevation_extremes()
-    gpx_data['elevation_max'] = ele.maximum
-    gpx_data['elevation_min'] = ele.minimum
+    gpx_data['elevation_max'] = gpx_metrics.elevation_max
+    gpx_data['elevation_min'] = gpx_metrics.elevation_min
 
-    hill = parsed_gpx.get_uphill_downhill()
-    gpx_data['uphill'] = hill.uphill
-    gpx_data['downhill'] = hill.downhill
+    gpx_data['uphill'] = gpx_metrics.uphill
+    gpx_data['downhill'] = gpx_metrics.downhill
 
-    moving_data = parsed_gpx.get_moving_data(
-        stopped_speed_threshold=stopped_speed_threshold
+    gpx_data['moving_time'] = timedelta(seconds=gpx_metrics.moving_time)
+    gpx_data['stop_time'] = (
+        timedelta(seconds=gpx_metrics.stopped_time) + stopped_time_between_seg
     )
-    if moving_data:
-        gpx_data['moving_time'] = timedelta(seconds=moving_data.moving_time)
-        gpx_data['stop_time'] = (
-            timedelta(seconds=moving_data.stopped_time)
-            + stopped_time_between_seg
-        )
-        distance = moving_data.moving_distance + moving_data.stopped_distance
-        gpx_data['distance'] = distance / 1000
+    distance = gpx_metrics.moving_distance + gpx_metrics.stopped_distance
+    gpx_data['distance'] = distance / 1000
 
-        average_speed = (
-            distance / moving_data.moving_time
-            if moving_data.moving_time > 0
-            else 0
-        )
-        gpx_data['average_speed'] = (average_speed / 1000) * 3600
+    average_speed = (
+        distance / gpx_metrics.moving_time
+        if gpx_metrics.moving_time > 0
+        else 0
+    )
+    gpx_data['average_speed'] = (average_speed / 1000) * 3600
 
     return gpx_data
 
 
-def get_gpx_info(
+def parse_gpx_file(
     gpx_file: str,
     stopped_speed_threshold: float,
     update_map_data: Optional[bool] = True,
-    update_weather_data: Optional[bool] = True,
-) -> Tuple:
-    """
-    Parse and return gpx, map and weather data from gpx file
+) -> Tuple[Dict, List, List[GpxPoint]]:
     """
-    try:
-        gpx = open_gpx_file(gpx_file)
-    except Exception:
-        raise InvalidGPXException('error', 'gpx file is invalid')
-    if gpx is None:
-        raise InvalidGPXException('error', 'no tracks in gpx file')
+    Parse and return gpx data, map data and points needed to get weather
+    data (first and last points) from gpx file, without external calls
 
-    gpx_data: Dict = {'name': gpx.tracks[0].name, 'segments': []}
+    The file is read as a stream, points are stored in arrays and metrics
+    are calculated once per segment.
+    Like gpxpy, all tracks are used to calculate workout data, but only
+    first track is used for segments, map and weather data.
+    """
+    gpx_data: Dict = {'name': None, 'segments': []}
     max_speed = 0.0
     start: Optional[datetime] = None
+    first_point: Optional[GpxPoint] = None
+    last_point: Optional[GpxPoint] = None
     map_data = []
-    weather_data = []
-    segments_nb = len(gpx.tracks[0].segments)
     prev_seg_last_point = None
     no_stopped_time = timedelta(seconds=0)
     stopped_time_between_seg = no_stopped_time
+    tracks_metrics: Dict[int, List[GpxMetrics]] = {}
 
-    for segment_idx, segment in enumerate(gpx.tracks[0].segments):
-        segment_start: Optional[datetime] = None
-        segment_points_nb = len(segment.points)
-        for point_idx, point in enumerate(segment.points):
-            if point.time is None:
-                raise InvalidGPXException(
-                    'error', '<time> is missing in gpx file'
-                )
-            if point_idx == 0:
-                segment_start = point.time
-                # first gpx point => get weather
-                if start is None:
-                    start = point.time
-                    if point.time and update_weather_data:
-                        weather_data.append(weather_service.get_weather(point))
-
-                # if a previous segment exists, calculate stopped time between
-                # the two segments
-                if prev_seg_last_point:
-                    stopped_time_between_seg += (
-                        point.time - prev_seg_last_point
+    parser = GpxStreamParser(gpx_file)
+    try:
+        for track_idx, segment_idx, points in parser.iter_segments():
+            segment_points = SegmentPoints()
+            segment_start: Optional[datetime] = None
+            segment_last_point: Optional[GpxPoint] = None
+            for point_idx, point in enumerate(points):
+                segment_points.add_point(point)
+                segment_last_point = point
+                if track_idx > 0:
+                    continue
+
+                if point.time is None:
+                    raise InvalidGPXException(
+                        'error', '<time> is missing in gpx file'
                     )
+                if point_idx == 0:
+                    segment_start = point.time
+                    if start is None:
+                        start = point.time
+                        first_point = point
+
+                    # if a previous segment exists, calculate stopped time
+                    # between the two segments
+                    if prev_seg_last_point:
+                        stopped_time_between_seg += (
+                            point.time - prev_seg_last_point
+                        )
+
+                if update_map_data:
+                    map_data.append([point.longitude, point.latitude])
+
+            segment_metrics = get_segment_metrics(
+                segment_points, stopped_speed_threshold=stopped_speed_threshold
+            )
+            tracks_metrics.setdefault(track_idx, []).append(segment_metrics)
+            if track_idx > 0:
+                continue
 
-            # last segment point
-            if point_idx == (segment_points_nb - 1):
-                prev_seg_last_point = point.time
+            if segment_last_point:
+                last_point = segment_last_point
+                prev_seg_last_point = last_point.time
 
-                # last gpx point => get weather
-                if segment_idx == (segments_nb - 1) and update_weather_data:
-                    weather_data.append(weather_service.get_weather(point))
+            segment_max_speed = segment_metrics.max_speed
+            if segment_max_speed > max_speed:
+                max_speed = segment_max_speed
 
-            if update_map_data:
-                map_data.append([point.longitude, point.latitude])
-        moving_data = segment.get_moving_data(
-            stopped_speed_threshold=stopped_speed_threshold
-        )
-        if moving_data:
-            calculated_max_speed = moving_data.max_speed
-            segment_max_speed = (
-                calculated_max_speed if calculated_max_speed else 0
+            segment_data = get_gpx_data(
+                segment_metrics,
+                segment_max_speed,
+                segment_start,
+                no_stopped_time,
             )
+            segment_data['idx'] = segment_idx
+            gpx_data['segments'].append(segment_data)
+    except InvalidGPXException:
+        raise
+    except Exception:
+        raise InvalidGPXException('error', 'gpx file is invalid')
 
-            if segment_max_speed > max_speed:
-                max_speed = segment_max_speed
-        else:
-            segment_max_speed = 0.0
-
-        segment_data = get_gpx_data(
-            segment,
-            segment_max_speed,
-            segment_start,
-            no_stopped_time,
-            stopped_speed_threshold,
-        )
-        segment_data['idx'] = segment_idx
-        gpx_data['segments'].append(segment_data)
+    if parser.tracks_count == 0:
+        raise InvalidGPXException('error', 'no tracks in gpx file')
+    gpx_data['name'] = parser.tracks_names[0]
 
+    gpx_metrics = get_gpx_metrics(list(tracks_metrics.values()))
     full_gpx_data = get_gpx_data(
-        gpx,
+        gpx_metrics,
         max_speed,
         start,
         stopped_time_between_seg,
-        stopped_speed_threshold,
     )
     gpx_data = {**gpx_data, **full_gpx_data}
 
     if update_map_data:
-        bounds = gpx.get_bounds()
+        bounds = gpx_metrics.bounds
         gpx_data['bounds'] = (
             [
                 bounds.min_latitude,
@@ -173,6 +196,50 @@ def get_gpx_info(
             else []
         )
 
+    weather_points = [
+        point for point in [first_point, last_point] if point is not None
+    ]
+    return gpx_data, map_data, weather_points
+
+
+def get_weather_data(weather_points: List[GpxPoint]) -> List:
+    """
+    Return weather data for given points (first and last gpx points).
+    Weather data are fetched concurrently.
+    """
+    if not weather_points:
+        return []
+    with ThreadPoolExecutor(max_workers=len(weather_points)) as executor:
+        return list(
+            executor.map(
+                lambda weather_point: weather_service.get_weather(
+                    gpxpy.gpx.GPXTrackPoint(
+                        latitude=weather_point.latitude,
+                        longitude=weather_point.longitude,
+                        elevation=weather_point.elevation,
+                        time=weather_point.time,
+                    )
+                ),
+                weather_points,
+            )
+        )
+
+
+def get_gpx_info(
+    gpx_file: str,
+    stopped_speed_threshold: float,
+    update_map_data: Optional[bool] = True,
+    update_weather_data: Optional[bool] = True,
+) -> Tuple:
+    """
+    Parse and return gpx, map and weather data from gpx file
+    """
+    gpx_data, map_data, weather_points = parse_gpx_file(
+        gpx_file, stopped_speed_threshold, update_map_data
+    )
+    weather_data = (
+        get_weather_data(weather_points) if update_weather_data else []
+    )
     return gpx_data, map_data, weather_data
 
 
@@ -197,98 +264,227 @@ def get_gpx_segments(
     return segments
 
 
-def get_chart_data(
-    gpx_file: str, segment_id: Optional[int] = None
-) -> Optional[List]:
+def _get_chart_track_data(
+    gpx_file: str,
+    segment_id: Optional[int] = None,
+    max_points: Optional[int] = None,
+) -> Optional[np.ndarray]:
     """
-    Return data needed to generate chart with speed and elevation
+    Return track data for chart, filtered by segment and downsampled if
+    max_points is provided
     """
-    gpx = open_gpx_file(gpx_file)
-    if gpx is None:
+    track_data = get_track_data(gpx_file)
+    if track_data is None:
         return None
 
-    chart_data = []
-    first_point = None
-    previous_point = None
-    previous_distance = 0
-
-    track_segments = gpx.tracks[0].segments
-    segments = get_gpx_segments(track_segments, segment_id)
-
-    for segment_idx, segment in enumerate(segments):
-        for point_idx, point in enumerate(segment.points):
-            if segment_idx == 0 and point_idx == 0:
-                first_point = point
-            distance = (
-                point.distance_3d(previous_point)
-                if (
-                    point.elevation
-                    and previous_point
-                    and previous_point.elevation
-                )
-                else point.distance_2d(previous_point)
-            )
-            distance = 0 if distance is None else distance
-            distance += previous_distance
-            speed = (
-                round((segment.get_speed(point_idx) / 1000) * 3600, 2)
-                if segment.get_speed(point_idx) is not None
-                else 0
-            )
-            chart_data.append(
-                {
-                    'distance': (
-                        round(distance / 1000, 2)
-                        if distance is not None
-                        else 0
-                    ),
-                    'duration': point.time_difference(first_point),
-                    'elevation': (
-                        round(point.elevation, 1)
-                        if point.elevation is not None
-                        else 0
-                    ),
-                    'latitude': point.latitude,
-                    'longitude': point.longitude,
-                    'speed': speed,
-                    # workaround
-                    # https://github.com/tkrajina/gpxpy/issues/209
-                    'time': point.time.replace(
-                        tzinfo=timezone(point.time.utcoffset())
-                    ),
-                }
+    if segment_id is not None:
+        segment_index = segment_id - 1
+        if segment_index < 0:
+            raise WorkoutGPXException('error', 'Incorrect segment id', None)
+        segments = track_data[SEGMENT]
+        if not segments.size or segment_index > segments[-1]:
+            raise WorkoutGPXException(
+                'not found', f'No segment with id \'{segment_id}\'', None
             )
-            previous_point = point
-            previous_distance = distance
-
+        track_data = track_data[:, segments == segment_index]
+
+    if max_points is not None:
+        track_data = track_data[
+            :,
+            get_lttb_indices(
+                track_data[DISTANCE],
+                [track_data[ELEVATION], track_data[SPEED]],
+                max_points,
+            ),
+        ]
+    return track_data
+
+
+def _get_columnar_chart_data(
+    track_data: np.ndarray, with_polyline: bool
+) -> Dict:
+    """
+    Return chart data with one array per field.
+    Times are returned as a start time (truncated to seconds) and offsets
+    in milliseconds.
+    """
+    if not track_data[TIME].size:
+        start_time = None
+        time_offsets: List[int] = []
+    else:
+        first_point_time = int(track_data[TIME][0])
+        start_time = first_point_time - first_point_time % 1_000_000
+        time_offsets = (
+            ((track_data[TIME] - start_time) // 1000).astype(np.int64).tolist()
+        )
+    chart_data: Dict[str, Any] = {
+        'distance': np.round(
+            (track_data[DISTANCE] - track_data[DISTANCE][:1]) / 1000, 2
+        ).tolist(),
+        'duration': (
+            np.abs(track_data[TIME] - track_data[TIME][:1]) / 1e6
+        ).tolist(),
+        'elevation': np.round(
+            np.nan_to_num(track_data[ELEVATION], nan=0.0), 1
+        ).tolist(),
+        'speed': np.round(
+            np.nan_to_num(track_data[SPEED], nan=0.0) / 1000 * 3600, 2
+        ).tolist(),
+        'start': (
+            None
+            if start_time is None
+            else EPOCH_UTC + timedelta(microseconds=start_time)
+        ),
+        'time_offsets': time_offsets,
+    }
+    if with_polyline:
+        chart_data['polyline'] = encode_polyline(
+            track_data[LATITUDE], track_data[LONGITUDE]
+        )
+    else:
+        chart_data['latitude'] = track_data[LATITUDE].tolist()
+        chart_data['longitude'] = track_data[LONGITUDE].tolist()
     return chart_data
 
 
-def extract_segment_from_gpx_file(
-    content: str, segment_id: int
-) -> Optional[str]:
+def _get_objects_chart_data(track_data: np.ndarray) -> List[Dict]:
+    """
+    Return chart data with one object per point.
+    Values are calculated on whole columns, only objects are created per
+    point.
+    """
+    if not track_data[TIME].size:
+        return []
+    times = track_data[TIME]
+    durations = np.abs(times - times[0]) / 1e6
+    elevations = track_data[ELEVATION]
+    speeds = (track_data[SPEED] / 1000) * 3600
+
+    distances_list = list(
+        map(
+            round,
+            ((track_data[DISTANCE] - track_data[DISTANCE][0]) / 1000).tolist(),
+            repeat(2),
+        )
+    )
+    durations_list = durations.tolist()
+    elevations_list = list(map(round, elevations.tolist(), repeat(1)))
+    speeds_list = list(map(round, speeds.tolist(), repeat(2)))
+    # missing values and null durations are returned as integers
+    for values, is_zero in [
+        (durations_list, durations == 0),
+        (elevations_list, np.isnan(elevations)),
+        (speeds_list, np.isnan(speeds)),
+    ]:
+        for index in np.flatnonzero(is_zero).tolist():
+            values[index] = 0
+
+    return [
+        {
+            'distance': distance,
+            'duration': duration,
+            'elevation': elevation,
+            'latitude': latitude,
+            'longitude': longitude,
+            'speed': speed,
+            'time': EPOCH_UTC + timedelta(microseconds=time),
+        }
+        for (
+            distance,
+            duration,
+            elevation,
+            latitude,
+            longitude,
+            speed,
+            time,
+        ) in zip(
+            distances_list,
+            durations_list,
+            elevations_list,
+            track_data[LATITUDE].tolist(),
+            track_data[LONGITUDE].tolist(),
+            speeds_list,
+            times.tolist(),
+        )
+    ]
+
+
+def get_chart_data(
+    gpx_file: str,
+    segment_id: Optional[int] = None,
+    max_points: Optional[int] = None,
+    chart_format: str = 'objects',
+    with_polyline: bool = False,
+) -> Optional[Union[List, Dict]]:
     """
-    Returns segments in xml format from a gpx file content
+    Return data needed to generate chart with speed and elevation
+
+    Data are read from track data file stored next to gpx file.
+    If max_points is provided, points are downsampled with LTTB algorithm
+    over distance, elevation and speed.
+
+    With 'columnar' format, data are returned with one array per field
+    (coordinates can be returned as an encoded polyline), otherwise
+    one object is returned per point.
     """
-    gpx_content = gpxpy.parse(content)
-    if len(gpx_content.tracks) == 0:
+    track_data = _get_chart_track_data(gpx_file, segment_id, max_points)
+    if track_data is None:
         return None
 
-    track_segment = get_gpx_segments(
-        gpx_content.tracks[0].segments, segment_id
+    if chart_format == 'columnar':
+        return _get_columnar_chart_data(track_data, with_polyline)
+
+    return _get_objects_chart_data(track_data)
+
+
+def get_cached_chart_data(
+    workout_uuid: str,
+    gpx_file: str,
+    segment_id: Optional[int] = None,
+    max_points: Optional[int] = None,
+    chart_format: str = 'objects',
+    with_polyline: bool = False,
+) -> Optional[Union[List, Dict]]:
+    """
+    Return chart data from cache if available, otherwise chart data are
+    calculated and stored in cache.
+
+    Cached values are evicted when workout is updated or deleted, gpx file
+    modification time and size are also part of the key to ignore values
+    calculated from a previous file.
+    """
+    gpx_file_stat = os.stat(gpx_file)
+    key = (
+        f'{segment_id if segment_id is not None else "all"}:'
+        f'{max_points if max_points is not None else "all"}:'
+        f'{chart_format}{":polyline" if with_polyline else ""}:'
+        f'{gpx_file_stat.st_mtime_ns}:{gpx_file_stat.st_size}'
     )
+    cached_chart_data = chart_data_cache.get(workout_uuid, key)
+    if cached_chart_data is not None:
+        return current_app.json.loads(cached_chart_data)
 
-    gpx = gpxpy.gpx.GPX()
-    gpx_track = gpxpy.gpx.GPXTrack()
-    gpx.tracks.append(gpx_track)
-    gpx_segment = gpxpy.gpx.GPXTrackSegment()
-    gpx_track.segments.append(gpx_segment)
+    chart_data = get_chart_data(
+        gpx_file, segment_id, max_points, chart_format, with_polyline
+    )
+    chart_data_cache.set(
+        workout_uuid, key, current_app.json.dumps(chart_data).encode()
+    )
+    return chart_data
 
-    for point_idx, point in enumerate(track_segment[0].points):
-        gpx_segment.points.append(
-            gpxpy.gpx.GPXTrackPoint(
-                point.latitude, point.longitude, elevation=point.elevation
-            )
-        )
 
-    return gpx.to_xml()
+def extract_segment_from_gpx_file(
+    gpx_filepath: str, segment_id: int
+) -> Optional[str]:
+    """
+    Returns segment in xml format from a gpx file.
+    Only segment is read from file, using segments byte ranges stored next
+    to gpx file.
+    """
+    segments_index = get_segments_index(gpx_filepath)
+    if segments_index is None:
+        return None
+
+    # raises an exception if segment id is invalid
+    get_gpx_segments(segments_index['segments'], segment_id)
+    return read_segment(gpx_filepath, segments_index, segment_id - 1)
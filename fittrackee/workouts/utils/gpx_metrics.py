@@ -0,0 +1,331 @@
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from gpxpy.geo import EARTH_RADIUS, ONE_DEGREE
+from gpxpy.gpx import (
+    DEFAULT_STOPPED_SPEED_THRESHOLD,
+    IGNORE_TOP_SPEED_PERCENTILES,
+    GPXBounds,
+)
+
+from .gpx_parser import GpxPoint
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = EPOCH.replace(tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+class GpxMetrics(NamedTuple):
+    duration: Optional[float]  # seconds
+    elevation_min: Optional[float]
+    elevation_max: Optional[float]
+    uphill: float
+    downhill: float
+    moving_time: float  # seconds
+    stopped_time: float  # seconds
+    moving_distance: float  # meters
+    stopped_distance: float  # meters
+    max_speed: float  # m/s
+    bounds: Optional[GPXBounds]
+
+
+def get_microseconds(time: datetime) -> int:
+    epoch = EPOCH if time.tzinfo is None else EPOCH_UTC
+    return (time - epoch) // ONE_MICROSECOND
+
+
+class SegmentPoints:
+    """
+    Store segment points coordinates, elevations and times in compact
+    arrays, to calculate metrics without keeping points objects.
+    Missing elevations are stored as NaN.
+    """
+
+    def __init__(self) -> None:
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.elevations = array('d')
+        self.times = array('q')  # microseconds
+        self.has_times = array('b')
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def add_point(self, point: GpxPoint) -> None:
+        self.latitudes.append(point.latitude)
+        self.longitudes.append(point.longitude)
+        self.elevations.append(
+            np.nan if point.elevation is None else point.elevation
+        )
+        self.times.append(
+            0 if point.time is None else get_microseconds(point.time)
+        )
+        self.has_times.append(point.time is not None)
+
+    def to_arrays(
+        self,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        return (
+            np.frombuffer(self.latitudes, dtype=np.float64),
+            np.frombuffer(self.longitudes, dtype=np.float64),
+            np.frombuffer(self.elevations, dtype=np.float64),
+            np.frombuffer(self.times, dtype=np.int64),
+            np.frombuffer(self.has_times, dtype=np.int8).astype(bool),
+        )
+
+
+def get_distances(
+    latitudes_1: np.ndarray,
+    longitudes_1: np.ndarray,
+    elevations_1: np.ndarray,
+    latitudes_2: np.ndarray,
+    longitudes_2: np.ndarray,
+    elevations_2: np.ndarray,
+) -> np.ndarray:
+    """
+    Return distances in meters between points, calculated like
+    gpxpy.geo.distance (2d distance when an elevation is missing, haversine
+    distance for distant points).
+    Missing elevations are NaN.
+    """
+    delta_latitudes = latitudes_1 - latitudes_2
+    delta_longitudes = longitudes_1 - longitudes_2
+
+    x = delta_latitudes
+    y = delta_longitudes * np.cos(np.radians(latitudes_1))
+    distances = np.sqrt(x * x + y * y) * ONE_DEGREE
+
+    with_elevation = (
+        ~np.isnan(elevations_1)
+        & ~np.isnan(elevations_2)
+        & (elevations_1 != elevations_2)
+    )
+    distances[with_elevation] = np.sqrt(
+        distances[with_elevation] ** 2
+        + (elevations_1[with_elevation] - elevations_2[with_elevation]) ** 2
+    )
+
+    distant = (np.abs(delta_latitudes) > 0.2) | (
+        np.abs(delta_longitudes) > 0.2
+    )
+    if distant.any():
+        radians_latitudes_1 = np.radians(latitudes_1[distant])
+        radians_latitudes_2 = np.radians(latitudes_2[distant])
+        a = np.sin(
+            (radians_latitudes_1 - radians_latitudes_2) / 2
+        ) ** 2 + np.sin(
+            np.radians(delta_longitudes[distant]) / 2
+        ) ** 2 * np.cos(
+            radians_latitudes_1
+        ) * np.cos(
+            radians_latitudes_2
+        )
+        distances[distant] = EARTH_RADIUS * (2 * np.arcsin(np.sqrt(a)))
+    return distances
+
+
+def get_distances_from_previous_points(
+    latitudes: np.ndarray, longitudes: np.ndarray, elevations: np.ndarray
+) -> np.ndarray:
+    """
+    Return distances between consecutive points, as calculated in gpxpy
+    moving data (3d distance only when both elevations are not equal to 0)
+    """
+    elevations = np.where(elevations == 0, np.nan, elevations)
+    return get_distances(
+        latitudes[1:],
+        longitudes[1:],
+        elevations[1:],
+        latitudes[:-1],
+        longitudes[:-1],
+        elevations[:-1],
+    )
+
+
+def _get_duration(times: np.ndarray, has_times: np.ndarray) -> Optional[float]:
+    if times.size < 2:
+        return 0
+    first = 0 if has_times[0] else 1
+    last = -1 if has_times[-1] else -2
+    if not has_times[first] or not has_times[last]:
+        return None
+    duration = int(times[last] - times[first])
+    if duration < 0:
+        return None
+    return duration / 1e6
+
+
+def _get_uphill_downhill(elevations: np.ndarray) -> Tuple[float, float]:
+    """
+    Same smoothing as gpxpy.geo.calculate_uphill_downhill, missing
+    elevations are handled as 0
+    """
+    smoothed_elevations = elevations.copy()
+    if elevations.size > 2:
+        previous_elevations = elevations[:-2]
+        current_elevations = elevations[1:-1]
+        next_elevations = elevations[2:]
+        smoothed_elevations[1:-1] = np.where(
+            np.isnan(previous_elevations) | np.isnan(next_elevations),
+            current_elevations,
+            previous_elevations * 0.3
+            + current_elevations * 0.4
+            + next_elevations * 0.3,
+        )
+    deltas = np.diff(np.nan_to_num(smoothed_elevations, nan=0.0))
+    return (
+        float(deltas[deltas > 0].sum()),
+        float(-deltas[deltas <= 0].sum()),
+    )
+
+
+def _get_max_speed(speeds: np.ndarray, distances: np.ndarray) -> float:
+    """
+    Same calculation as gpxpy.geo.calculate_max_speed, ignoring
+    nonstandard distances and top speeds
+    """
+    size = distances.size
+    if size < 2:
+        return 0.0
+    average_distance = distances.sum() / size
+    deviations = np.abs(distances - average_distance)
+    standard_distance_deviation = np.sqrt((deviations**2).sum() / size)
+    filtered_speeds = np.sort(
+        speeds[deviations <= standard_distance_deviation * 1.5]
+    )
+    if not filtered_speeds.size:
+        return 0.0
+    index = int(filtered_speeds.size * (1 - IGNORE_TOP_SPEED_PERCENTILES))
+    if index >= filtered_speeds.size:
+        index = -1
+    return float(filtered_speeds[index])
+
+
+def _get_bounds(
+    latitudes: np.ndarray, longitudes: np.ndarray
+) -> Optional[GPXBounds]:
+    if not latitudes.size:
+        return None
+    bounds = [
+        float(latitudes.min()),
+        float(latitudes.max()),
+        float(longitudes.min()),
+        float(longitudes.max()),
+    ]
+    # same check as gpxpy
+    return GPXBounds(*bounds) if all(bounds) else None
+
+
+def get_segment_metrics(
+    segment_points: SegmentPoints, stopped_speed_threshold: float
+) -> GpxMetrics:
+    """
+    Calculate segment metrics from points arrays, returning the same
+    values as gpxpy GPXTrackSegment methods (moving data calculated with
+    default parameters)
+    """
+    if not stopped_speed_threshold:
+        stopped_speed_threshold = DEFAULT_STOPPED_SPEED_THRESHOLD
+    (
+        latitudes,
+        longitudes,
+        elevations,
+        times,
+        has_times,
+    ) = segment_points.to_arrays()
+
+    # moving data
+    distances = get_distances_from_previous_points(
+        latitudes, longitudes, elevations
+    )
+    seconds = np.diff(times) / 1e6
+    with_movement = (
+        has_times[1:] & has_times[:-1] & (seconds > 0) & (distances != 0)
+    )
+    seconds = seconds[with_movement]
+    distances = distances[with_movement]
+    speeds_kmh = (distances / 1000.0) / (seconds / 60.0**2)
+    stopped = speeds_kmh <= stopped_speed_threshold
+    moving_seconds = np.where(stopped, 0, seconds)
+    # like gpxpy, speeds are stored only once movement has been detected
+    with_speed = np.cumsum(moving_seconds) > 0
+
+    uphill, downhill = _get_uphill_downhill(elevations)
+    valid_elevations = elevations[~np.isnan(elevations)]
+
+    return GpxMetrics(
+        duration=_get_duration(times, has_times),
+        elevation_min=(
+            float(valid_elevations.min()) if valid_elevations.size else None
+        ),
+        elevation_max=(
+            float(valid_elevations.max()) if valid_elevations.size else None
+        ),
+        uphill=uphill,
+        downhill=downhill,
+        moving_time=float(moving_seconds.sum()),
+        stopped_time=float(seconds[stopped].sum()),
+        moving_distance=float(distances[~stopped].sum()),
+        stopped_distance=float(distances[stopped].sum()),
+        max_speed=_get_max_speed(
+            distances[with_speed] / seconds[with_speed],
+            distances[with_speed],
+        ),
+        bounds=_get_bounds(latitudes, longitudes),
+    )
+
+
+def get_gpx_metrics(tracks_metrics: List[List[GpxMetrics]]) -> GpxMetrics:
+    """
+    Aggregate segments metrics by track and then for the whole gpx file,
+    as gpxpy GPXTrack and GPX methods do
+    """
+    duration: Optional[float] = 0.0
+    elevations: List[float] = []
+    totals = [0.0] * 6  # uphill, downhill and moving data
+    max_speed = 0.0
+    bounds: Optional[GPXBounds] = None
+
+    for track_metrics in tracks_metrics:
+        track_duration: Optional[float] = 0.0
+        track_totals = [0.0] * 6
+        for segment_metrics in track_metrics:
+            if segment_metrics.duration is None:
+                track_duration = None
+            elif track_duration is not None:
+                track_duration += segment_metrics.duration
+            for value in [
+                segment_metrics.elevation_min,
+                segment_metrics.elevation_max,
+            ]:
+                if value is not None:
+                    elevations.append(value)
+            for index, value in enumerate(segment_metrics[3:9]):
+                track_totals[index] += value
+            max_speed = max(max_speed, segment_metrics.max_speed)
+            if bounds is None:
+                bounds = segment_metrics.bounds
+            elif segment_metrics.bounds:
+                bounds = bounds.max_bounds(segment_metrics.bounds)
+        if track_duration is None:
+            duration = None
+        elif duration is not None:
+            duration += track_duration
+        for index, value in enumerate(track_totals):
+            totals[index] += value
+
+    return GpxMetrics(
+        duration=duration,
+        elevation_min=min(elevations) if elevations else None,
+        elevation_max=max(elevations) if elevations else None,
+        uphill=totals[0],
+        downhill=totals[1],
+        moving_time=totals[2],
+        stopped_time=totals[3],
+        moving_distance=totals[4],
+        stopped_distance=totals[5],
+        max_speed=max_speed,
+        bounds=bounds,
+    )
@@ -0,0 +1,169 @@
+import re
+from datetime import datetime
+from typing import (
+    IO,
+    Generator,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+from xml.etree.ElementTree import (  # nosec
+    Element,
+    ParseError,
+    fromstring,
+    iterparse,
+)
+
+from gpxpy.gpxfield import FLOAT_TYPE, TIME_TYPE
+
+from ..exceptions import InvalidGPXException
+from .gpx_storage import open_gpx_file
+
+TRACK_POINT_START_TAG_PATTERN = re.compile(rb'<(?:[\w.-]+:)?trkpt[\s/>]')
+TRACK_POINT_END_TAG_PATTERN = re.compile(rb'</(?:[\w.-]+:)?trkpt\s*>')
+TAG_PREFIX_PATTERN = re.compile(rb'<(/?)[\w.-]+:')
+
+
+class GpxPoint(NamedTuple):
+    latitude: float
+    longitude: float
+    elevation: Optional[float]
+    time: Optional[datetime]
+
+
+def _get_tag(element: Element) -> str:
+    # remove namespace if present
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def _get_point(element: Element) -> GpxPoint:
+    latitude = element.get('lat')
+    longitude = element.get('lon')
+    if latitude is None or longitude is None:
+        raise InvalidGPXException('error', 'gpx file is invalid')
+    elevation = None
+    time = None
+    for child in element:
+        tag = _get_tag(child)
+        if not child.text:
+            continue
+        if tag == 'ele':
+            elevation = FLOAT_TYPE.from_string(child.text)
+        elif tag == 'time':
+            time = TIME_TYPE.from_string(child.text)
+    return GpxPoint(float(latitude), float(longitude), elevation, time)
+
+
+def get_last_track_point(content: bytes) -> Optional[GpxPoint]:
+    """
+    Return last complete track point in gpx content (for instance the end
+    of a gpx file), without parsing the whole content.
+    Return None if content contains no complete track point.
+    """
+    start_tags = list(TRACK_POINT_START_TAG_PATTERN.finditer(content))
+    if not start_tags:
+        return None
+    start = start_tags[-1].start()
+    start_tag_end = content.find(b'>', start)
+    if start_tag_end == -1:
+        return None
+    if content.endswith(b'/', start, start_tag_end):
+        end = start_tag_end + 1
+    else:
+        end_tag = TRACK_POINT_END_TAG_PATTERN.search(content, start_tag_end)
+        if end_tag is None:
+            return None
+        end = end_tag.end()
+    # namespace prefixes are removed, since namespaces are declared on root
+    # element
+    try:
+        element = fromstring(  # nosec
+            TAG_PREFIX_PATTERN.sub(rb'<\1', content[start:end])
+        )
+    except ParseError:
+        return None
+    return _get_point(element)
+
+
+class GpxStreamParser:
+    """
+    Parse gpx file incrementally, without building the whole gpxpy objects
+    tree.
+    Only track points are returned, elements are cleared once read to keep
+    memory usage independent of file size.
+    """
+
+    def __init__(self, gpx_file: Union[str, IO[bytes]]) -> None:
+        self.gpx_file = gpx_file
+        self.tracks_names: List[Optional[str]] = []
+
+    @property
+    def tracks_count(self) -> int:
+        return len(self.tracks_names)
+
+    @staticmethod
+    def _iter_segment_points(
+        context: Iterator[Tuple[str, Element]], segment: Element
+    ) -> Iterator[GpxPoint]:
+        depth = 0
+        for event, element in context:
+            if event == 'start':
+                depth += 1
+                continue
+            if depth == 0:  # end of segment
+                return
+            depth -= 1
+            if depth == 0 and _get_tag(element) == 'trkpt':
+                point = _get_point(element)
+                segment.clear()
+                yield point
+
+    def iter_segments(
+        self,
+    ) -> Generator[Tuple[int, int, Iterator[GpxPoint]], None, None]:
+        """
+        Yield track index, segment index and a point iterator for each
+        segment.
+        The point iterator must be consumed before next segment is read,
+        otherwise remaining points are skipped.
+        """
+        if isinstance(self.gpx_file, str):
+            with open_gpx_file(self.gpx_file) as gpx_file:
+                yield from self._iter_file_segments(gpx_file)
+        else:
+            yield from self._iter_file_segments(self.gpx_file)
+
+    def _iter_file_segments(
+        self, gpx_file: IO[bytes]
+    ) -> Generator[Tuple[int, int, Iterator[GpxPoint]], None, None]:
+        context = iter(iterparse(gpx_file, events=('start', 'end')))  # nosec
+        root: Optional[Element] = None
+        path: List[str] = []
+        segment_idx = 0
+        for event, element in context:
+            tag = _get_tag(element)
+            if event == 'start':
+                if root is None:
+                    root = element
+                path.append(tag)
+                if path[1:] == ['trk']:
+                    self.tracks_names.append(None)
+                    segment_idx = 0
+                elif path[1:] == ['trk', 'trkseg']:
+                    points = self._iter_segment_points(context, element)
+                    yield self.tracks_count - 1, segment_idx, points
+                    # skip points not consumed
+                    for _ in points:
+                        pass
+                    segment_idx += 1
+                    path.pop()
+                continue
+
+            path.pop()
+            if path[1:] == ['trk'] and tag == 'name':
+                self.tracks_names[-1] = element.text
+            elif len(path) == 1 and root is not None:
+                root.clear()
@@ -0,0 +1,144 @@
+import json
+import os
+import re
+import tempfile
+from typing import Dict, List, Optional
+from xml.parsers import expat  # nosec
+from xml.sax.saxutils import quoteattr  # nosec
+
+from ..exceptions import InvalidGPXException
+from .gpx_storage import get_uncompressed_gpx_filepath, open_gpx_file
+
+# Byte ranges of first track segments are stored in a json file next to gpx
+# file, to extract a segment without parsing gpx file.
+# Root and track elements names and attributes (with namespaces
+# declarations) are stored to wrap extracted segment in a gpx document.
+
+
+def get_segments_index_filepath(gpx_filepath: str) -> str:
+    return (
+        f'{os.path.splitext(get_uncompressed_gpx_filepath(gpx_filepath))[0]}'
+        '.segments.json'
+    )
+
+
+def _get_local_name(name: str) -> str:
+    # remove namespace prefix if present
+    return name.rsplit(':', 1)[-1]
+
+
+def generate_segments_index(gpx_filepath: str) -> Optional[Dict]:
+    """
+    Return byte ranges of first track segments in gpx file (only start and
+    end tags are handled), or None if gpx file has no tracks
+    """
+    index: Dict = {
+        'root': None,
+        'root_attributes': {},
+        'track': None,
+        'track_attributes': {},
+        'segments': [],
+    }
+    path: List[str] = []
+    tracks_count = 0
+    segments_names: List[str] = []
+    parser = expat.ParserCreate()
+
+    def start_element(name: str, attributes: Dict) -> None:
+        nonlocal tracks_count
+        path.append(_get_local_name(name))
+        if len(path) == 1:
+            index['root'] = name
+            index['root_attributes'] = attributes
+        elif path[1:] == ['trk']:
+            tracks_count += 1
+            if tracks_count == 1:
+                index['track'] = name
+                index['track_attributes'] = attributes
+        elif path[1:] == ['trk', 'trkseg'] and tracks_count == 1:
+            index['segments'].append([parser.CurrentByteIndex, None])
+
+    def end_element(name: str) -> None:
+        # only first track segments are indexed
+        if path[1:] == ['trk', 'trkseg'] and tracks_count == 1:
+            index['segments'][-1][1] = parser.CurrentByteIndex
+            segments_names.append(name)
+        path.pop()
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    with open_gpx_file(gpx_filepath) as gpx_file:
+        try:
+            parser.ParseFile(gpx_file)
+        except expat.ExpatError:
+            raise InvalidGPXException('error', 'gpx file is invalid')
+
+        if index['track'] is None:
+            return None
+
+        # on end tag, parser position is the start of end tag, except for
+        # empty element ('<trkseg/>'), where it is the end of element
+        for segment, name in zip(index['segments'], segments_names):
+            gpx_file.seek(segment[1])
+            end_tag = gpx_file.read(256)
+            if re.match(re.escape(f'</{name}'.encode()) + rb'[\s>]', end_tag):
+                segment[1] += end_tag.index(b'>') + 1
+    return index
+
+
+def write_segments_index(gpx_filepath: str) -> Optional[Dict]:
+    """
+    Generate segments index and store it next to gpx file
+    """
+    index = generate_segments_index(gpx_filepath)
+    if index is None:
+        return None
+    index_filepath = get_segments_index_filepath(gpx_filepath)
+    # written in a temporary file first, to avoid reading a partial file
+    fd, tmp_filepath = tempfile.mkstemp(
+        dir=os.path.dirname(index_filepath), suffix='.tmp'
+    )
+    with os.fdopen(fd, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_filepath, index_filepath)
+    return index
+
+
+def get_segments_index(gpx_filepath: str) -> Optional[Dict]:
+    """
+    Return segments index stored next to gpx file.
+    If it does not exist yet (workouts created before segments index
+    storage), file is created.
+    """
+    index_filepath = get_segments_index_filepath(gpx_filepath)
+    if not os.path.exists(index_filepath):
+        return write_segments_index(gpx_filepath)
+    with open(index_filepath) as f:
+        return json.load(f)
+
+
+def _get_start_tag(name: str, attributes: Dict) -> str:
+    attributes_str = ''.join(
+        f' {attribute}={quoteattr(value)}'
+        for attribute, value in attributes.items()
+    )
+    return f'<{name}{attributes_str}>'
+
+
+def read_segment(gpx_filepath: str, index: Dict, segment_index: int) -> str:
+    """
+    Return segment from gpx file, wrapped in a gpx document with a single
+    track (only segment bytes are read, byte ranges being offsets in
+    uncompressed content if gpx file is compressed)
+    """
+    start, end = index['segments'][segment_index]
+    with open_gpx_file(gpx_filepath) as gpx_file:
+        gpx_file.seek(start)
+        segment = gpx_file.read(end - start).decode('utf-8')
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'{_get_start_tag(index["root"], index["root_attributes"])}'
+        f'{_get_start_tag(index["track"], index["track_attributes"])}'
+        f'{segment}'
+        f'</{index["track"]}></{index["root"]}>'
+    )
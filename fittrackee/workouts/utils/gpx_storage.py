@@ -0,0 +1,79 @@
+import gzip
+import os
+import shutil
+import tempfile
+from typing import IO, Iterator, cast
+
+# gpx files can be stored compressed with gzip (file name ends with
+# '.gpx.gz'), they are decompressed as a stream when read
+COMPRESSED_GPX_EXTENSION = '.gz'
+CHUNK_SIZE = 64 * 1024
+
+
+def is_gpx_file_compressed(gpx_filepath: str) -> bool:
+    return gpx_filepath.endswith(COMPRESSED_GPX_EXTENSION)
+
+
+def get_uncompressed_gpx_filepath(gpx_filepath: str) -> str:
+    """
+    Return gpx file path without compression extension (used for files
+    stored next to gpx file, and gpx file name on download or export)
+    """
+    if is_gpx_file_compressed(gpx_filepath):
+        return gpx_filepath[: -len(COMPRESSED_GPX_EXTENSION)]
+    return gpx_filepath
+
+
+def open_gpx_file(gpx_filepath: str) -> IO[bytes]:
+    """
+    Open gpx file in binary mode, decompressing it if compressed
+    """
+    if is_gpx_file_compressed(gpx_filepath):
+        return cast(IO[bytes], gzip.open(gpx_filepath, 'rb'))
+    return open(gpx_filepath, 'rb')
+
+
+def iter_gpx_file(gpx_filepath: str) -> Iterator[bytes]:
+    """
+    Yield uncompressed gpx file content by chunks
+    """
+    with open_gpx_file(gpx_filepath) as gpx_file:
+        while True:
+            chunk = gpx_file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def compress_gpx_file(
+    gpx_filepath: str, delete_uncompressed_file: bool = True
+) -> str:
+    """
+    Compress gpx file, delete uncompressed file (if not disabled) and return
+    compressed file path
+    """
+    compressed_filepath = f'{gpx_filepath}{COMPRESSED_GPX_EXTENSION}'
+    # written in a temporary file first, to avoid reading a partial file
+    fd, tmp_filepath = tempfile.mkstemp(
+        dir=os.path.dirname(compressed_filepath), suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file, open(
+            gpx_filepath, 'rb'
+        ) as gpx_file, gzip.GzipFile(
+            # original file name is not stored, to get the same content for
+            # the same gpx file
+            filename='',
+            mode='wb',
+            fileobj=tmp_file,
+            mtime=0,
+        ) as compressed_file:
+            shutil.copyfileobj(gpx_file, compressed_file, CHUNK_SIZE)
+        os.replace(tmp_filepath, compressed_filepath)
+    except Exception:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+        raise
+    if delete_uncompressed_file:
+        os.remove(gpx_filepath)
+    return compressed_filepath
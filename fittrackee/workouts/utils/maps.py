@@ -1,12 +1,49 @@
 import hashlib
+import os
 import random
-from typing import Dict, List
+import re
+import secrets
+import tempfile
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple, Union
 
+import numpy as np
+import requests
 from flask import current_app
+from PIL import Image
+from requests.adapters import HTTPAdapter
 from staticmap import Line, StaticMap
 
 from fittrackee import VERSION
-from fittrackee.files import get_absolute_file_path
+from fittrackee.cache import DiskCache
+
+from .downsampling import get_douglas_peucker_indices
+
+map_tiles_cache = DiskCache(
+    'map_tiles',
+    max_size=int(os.getenv('MAP_TILES_CACHE_MAX_SIZE', 100)) * 1024 * 1024,
+    ttl=int(os.getenv('MAP_TILES_CACHE_TTL', 30 * 86400)),
+)
+# tolerance (in pixels) used to simplify track before drawing static map
+MAP_SIMPLIFICATION_TOLERANCE = float(
+    os.getenv('MAP_SIMPLIFICATION_TOLERANCE', 1)
+)
+# additional map image sizes (default size is 400x225) and formats
+MAP_IMAGE_SIZES = {'small': (200, 113), 'thumbnail': (100, 56)}
+MAP_IMAGE_FORMATS = {'png': 'image/png', 'webp': 'image/webp'}
+# session reusing connections to tile server for map tiles proxy
+tiles_session = requests.Session()
+for prefix in ['http://', 'https://']:
+    tiles_session.mount(prefix, HTTPAdapter(pool_maxsize=20))
+TILES_USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64; rv:88.0)'
+TILES_CONTENT_TYPES = {
+    b'\x89PNG': 'image/png',
+    b'\xff\xd8\xff': 'image/jpeg',
+    b'RIFF': 'image/webp',
+}
 
 
 def get_static_map_tile_server_url(tile_server_config: Dict) -> str:
@@ -18,30 +55,305 @@ def get_static_map_tile_server_url(tile_server_config: Dict) -> str:
     return tile_server_config['URL'].replace('{s}.', subdomain)
 
 
-def generate_map(map_filepath: str, map_data: List) -> None:
+@lru_cache(maxsize=None)
+def get_tile_url_regex(url_template: str) -> Pattern:
+    """
+    Return regex to get tile coordinates from a tile url
+    """
+    pattern = re.escape(url_template)
+    for coordinate in ['z', 'x', 'y']:
+        pattern = pattern.replace(
+            re.escape(f'{{{coordinate}}}'), f'(?P<{coordinate}>\\d+)'
+        )
+    return re.compile(f'^{pattern}$')
+
+
+class CachedStaticMap(StaticMap):
+    """
+    Static map getting tiles from disk cache.
+    Tiles are cached by tile server url template (not containing
+    subdomain, to share tiles between subdomains) and tile coordinates.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.tiles_namespace: Optional[str] = None
+        # tiles are fetched in threads, outside application context
+        self.app = current_app._get_current_object()  # type: ignore
+
+    def get(self, url: str, **kwargs: Any) -> Tuple[int, bytes]:
+        match = get_tile_url_regex(self.url_template).match(url)
+        if not match:
+            return super().get(url, **kwargs)
+        namespace = self.tiles_namespace or self.url_template
+        key = '_'.join(match.group('z', 'x', 'y'))
+        with self.app.app_context():
+            content = map_tiles_cache.get(namespace, key)
+            if content is not None:
+                return 200, content
+            status_code, content = super().get(url, **kwargs)
+            if status_code == 200:
+                map_tiles_cache.set(namespace, key, content)
+        return status_code, content
+
+
+def get_pixel_coordinates(
+    map_data: np.ndarray, zoom: int, tile_size: int
+) -> np.ndarray:
+    """
+    Return pixel coordinates (Web Mercator projection, as in staticmap) of
+    map data points (longitude and latitude) at given zoom level
+    """
+    scale = tile_size * 2**zoom
+    latitudes = np.radians(map_data[:, 1])
+    return np.column_stack(
+        (
+            (map_data[:, 0] + 180) / 360 * scale,
+            (1 - np.log(np.tan(latitudes) + 1 / np.cos(latitudes)) / np.pi)
+            / 2
+            * scale,
+        )
+    )
+
+
+def get_map_zoom(m: StaticMap, map_data: np.ndarray) -> int:
     """
-    Generate and save map image from map data
+    Return the highest zoom level displaying all map data points on map
+    (same zoom as calculated by staticmap, without iterating over points
+    for each zoom level)
     """
-    m = StaticMap(400, 225, 10)
+    width, height = np.ptp(
+        get_pixel_coordinates(map_data, 0, m.tile_size), axis=0
+    )
+    for zoom in range(17, -1, -1):
+        if (
+            width * 2**zoom <= m.width - m.padding[0] * 2
+            and height * 2**zoom <= m.height - m.padding[1] * 2
+        ):
+            return zoom
+    return 0
+
+
+def simplify_map_data(
+    map_data: np.ndarray, zoom: int, tile_size: int, tolerance: float
+) -> np.ndarray:
+    """
+    Return map data without points that are not visible on map at given
+    zoom level (Douglas-Peucker algorithm with a tolerance in pixels)
+    """
+    pixel_coordinates = get_pixel_coordinates(map_data, zoom, tile_size)
+    return map_data[
+        get_douglas_peucker_indices(
+            pixel_coordinates[:, 0], pixel_coordinates[:, 1], tolerance
+        )
+    ]
+
+
+def generate_map(
+    map_filepath: str,
+    map_data: Union[List, np.ndarray],
+    tolerance: float = MAP_SIMPLIFICATION_TOLERANCE,
+) -> bytes:
+    """
+    Generate map image from map data (longitude and latitude of points),
+    save it and return image content.
+    Points are simplified before drawing, since a track can contain far
+    more points than the map image can display.
+    """
+    m = CachedStaticMap(400, 225, 10)
     m.headers = {'User-Agent': f'FitTrackee v{VERSION}'}
     if not current_app.config['TILE_SERVER']['DEFAULT_STATICMAP']:
         m.url_template = get_static_map_tile_server_url(
             current_app.config['TILE_SERVER']
         )
-    line = Line(map_data, '#3388FF', 4)
+        m.tiles_namespace = current_app.config['TILE_SERVER']['URL']
+    coordinates = np.asarray(map_data, dtype=np.float64)
+    zoom = get_map_zoom(m, coordinates)
+    if tolerance > 0:
+        coordinates = simplify_map_data(
+            coordinates, zoom, m.tile_size, tolerance
+        )
+    line = Line(coordinates.tolist(), '#3388FF', 4)
     m.add_line(line)
-    image = m.render()
-    image.save(map_filepath)
+    image = m.render(zoom=zoom)
+    content = get_image_content(image, 'png')
+    write_map_file(map_filepath, content)
+    generate_map_variants(map_filepath, image)
+    return content
+
+
+def get_image_content(image: Image.Image, image_format: str) -> bytes:
+    image_buffer = BytesIO()
+    image.save(image_buffer, format=image_format.upper())
+    return image_buffer.getvalue()
+
+
+def write_map_file(filepath: str, content: bytes) -> None:
+    # written in a temporary file first, since map can be generated
+    # concurrently by background task and on first request
+    fd, tmp_filepath = tempfile.mkstemp(
+        dir=os.path.dirname(filepath), suffix='.tmp'
+    )
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_filepath, filepath)
+
+
+def get_map_variant_filepath(
+    map_filepath: str, size: Optional[str] = None, image_format: str = 'png'
+) -> str:
+    """
+    Return path of map image variant, stored next to default map image
+    (for instance: 'map.png' -> 'map_small.webp')
+    """
+    if size is None and image_format == 'png':
+        return map_filepath
+    suffix = f'_{size}' if size else ''
+    return f'{os.path.splitext(map_filepath)[0]}{suffix}.{image_format}'
+
+
+def get_map_variants_filepaths(map_filepath: str) -> List[str]:
+    """
+    Return paths of all map image variants, except default map image
+    """
+    return [
+        get_map_variant_filepath(map_filepath, size, image_format)
+        for size in [None, *MAP_IMAGE_SIZES]
+        for image_format in MAP_IMAGE_FORMATS
+        if size is not None or image_format != 'png'
+    ]
+
+
+def generate_map_variant(
+    map_filepath: str,
+    image: Image.Image,
+    size: Optional[str],
+    image_format: str,
+) -> str:
+    variant_filepath = get_map_variant_filepath(
+        map_filepath, size, image_format
+    )
+    if size:
+        image = image.resize(MAP_IMAGE_SIZES[size], Image.LANCZOS)
+    write_map_file(variant_filepath, get_image_content(image, image_format))
+    return variant_filepath
+
+
+def generate_map_variants(map_filepath: str, image: Image.Image) -> None:
+    """
+    Generate and save resized and WebP variants of map image
+    """
+    for size in [None, *MAP_IMAGE_SIZES]:
+        for image_format in MAP_IMAGE_FORMATS:
+            if size is None and image_format == 'png':
+                continue
+            generate_map_variant(map_filepath, image, size, image_format)
 
 
-def get_map_hash(map_filepath: str) -> str:
+def get_map_variant(
+    map_filepath: str, size: Optional[str], image_format: str
+) -> str:
+    """
+    Return path of map image variant.
+    Variant is generated from default map image if it does not exist yet
+    (for maps generated before variants were added).
     """
-    Generate a md5 hash used as id instead of workout id, to retrieve map
-    image (maps are sensitive data)
+    variant_filepath = get_map_variant_filepath(
+        map_filepath, size, image_format
+    )
+    if os.path.exists(variant_filepath):
+        return variant_filepath
+    with Image.open(map_filepath) as image:
+        image.load()
+        return generate_map_variant(map_filepath, image, size, image_format)
+
+
+def generate_map_id() -> str:
+    """
+    Generate a random id used instead of workout id, to retrieve map
+    image (maps are sensitive data).
+    Map id is set on workout creation, before map image generation, so it
+    can not be a hash of image content.
+    """
+    return secrets.token_hex(16)
+
+
+class RequestsCoalescer:
     """
-    md5 = hashlib.md5()  # nosec  # need 3.9+ to use 'usedforsecurity' flag
-    absolute_map_filepath = get_absolute_file_path(map_filepath)
-    with open(absolute_map_filepath, 'rb') as f:
-        for chunk in iter(lambda: f.read(128 * md5.block_size), b''):
-            md5.update(chunk)
-    return md5.hexdigest()
+    Execute only once concurrent calls with the same key, other callers
+    waiting for first call result
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+
+    def execute(self, key: str, function: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._pending.get(key)
+            is_first_call = future is None
+            if future is None:
+                future = Future()
+                self._pending[key] = future
+        if not is_first_call:
+            return future.result()
+
+        try:
+            result = function()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+
+tiles_requests_coalescer = RequestsCoalescer()
+
+
+def get_tile_content_type(content: bytes) -> str:
+    for signature, content_type in TILES_CONTENT_TYPES.items():
+        if content.startswith(signature):
+            return content_type
+    return 'image/png'
+
+
+def fetch_map_tile(
+    url: str, namespace: str, key: str
+) -> Tuple[int, bytes, str]:
+    response = tiles_session.get(
+        url, headers={'User-Agent': TILES_USER_AGENT}, timeout=30
+    )
+    if response.status_code == 200:
+        map_tiles_cache.set(namespace, key, response.content)
+    return (
+        response.status_code,
+        response.content,
+        response.headers.get('content-type', 'image/png'),
+    )
+
+
+def get_map_tile_content(
+    tile_server_config: Dict, s: str, z: str, x: str, y: str
+) -> Tuple[int, bytes, str]:
+    """
+    Return map tile status code, content and content type from cache or
+    from tile server (concurrent requests for the same tile fetch it only
+    once)
+    """
+    namespace = tile_server_config['URL']
+    key = f'{z}_{x}_{y}'
+    content = map_tiles_cache.get(namespace, key)
+    if content is not None:
+        return 200, content, get_tile_content_type(content)
+
+    url = tile_server_config['URL'].format(s=s, z=z, x=x, y=y)
+    return tiles_requests_coalescer.execute(
+        f'{namespace}:{key}', lambda: fetch_map_tile(url, namespace, key)
+    )
+
+
+def get_map_tile_etag(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:32]
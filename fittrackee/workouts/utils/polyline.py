@@ -0,0 +1,26 @@
+import numpy as np
+
+
+def encode_polyline(
+    latitudes: np.ndarray, longitudes: np.ndarray, precision: int = 5
+) -> str:
+    """
+    Return coordinates encoded with Encoded Polyline Algorithm Format
+    (see https://developers.google.com/maps/documentation/utilities/polylinealgorithm)
+    """  # noqa
+    factor = 10**precision
+    coordinates = np.empty(latitudes.size * 2, dtype=np.int64)
+    coordinates[0::2] = np.round(latitudes * factor)
+    coordinates[1::2] = np.round(longitudes * factor)
+    deltas = coordinates.copy()
+    deltas[2:] -= coordinates[:-2]
+    # negative values are inverted after left shift
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1).tolist()
+
+    encoded_chars = []
+    for value in values:
+        while value >= 0x20:
+            encoded_chars.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        encoded_chars.append(chr(value + 63))
+    return ''.join(encoded_chars)
@@ -0,0 +1,40 @@
+import os
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+from flask import json
+
+from fittrackee.cache import UserResponsesCache
+
+# statistics and records responses by user, invalidated when user workouts
+# are modified
+stats_cache = UserResponsesCache(
+    'stats', ttl=int(os.getenv('STATS_CACHE_TTL', 86400))
+)
+
+
+def get_stats_cache_key(
+    endpoint: str,
+    args: Optional[Dict] = None,
+    user_timezone: Optional[str] = None,
+) -> str:
+    """
+    Return cache key from endpoint, query args used by endpoint (sorted to
+    get the same key for the same args) and user timezone (used for dates
+    filters)
+    """
+    query = urlencode(
+        sorted((key, value) for key, value in (args or {}).items() if value)
+    )
+    return f'{endpoint}:{query}:{user_timezone}'
+
+
+def get_cached_response(namespace: Optional[str], key: str) -> Optional[Dict]:
+    cached_response = stats_cache.get(namespace, key)
+    if cached_response is None:
+        return None
+    return json.loads(cached_response)
+
+
+def cache_response(namespace: Optional[str], key: str, response: Dict) -> None:
+    stats_cache.set(namespace, key, json.dumps(response).encode())
@@ -0,0 +1,175 @@
+import os
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+
+from .gpx_metrics import (
+    SegmentPoints,
+    get_distances,
+    get_distances_from_previous_points,
+)
+from .gpx_parser import GpxStreamParser
+from .gpx_storage import get_uncompressed_gpx_filepath
+
+# Track data are stored in a .npy file next to gpx file, one row per column
+# (columns are contiguous and can be read with numpy.memmap).
+# Only first track is stored, like chart data.
+TRACK_DATA_COLUMNS = [
+    'time',  # microseconds since epoch (UTC)
+    'latitude',
+    'longitude',
+    'elevation',  # NaN if missing
+    'distance',  # cumulative distance from first point (meters)
+    'speed',  # m/s, NaN if it can not be calculated
+    'segment',  # segment index in track
+]
+(
+    TIME,
+    LATITUDE,
+    LONGITUDE,
+    ELEVATION,
+    DISTANCE,
+    SPEED,
+    SEGMENT,
+) = range(len(TRACK_DATA_COLUMNS))
+
+
+def get_track_data_filepath(gpx_filepath: str) -> str:
+    return (
+        f'{os.path.splitext(get_uncompressed_gpx_filepath(gpx_filepath))[0]}'
+        '.npy'
+    )
+
+
+def _get_speeds(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    elevations: np.ndarray,
+    times: np.ndarray,
+) -> np.ndarray:
+    """
+    Return speed at each segment point, calculated like
+    gpxpy.gpx.GPXTrackSegment.get_speed (average of speeds from previous
+    and to next point)
+    """
+    speeds_from_previous = np.full(latitudes.size, np.nan)
+    speeds_to_next = np.full(latitudes.size, np.nan)
+    if latitudes.size < 2:
+        return speeds_from_previous
+
+    seconds = np.abs(np.diff(times)) / 1e6
+    with_seconds = seconds != 0
+    distances_from_previous = get_distances(
+        latitudes[1:],
+        longitudes[1:],
+        elevations[1:],
+        latitudes[:-1],
+        longitudes[:-1],
+        elevations[:-1],
+    )
+    distances_to_next = get_distances(
+        latitudes[:-1],
+        longitudes[:-1],
+        elevations[:-1],
+        latitudes[1:],
+        longitudes[1:],
+        elevations[1:],
+    )
+    speeds_from_previous[1:][with_seconds] = (
+        distances_from_previous[with_seconds] / seconds[with_seconds]
+    )
+    speeds_to_next[:-1][with_seconds] = (
+        distances_to_next[with_seconds] / seconds[with_seconds]
+    )
+
+    with_speed_from_previous = ~np.isnan(speeds_from_previous) & (
+        speeds_from_previous != 0
+    )
+    with_speed_to_next = ~np.isnan(speeds_to_next) & (speeds_to_next != 0)
+    return np.where(
+        with_speed_from_previous & with_speed_to_next,
+        (speeds_from_previous + speeds_to_next) / 2.0,
+        np.where(
+            with_speed_from_previous, speeds_from_previous, speeds_to_next
+        ),
+    )
+
+
+def generate_track_data(gpx_filepath: str) -> Optional[np.ndarray]:
+    """
+    Return track data calculated from first track of gpx file, or None if
+    gpx file has no tracks
+    """
+    segments_data: List[np.ndarray] = []
+    parser = GpxStreamParser(gpx_filepath)
+    for track_idx, segment_idx, points in parser.iter_segments():
+        if track_idx > 0:
+            break
+        segment_points = SegmentPoints()
+        for point in points:
+            segment_points.add_point(point)
+        (
+            latitudes,
+            longitudes,
+            elevations,
+            times,
+            _,
+        ) = segment_points.to_arrays()
+        segment_data = np.empty((len(TRACK_DATA_COLUMNS), latitudes.size))
+        segment_data[TIME] = times
+        segment_data[LATITUDE] = latitudes
+        segment_data[LONGITUDE] = longitudes
+        segment_data[ELEVATION] = elevations
+        segment_data[SPEED] = _get_speeds(
+            latitudes, longitudes, elevations, times
+        )
+        segment_data[SEGMENT] = segment_idx
+        segments_data.append(segment_data)
+
+    if parser.tracks_count == 0:
+        return None
+
+    track_data = (
+        np.concatenate(segments_data, axis=1)
+        if segments_data
+        else np.empty((len(TRACK_DATA_COLUMNS), 0))
+    )
+    # distance from previous point in track, even if in previous segment
+    distances = np.zeros(track_data[LATITUDE].size)
+    distances[1:] = get_distances_from_previous_points(
+        track_data[LATITUDE], track_data[LONGITUDE], track_data[ELEVATION]
+    )
+    track_data[DISTANCE] = np.cumsum(distances)
+    return track_data
+
+
+def write_track_data(gpx_filepath: str) -> Optional[np.ndarray]:
+    """
+    Generate track data and store it next to gpx file
+    """
+    track_data = generate_track_data(gpx_filepath)
+    if track_data is None:
+        return None
+    track_data_filepath = get_track_data_filepath(gpx_filepath)
+    # written in a temporary file first, to avoid reading a partial file
+    fd, tmp_filepath = tempfile.mkstemp(
+        dir=os.path.dirname(track_data_filepath), suffix='.tmp'
+    )
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, track_data)
+    os.replace(tmp_filepath, track_data_filepath)
+    return track_data
+
+
+def get_track_data(gpx_filepath: str) -> Optional[np.ndarray]:
+    """
+    Return track data from file stored next to gpx file (without loading it
+    in memory).
+    If it does not exist yet (workouts created before track data storage),
+    file is created.
+    """
+    track_data_filepath = get_track_data_filepath(gpx_filepath)
+    if not os.path.exists(track_data_filepath):
+        return write_track_data(gpx_filepath)
+    return np.load(track_data_filepath, mmap_mode='r')
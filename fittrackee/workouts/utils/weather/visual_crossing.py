@@ -1,12 +1,28 @@
+import json
+import os
 from datetime import datetime, timedelta
 from typing import Dict, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from fittrackee import appLog
+from fittrackee.cache import Cache
 
 from .base_weather import BaseWeather
 
+# weather data are cached by location (rounded to about 1km) and by hour,
+# since workouts imported at once often share start or end location
+weather_cache = Cache(
+    'weather',
+    max_size=int(os.getenv('WEATHER_CACHE_MAX_SIZE', 1)) * 1024 * 1024,
+    ttl=int(os.getenv('WEATHER_CACHE_TTL', 7 * 86400)),
+)
+# session reusing connections to weather API
+weather_session = requests.Session()
+for prefix in ['http://', 'https://']:
+    weather_session.mount(prefix, HTTPAdapter(pool_maxsize=10))
+
 
 class VisualCrossing(BaseWeather):
     def __init__(self, api_key: str):
@@ -45,9 +61,21 @@ class VisualCrossing(BaseWeather):
         )
         return int(trunc_time.timestamp())
 
+    @staticmethod
+    def _get_cache_key(
+        latitude: float, longitude: float, timestamp: int
+    ) -> str:
+        return f'{latitude:.2f},{longitude:.2f}/{timestamp}'
+
     def _get_data(
         self, latitude: float, longitude: float, time: datetime
     ) -> Optional[Dict]:
+        timestamp = self._get_timestamp(time)
+        cache_key = self._get_cache_key(latitude, longitude, timestamp)
+        cached_data = weather_cache.get('visualcrossing', cache_key)
+        if cached_data is not None:
+            return json.loads(cached_data)
+
         # All requests to the Timeline Weather API use the following the form:
 
         # https://weather.visualcrossing.com/VisualCrossingWebServices/rest
@@ -60,16 +88,13 @@ class VisualCrossing(BaseWeather):
         # date1 (optional) – is the start date for which to retrieve weather
         # data. All dates and times are in local time of the **location**
         # specified.
-        url = (
-            f"{self.base_url}/timeline/{latitude},{longitude}"
-            f"/{self._get_timestamp(time)}"
-        )
+        url = f"{self.base_url}/timeline/{latitude},{longitude}/{timestamp}"
         appLog.debug(
             f'VC_weather: getting weather from {url}'.replace(
                 self.api_key, '*****'
             )
         )
-        r = requests.get(url, params=self.params, timeout=10)
+        r = weather_session.get(url, params=self.params, timeout=10)
         r.raise_for_status()
         res = r.json()
         weather = res['currentConditions']
@@ -81,4 +106,10 @@ class VisualCrossing(BaseWeather):
             'wind': weather['windspeed'] * 1000 / (60 * 60),  # km/h to m/s
             'windBearing': weather['winddir'],
         }
+        try:
+            weather_cache.set(
+                'visualcrossing', cache_key, json.dumps(data).encode()
+            )
+        except Exception as e:  # caching must not prevent getting weather
+            appLog.error(f'VC_weather: unable to cache weather data: {e}')
         return data
@@ -0,0 +1,300 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from gpxpy.gpx import GPXTrackPoint
+from sqlalchemy import cast, or_
+from sqlalchemy.orm import Query
+
+from fittrackee import appLog, db
+from fittrackee.files import get_absolute_file_path
+
+from ..exceptions import InvalidGPXException
+from ..models import Workout
+from .gpx_metrics import EPOCH_UTC
+from .gpx_parser import GpxPoint, GpxStreamParser, get_last_track_point
+from .gpx_segments import get_segments_index_filepath
+from .gpx_storage import is_gpx_file_compressed, iter_gpx_file, open_gpx_file
+from .track_data import (
+    ELEVATION,
+    LATITUDE,
+    LONGITUDE,
+    TIME,
+    get_track_data_filepath,
+)
+from .weather.base_weather import BaseWeather
+
+
+class RateLimiter:
+    """
+    Limit calls to a maximum number per second, shared between threads
+    (calls are spaced evenly)
+    """
+
+    def __init__(self, max_calls_per_second: float) -> None:
+        self.interval = (
+            1 / max_calls_per_second if max_calls_per_second > 0 else 0
+        )
+        self._next_call_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_call_time - now
+            self._next_call_time = (
+                max(now, self._next_call_time) + self.interval
+            )
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+# size of gpx file end read to get last point (doubled until a point is
+# found)
+GPX_FILE_TAIL_SIZE = 16 * 1024
+
+
+def _get_points_from_track_data(
+    track_data_filepath: str,
+) -> List[GPXTrackPoint]:
+    track_data = np.load(track_data_filepath, mmap_mode='r')
+    if track_data[TIME].size == 0:
+        return []
+    weather_points = []
+    for index in [0, -1]:
+        elevation = float(track_data[ELEVATION, index])
+        weather_points.append(
+            GPXTrackPoint(
+                latitude=float(track_data[LATITUDE, index]),
+                longitude=float(track_data[LONGITUDE, index]),
+                elevation=None if np.isnan(elevation) else elevation,
+                time=EPOCH_UTC
+                + timedelta(microseconds=int(track_data[TIME, index])),
+            )
+        )
+    return weather_points
+
+
+def _get_first_point(gpx_filepath: str) -> Optional[GpxPoint]:
+    """
+    Return first point of first track, stopping parsing once read
+    """
+    segments = GpxStreamParser(gpx_filepath).iter_segments()
+    try:
+        for track_idx, _, points in segments:
+            if track_idx > 0:
+                return None
+            point = next(points, None)
+            if point is not None:
+                return point
+        return None
+    finally:
+        segments.close()
+
+
+def _get_last_point_from_segments_index(
+    gpx_filepath: str,
+) -> Optional[GpxPoint]:
+    """
+    Return last point of first track from last segment byte range stored
+    in segments index, if it exists
+    """
+    index_filepath = get_segments_index_filepath(gpx_filepath)
+    if not os.path.exists(index_filepath):
+        return None
+    with open(index_filepath) as f:
+        index = json.load(f)
+    with open_gpx_file(gpx_filepath) as gpx_file:
+        for start, end in reversed(index['segments']):
+            gpx_file.seek(start)
+            point = get_last_track_point(gpx_file.read(end - start))
+            if point is not None:
+                return point
+    return None
+
+
+def _get_last_point_from_file_end(gpx_filepath: str) -> Optional[GpxPoint]:
+    """
+    Return last point from gpx file end (read size is doubled until a
+    point is found).
+    Compressed file end can not be read without decompressing file, so
+    decompressed content is read by chunks, keeping only last chunks.
+    """
+    if is_gpx_file_compressed(gpx_filepath):
+        tail = b''
+        for chunk in iter_gpx_file(gpx_filepath):
+            tail = tail[-GPX_FILE_TAIL_SIZE:] + chunk
+        return get_last_track_point(tail)
+
+    with open(gpx_filepath, 'rb') as gpx_file:
+        file_size = gpx_file.seek(0, os.SEEK_END)
+        tail_size = GPX_FILE_TAIL_SIZE
+        while True:
+            start = max(file_size - tail_size, 0)
+            gpx_file.seek(start)
+            point = get_last_track_point(gpx_file.read(file_size - start))
+            if point is not None or start == 0:
+                return point
+            tail_size *= 2
+
+
+def get_workout_weather_points(gpx_filepath: str) -> List[GPXTrackPoint]:
+    """
+    Return first and last points, from track data stored next to gpx file
+    if they exist.
+    Otherwise gpx file is not fully parsed (and track data are not
+    generated): parsing stops after first point, and last point is read
+    from last segment byte range if segments index exists, or from file end
+    (for files with several tracks, last point may not belong to first
+    track if segments index does not exist).
+    """
+    track_data_filepath = get_track_data_filepath(gpx_filepath)
+    if os.path.exists(track_data_filepath):
+        return _get_points_from_track_data(track_data_filepath)
+
+    first_point = _get_first_point(gpx_filepath)
+    if first_point is None:
+        return []
+    last_point = _get_last_point_from_segments_index(
+        gpx_filepath
+    ) or _get_last_point_from_file_end(gpx_filepath)
+    if last_point is None:
+        raise InvalidGPXException('error', 'gpx file is invalid')
+    return [
+        GPXTrackPoint(
+            latitude=point.latitude,
+            longitude=point.longitude,
+            elevation=point.elevation,
+            time=point.time,
+        )
+        for point in [first_point, last_point]
+    ]
+
+
+def get_workouts_without_weather_query(from_id: int) -> Query:
+    # weather set to None on workout creation is stored as JSON 'null'
+    return (
+        db.session.query(
+            Workout.id, Workout.gpx, Workout.weather_start, Workout.weather_end
+        )
+        .filter(
+            Workout.id > from_id,
+            Workout.gpx != None,  # noqa
+            or_(
+                Workout.weather_start == None,  # noqa
+                cast(Workout.weather_start, db.Text) == 'null',
+                Workout.weather_end == None,  # noqa
+                cast(Workout.weather_end, db.Text) == 'null',
+            ),
+        )
+        .order_by(Workout.id)
+    )
+
+
+def backfill_weather(
+    weather_api: BaseWeather,
+    batch_size: int = 100,
+    workers: int = 4,
+    max_requests_per_second: float = 5,
+    from_id: int = 0,
+    limit: Optional[int] = None,
+    on_batch_end: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Fetch weather data for workouts with gpx file and missing weather data,
+    and update workouts by batch.
+
+    Workouts are processed by ascending id, so processing can be resumed
+    from last processed workout id (returned in counts and passed to
+    'on_batch_end' callback after each committed batch).
+    Records are not updated, since weather does not change them.
+    """
+    counts = {
+        'processed': 0,
+        'updated': 0,
+        'errors': 0,
+        'last_workout_id': from_id,
+    }
+    rate_limiter = RateLimiter(max_requests_per_second)
+
+    def get_weather(point: GPXTrackPoint) -> Optional[Dict]:
+        rate_limiter.wait()
+        return weather_api.get_weather(point)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while limit is None or counts['processed'] < limit:
+            workouts = (
+                get_workouts_without_weather_query(counts['last_workout_id'])
+                .limit(
+                    batch_size
+                    if limit is None
+                    else min(batch_size, limit - counts['processed'])
+                )
+                .all()
+            )
+            if not workouts:
+                break
+
+            futures = {}
+            for workout in workouts:
+                try:
+                    weather_points = get_workout_weather_points(
+                        get_absolute_file_path(workout.gpx)
+                    )
+                except Exception as e:
+                    appLog.error(
+                        f'error when reading track data for workout '
+                        f'{workout.id}: {e}'
+                    )
+                    weather_points = []
+                futures[workout.id] = [
+                    executor.submit(get_weather, point)
+                    for point in weather_points
+                ]
+
+            mappings = []
+            for workout in workouts:
+                try:
+                    weather_data = [
+                        future.result() for future in futures[workout.id]
+                    ]
+                except Exception as e:
+                    appLog.error(
+                        f'error when getting weather data for workout '
+                        f'{workout.id}: {e}'
+                    )
+                    counts['errors'] += 1
+                    continue
+                if not weather_data:
+                    counts['errors'] += 1
+                    continue
+                weather_start = workout.weather_start or weather_data[0]
+                weather_end = workout.weather_end or weather_data[1]
+                if (weather_start, weather_end) != (
+                    workout.weather_start,
+                    workout.weather_end,
+                ):
+                    mappings.append(
+                        {
+                            'id': workout.id,
+                            'weather_start': weather_start,
+                            'weather_end': weather_end,
+                        }
+                    )
+
+            # bulk update, without triggering workout update events
+            # (that update records)
+            db.session.bulk_update_mappings(Workout, mappings)
+            db.session.commit()
+            counts['processed'] += len(workouts)
+            counts['updated'] += len(mappings)
+            counts['last_workout_id'] = workouts[-1].id
+            if on_batch_end:
+                on_batch_end(counts)
+
+    return counts
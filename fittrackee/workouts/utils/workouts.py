@@ -1,13 +1,25 @@
+import multiprocessing
 import os
 import secrets
+import shutil
+import threading
 import zipfile
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Union
-from uuid import UUID
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from uuid import UUID, uuid4
 
 import gpxpy.gpx
 import pytz
-from flask import current_app
+from flask import Flask, current_app
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
@@ -16,9 +28,36 @@ from fittrackee.files import get_absolute_file_path
 from fittrackee.users.models import User, UserSportPreference
 
 from ..exceptions import InvalidGPXException, WorkoutException
-from ..models import Sport, Workout, WorkoutSegment
-from .gpx import get_gpx_info
-from .maps import generate_map, get_map_hash
+from ..models import (
+    Record,
+    Sport,
+    UserSportDailyStats,
+    Workout,
+    WorkoutSegment,
+    WorkoutUpload,
+    deferred_records_update,
+    rebuild_user_daily_stats,
+    update_records,
+)
+from .gpx import get_gpx_info, get_weather_data, parse_gpx_file
+from .gpx_segments import get_segments_index_filepath, write_segments_index
+from .gpx_storage import COMPRESSED_GPX_EXTENSION, compress_gpx_file
+from .maps import generate_map, generate_map_id, get_map_variants_filepaths
+from .stats_cache import stats_cache
+from .track_data import (
+    LATITUDE,
+    LONGITUDE,
+    get_track_data,
+    get_track_data_filepath,
+    write_track_data,
+)
+
+# number of workouts saved at once when an uploaded zip archive is
+# processed asynchronously (upload progress is updated after each chunk)
+WORKOUTS_SAVE_CHUNK_SIZE = 10
+# process pool shared by zip archives imports, with its number of processes
+_parsing_process_pool: Optional[Tuple[int, ProcessPoolExecutor]] = None
+_parsing_process_pool_lock = threading.Lock()
 
 
 def get_workout_datetime(
@@ -284,66 +323,134 @@ def delete_files(
     try:
         if absolute_gpx_filepath and os.path.exists(absolute_gpx_filepath):
             os.remove(absolute_gpx_filepath)
-        if absolute_map_filepath and os.path.exists(absolute_map_filepath):
-            os.remove(absolute_map_filepath)
+        if absolute_gpx_filepath:
+            for filepath in [
+                get_track_data_filepath(absolute_gpx_filepath),
+                get_segments_index_filepath(absolute_gpx_filepath),
+            ]:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+        if absolute_map_filepath:
+            for filepath in [
+                absolute_map_filepath,
+                *get_map_variants_filepaths(absolute_map_filepath),
+            ]:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
     except Exception:
         appLog.error('Unable to delete files after processing error.')
 
 
-def process_one_gpx_file(
-    params: Dict, filename: str, stopped_speed_threshold: float
-) -> Workout:
+def get_gpx_file_data(
+    file_path: str, stopped_speed_threshold: float
+) -> Tuple[Dict, List]:
     """
-    Get all data from a gpx file to create a workout with map image
+    Parse gpx file and store track data and segments index next to it.
+    This CPU-bound part does not need application context, it can be
+    executed in a process pool.
+    Map data are not returned, map image is generated later from track data.
     """
-    absolute_gpx_filepath = None
-    absolute_map_filepath = None
     try:
-        gpx_data, map_data, weather_data = get_gpx_info(
-            params['file_path'], stopped_speed_threshold
-        )
-        auth_user = params['auth_user']
-        workout_date, _ = get_workout_datetime(
-            workout_date=gpx_data['start'],
-            date_str_format=None if gpx_data else '%Y-%m-%d %H:%M',
-            user_timezone=None,
+        gpx_data, _, weather_points = parse_gpx_file(
+            file_path, stopped_speed_threshold
         )
-        new_filepath = get_new_file_path(
-            auth_user_id=auth_user.id,
-            workout_date=workout_date.strftime('%Y-%m-%d_%H-%M-%S'),
-            old_filename=filename,
-            sport_id=params['sport_id'],
-        )
-        absolute_gpx_filepath = get_absolute_file_path(new_filepath)
-        os.rename(params['file_path'], absolute_gpx_filepath)
-        gpx_data['filename'] = new_filepath
-
-        map_filepath = get_new_file_path(
-            auth_user_id=auth_user.id,
-            workout_date=workout_date.strftime('%Y-%m-%d_%H-%M-%S'),
-            extension='.png',
-            sport_id=params['sport_id'],
-        )
-        absolute_map_filepath = get_absolute_file_path(map_filepath)
-        generate_map(absolute_map_filepath, map_data)
+        write_track_data(file_path)
+        write_segments_index(file_path)
     except (gpxpy.gpx.GPXXMLSyntaxException, TypeError) as e:
-        delete_files(absolute_gpx_filepath, absolute_map_filepath)
         raise WorkoutException('error', 'error during gpx file parsing', e)
     except InvalidGPXException as e:
-        delete_files(absolute_gpx_filepath, absolute_map_filepath)
         raise WorkoutException('error', str(e))
     except Exception as e:
-        delete_files(absolute_gpx_filepath, absolute_map_filepath)
         raise WorkoutException('error', 'error during gpx processing', e)
+    return gpx_data, weather_points
+
+
+def store_gpx_file(
+    params: Dict, filename: str, gpx_data: Dict
+) -> Tuple[str, str]:
+    """
+    Move gpx file (and its track data and segments index) to user workouts
+    directory and return gpx and map file paths.
+    Gpx file is compressed if compression is enabled.
+    """
+    auth_user = params['auth_user']
+    workout_date, _ = get_workout_datetime(
+        workout_date=gpx_data['start'],
+        date_str_format=None if gpx_data else '%Y-%m-%d %H:%M',
+        user_timezone=None,
+    )
+    new_filepath = get_new_file_path(
+        auth_user_id=auth_user.id,
+        workout_date=workout_date.strftime('%Y-%m-%d_%H-%M-%S'),
+        old_filename=filename,
+        sport_id=params['sport_id'],
+    )
+    absolute_gpx_filepath = get_absolute_file_path(new_filepath)
+    os.rename(params['file_path'], absolute_gpx_filepath)
+    if current_app.config['GPX_COMPRESSION']:
+        compress_gpx_file(absolute_gpx_filepath)
+        new_filepath = f'{new_filepath}{COMPRESSED_GPX_EXTENSION}'
+    for get_filepath in [get_track_data_filepath, get_segments_index_filepath]:
+        filepath = get_filepath(params['file_path'])
+        if os.path.exists(filepath):
+            os.rename(filepath, get_filepath(absolute_gpx_filepath))
+    gpx_data['filename'] = new_filepath
+
+    map_filepath = get_new_file_path(
+        auth_user_id=auth_user.id,
+        workout_date=workout_date.strftime('%Y-%m-%d_%H-%M-%S'),
+        extension='.png',
+        sport_id=params['sport_id'],
+    )
+    return new_filepath, map_filepath
+
+
+def get_workout_weather_data(app: Flask, weather_points: List) -> List:
+    """
+    Get weather data for first and last gpx points.
+    This I/O-bound part (weather API calls) can be executed in a thread
+    pool.
+    """
+    with app.app_context():
+        try:
+            return get_weather_data(weather_points)
+        except Exception as e:
+            raise WorkoutException('error', 'error during gpx processing', e)
+
+
+def create_workout_with_gpx_data(
+    params: Dict,
+    gpx_data: Dict,
+    map_filepath: str,
+    weather_data: List,
+) -> Workout:
+    """
+    Create workout with a pending map (map image is generated in background
+    or on first request)
+    """
+    new_workout = create_workout(
+        params['auth_user'], params['workout_data'], gpx_data
+    )
+    new_workout.map = map_filepath
+    new_workout.map_id = generate_map_id()
+    new_workout.weather_start = weather_data[0]
+    new_workout.weather_end = weather_data[1]
+    return new_workout
+
 
+def save_workout(
+    params: Dict,
+    gpx_data: Dict,
+    map_filepath: str,
+    weather_data: List,
+) -> Workout:
+    """
+    Create workout and its segments in database
+    """
     try:
-        new_workout = create_workout(
-            auth_user, params['workout_data'], gpx_data
+        new_workout = create_workout_with_gpx_data(
+            params, gpx_data, map_filepath, weather_data
         )
-        new_workout.map = map_filepath
-        new_workout.map_id = get_map_hash(map_filepath)
-        new_workout.weather_start = weather_data[0]
-        new_workout.weather_end = weather_data[1]
         db.session.add(new_workout)
         db.session.flush()
 
@@ -355,10 +462,97 @@ def process_one_gpx_file(
         db.session.commit()
         return new_workout
     except Exception as e:
-        delete_files(absolute_gpx_filepath, absolute_map_filepath)
         raise WorkoutException('error', 'error when saving workout', e)
 
 
+def save_workouts(
+    params: Dict, workouts_data: List[Tuple[Dict, str, List]]
+) -> List[Workout]:
+    """
+    Create workouts and their segments in database with batched inserts
+    (workouts data: gpx data, map file path and weather data).
+    Records are updated once per sport and not after each workout.
+    """
+    try:
+        with deferred_records_update(db.session):
+            new_workouts = [
+                create_workout_with_gpx_data(params, *workout_data)
+                for workout_data in workouts_data
+            ]
+            db.session.add_all(new_workouts)
+            db.session.flush()
+            db.session.add_all(
+                [
+                    create_segment(
+                        new_workout.id, new_workout.uuid, segment_data
+                    )
+                    for new_workout, (gpx_data, *_) in zip(
+                        new_workouts, workouts_data
+                    )
+                    for segment_data in gpx_data['segments']
+                ]
+            )
+        db.session.commit()
+        return new_workouts
+    except Exception as e:
+        raise WorkoutException('error', 'error when saving workout', e)
+
+
+def delete_workout_files(
+    gpx_filepath: Optional[str], map_filepath: Optional[str]
+) -> None:
+    delete_files(
+        get_absolute_file_path(gpx_filepath) if gpx_filepath else None,
+        get_absolute_file_path(map_filepath) if map_filepath else None,
+    )
+
+
+def generate_workout_map(workout: Workout) -> bool:
+    """
+    Generate workout map image from track data if it does not exist yet,
+    and return True if map image exists
+    """
+    if not workout.map or not workout.gpx:
+        return False
+    absolute_map_filepath = get_absolute_file_path(workout.map)
+    if os.path.exists(absolute_map_filepath):
+        return True
+    try:
+        track_data = get_track_data(get_absolute_file_path(workout.gpx))
+    except FileNotFoundError:
+        return False
+    if track_data is None or track_data[LATITUDE].size == 0:
+        return False
+    generate_map(absolute_map_filepath, track_data[[LONGITUDE, LATITUDE]].T)
+    return True
+
+
+def process_one_gpx_file(
+    params: Dict, filename: str, stopped_speed_threshold: float
+) -> Workout:
+    """
+    Get all data from a gpx file to create a workout (map image is not
+    generated here)
+    """
+    gpx_filepath = None
+    map_filepath = None
+    try:
+        gpx_data, weather_points = get_gpx_file_data(
+            params['file_path'], stopped_speed_threshold
+        )
+        try:
+            gpx_filepath, map_filepath = store_gpx_file(
+                params, filename, gpx_data
+            )
+        except Exception as e:
+            raise WorkoutException('error', 'error during gpx processing', e)
+        weather_data = get_workout_weather_data(current_app, weather_points)
+        return save_workout(params, gpx_data, map_filepath, weather_data)
+    except WorkoutException:
+        delete_workout_files(gpx_filepath, map_filepath)
+        raise
+
+
 def is_gpx_file(filename: str) -> bool:
     return (
         '.' in filename
@@ -367,22 +561,205 @@ def is_gpx_file(filename: str) -> bool:
     )
 
 
+def get_parsing_process_pool(processes: int) -> ProcessPoolExecutor:
+    """
+    Return process pool shared by imports, created on first use (or when
+    number of processes changes).
+    Processes are started with 'spawn' method, since forking a
+    multithreaded process (application or task queue worker) may deadlock.
+    """
+    global _parsing_process_pool
+    with _parsing_process_pool_lock:
+        if (
+            _parsing_process_pool is None
+            or _parsing_process_pool[0] != processes
+        ):
+            if _parsing_process_pool is not None:
+                _parsing_process_pool[1].shutdown(wait=False)
+            _parsing_process_pool = (
+                processes,
+                ProcessPoolExecutor(
+                    max_workers=processes,
+                    mp_context=multiprocessing.get_context('spawn'),
+                ),
+            )
+        return _parsing_process_pool[1]
+
+
+def reset_parsing_process_pool(process_pool: ProcessPoolExecutor) -> None:
+    global _parsing_process_pool
+    with _parsing_process_pool_lock:
+        if (
+            _parsing_process_pool is not None
+            and _parsing_process_pool[1] is process_pool
+        ):
+            _parsing_process_pool = None
+    process_pool.shutdown(wait=False)
+
+
+@contextmanager
+def get_parsing_executor(processes: int) -> Iterator[Executor]:
+    """
+    Return executor to parse gpx files: shared process pool if processes
+    are configured (not shut down on exit, unless a process terminated
+    abruptly), otherwise a thread
+    """
+    if processes <= 0:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            yield executor
+        return
+    process_pool = get_parsing_process_pool(processes)
+    try:
+        yield process_pool
+    except BrokenProcessPool:
+        reset_parsing_process_pool(process_pool)
+        raise
+
+
+def extract_gpx_file(
+    zip_ref: zipfile.ZipFile, zip_info: zipfile.ZipInfo, dir_path: str
+) -> str:
+    """
+    Copy a gpx file from zip archive to user workouts directory (with a
+    temporary name, renamed when workout is created)
+    """
+    file_path = get_file_path(
+        dir_path, f'import_{secrets.token_urlsafe(8)}.gpx'
+    )
+    with zip_ref.open(zip_info) as zip_file, open(file_path, 'wb') as f:
+        shutil.copyfileobj(zip_file, f)
+    return file_path
+
+
+def save_pending_workouts(
+    common_params: Dict,
+    pending_workouts: List[Tuple[str, Dict, str, str, Future]],
+    on_file_processed: Optional[
+        Callable[[str, Optional[Workout], Optional[WorkoutException]], None]
+    ] = None,
+) -> List[Workout]:
+    """
+    Wait for weather data of workouts with stored files and save workouts
+    in database at once.
+
+    If 'on_file_processed' is provided, it is called for each file (with
+    created workout or error), and workouts are saved one by one if
+    batch saving fails, to get files in error.
+    """
+    if not pending_workouts:
+        return []
+    workouts_to_save: List[Tuple[str, str, str, Tuple[Dict, str, List]]] = []
+    for (
+        gpx_file,
+        gpx_data,
+        gpx_filepath,
+        map_filepath,
+        io_future,
+    ) in pending_workouts:
+        try:
+            weather_data = io_future.result()
+        except WorkoutException as e:
+            if on_file_processed is None:
+                raise
+            delete_workout_files(gpx_filepath, map_filepath)
+            on_file_processed(gpx_file, None, e)
+            continue
+        workouts_to_save.append(
+            (
+                gpx_file,
+                gpx_filepath,
+                map_filepath,
+                (gpx_data, map_filepath, weather_data),
+            )
+        )
+
+    try:
+        new_workouts = save_workouts(
+            common_params,
+            [workout[3] for workout in workouts_to_save],
+        )
+    except WorkoutException:
+        if on_file_processed is None:
+            raise
+        db.session.rollback()
+        # saving workouts one by one to get files in error
+        new_workouts = []
+        for (
+            gpx_file,
+            gpx_filepath,
+            map_filepath,
+            workout_data,
+        ) in workouts_to_save:
+            try:
+                new_workout = save_workout(common_params, *workout_data)
+            except WorkoutException as e:
+                db.session.rollback()
+                delete_workout_files(gpx_filepath, map_filepath)
+                on_file_processed(gpx_file, None, e)
+                continue
+            new_workouts.append(new_workout)
+            on_file_processed(gpx_file, new_workout, None)
+    else:
+        if on_file_processed is not None:
+            for (gpx_file, *_), new_workout in zip(
+                workouts_to_save, new_workouts
+            ):
+                on_file_processed(gpx_file, new_workout, None)
+    return new_workouts
+
+
 def process_zip_archive(
-    common_params: Dict, extract_dir: str, stopped_speed_threshold: float
+    common_params: Dict,
+    stopped_speed_threshold: float,
+    on_file_processed: Optional[
+        Callable[[str, Optional[Workout], Optional[WorkoutException]], None]
+    ] = None,
 ) -> List:
     """
     Get files from a zip archive and create workouts, if number of files
     does not exceed defined limit.
+
+    Only gpx files at archive root are copied from the archive (other files
+    are not extracted), directly in user workouts directory.
+    Gpx files are parsed in a process pool and weather data are fetched in
+    a thread pool, then workouts are saved in database at once
+    (in files order).
+
+    If 'on_file_processed' is provided, it is called after each file
+    processing (with created workout or error), an error on a file does
+    not stop archive processing and workouts are saved by chunks (to
+    report progress while archive is processed).
     """
-    with zipfile.ZipFile(common_params['file_path'], "r") as zip_ref:
+    app = current_app._get_current_object()  # type: ignore
+    workouts_dir = get_absolute_file_path(
+        os.path.join('workouts', str(common_params['auth_user'].id))
+    )
+    new_workouts: List[Workout] = []
+    # workouts with files moved to workouts directory
+    pending_workouts: List[Tuple[str, Dict, str, str, Future]] = []
+    # number of pending workouts already saved (or in error)
+    saved_workouts_count = 0
+    # files copied from archive, not renamed yet
+    extracted_filepaths: List[str] = []
+
+    with zipfile.ZipFile(
+        common_params['file_path'], "r"
+    ) as zip_ref, get_parsing_executor(
+        current_app.config['WORKOUTS_IMPORT_PROCESSES']
+    ) as parsing_executor, ThreadPoolExecutor(
+        max_workers=current_app.config['WORKOUTS_IMPORT_THREADS']
+    ) as io_executor:
         max_file_size = current_app.config['max_single_file_size']
         gpx_files_count = 0
         files_with_invalid_size_count = 0
+        gpx_files: List[zipfile.ZipInfo] = []
         for zip_info in zip_ref.infolist():
             if is_gpx_file(zip_info.filename):
                 gpx_files_count += 1
                 if zip_info.file_size > max_file_size:
                     files_with_invalid_size_count += 1
+                if '/' not in zip_info.filename:
+                    gpx_files.append(zip_info)
 
         if gpx_files_count > current_app.config['gpx_limit_import']:
             raise WorkoutException(
@@ -396,23 +773,115 @@ def process_zip_archive(
                 'please check the archive',
             )
 
-        zip_ref.extractall(extract_dir)
+        parsing_futures: List[Future] = []
+        try:
+            for zip_info in gpx_files:
+                try:
+                    extracted_filepaths.append(
+                        extract_gpx_file(zip_ref, zip_info, workouts_dir)
+                    )
+                except Exception as e:
+                    raise WorkoutException(
+                        'error', 'error during zip archive extraction', e
+                    )
+                parsing_futures.append(
+                    parsing_executor.submit(
+                        get_gpx_file_data,
+                        extracted_filepaths[-1],
+                        stopped_speed_threshold,
+                    )
+                )
 
-    new_workouts = []
+            for zip_info, file_path, parsing_future in zip(
+                gpx_files, extracted_filepaths, parsing_futures
+            ):
+                gpx_file = zip_info.filename
+                params = {**common_params, 'file_path': file_path}
+                try:
+                    gpx_data, weather_points = parsing_future.result()
+                    try:
+                        gpx_filepath, map_filepath = store_gpx_file(
+                            params, gpx_file, gpx_data
+                        )
+                    except Exception as e:
+                        raise WorkoutException(
+                            'error', 'error during gpx processing', e
+                        )
+                except WorkoutException as e:
+                    if on_file_processed is None:
+                        raise
+                    on_file_processed(gpx_file, None, e)
+                    continue
+                io_future = io_executor.submit(
+                    get_workout_weather_data, app, weather_points
+                )
+                pending_workouts.append(
+                    (gpx_file, gpx_data, gpx_filepath, map_filepath, io_future)
+                )
+                if (
+                    on_file_processed is not None
+                    and len(pending_workouts) - saved_workouts_count
+                    >= WORKOUTS_SAVE_CHUNK_SIZE
+                ):
+                    new_workouts.extend(
+                        save_pending_workouts(
+                            common_params,
+                            pending_workouts[saved_workouts_count:],
+                            on_file_processed,
+                        )
+                    )
+                    saved_workouts_count = len(pending_workouts)
 
-    for gpx_file in os.listdir(extract_dir):
-        if is_gpx_file(gpx_file):
-            file_path = os.path.join(extract_dir, gpx_file)
-            params = common_params
-            params['file_path'] = file_path
-            new_workout = process_one_gpx_file(
-                params, gpx_file, stopped_speed_threshold
+            new_workouts.extend(
+                save_pending_workouts(
+                    common_params,
+                    pending_workouts[saved_workouts_count:],
+                    on_file_processed,
+                )
             )
-            new_workouts.append(new_workout)
+            saved_workouts_count = len(pending_workouts)
+        except WorkoutException:
+            for future in parsing_futures:
+                future.cancel()
+            io_futures = [workout[4] for workout in pending_workouts]
+            for future in io_futures:
+                future.cancel()
+            wait(io_futures)
+            # remaining workouts are saved at once, none has been saved
+            for _, _, gpx_filepath, map_filepath, _ in pending_workouts[
+                saved_workouts_count:
+            ]:
+                delete_workout_files(gpx_filepath, map_filepath)
+            raise
+        finally:
+            wait(parsing_futures)
+            # remove files not moved (and their track data) if any error
+            for file_path in extracted_filepaths:
+                delete_files(file_path, None)
 
     return new_workouts
 
 
+def get_sport_and_stopped_speed_threshold(
+    auth_user: User, sport_id: Optional[int]
+) -> Tuple[Sport, float]:
+    sport = Sport.query.filter_by(id=sport_id).first()
+    if not sport:
+        raise WorkoutException(
+            'error',
+            f"Sport id: {sport_id} does not exist",
+        )
+    sport_preferences = UserSportPreference.query.filter_by(
+        user_id=auth_user.id, sport_id=sport.id
+    ).first()
+    stopped_speed_threshold = (
+        sport.stopped_speed_threshold
+        if sport_preferences is None
+        else sport_preferences.stopped_speed_threshold
+    )
+    return sport, stopped_speed_threshold
+
+
 def process_files(
     auth_user: User,
     workout_data: Dict,
@@ -427,19 +896,8 @@ def process_files(
     filename = secure_filename(workout_file.filename)
     extension = f".{filename.rsplit('.', 1)[1].lower()}"
     file_path = get_file_path(folders['tmp_dir'], filename)
-    sport = Sport.query.filter_by(id=workout_data.get('sport_id')).first()
-    if not sport:
-        raise WorkoutException(
-            'error',
-            f"Sport id: {workout_data.get('sport_id')} does not exist",
-        )
-    sport_preferences = UserSportPreference.query.filter_by(
-        user_id=auth_user.id, sport_id=sport.id
-    ).first()
-    stopped_speed_threshold = (
-        sport.stopped_speed_threshold
-        if sport_preferences is None
-        else sport_preferences.stopped_speed_threshold
+    sport, stopped_speed_threshold = get_sport_and_stopped_speed_threshold(
+        auth_user, workout_data.get('sport_id')
     )
 
     common_params = {
@@ -463,11 +921,162 @@ def process_files(
             )
         ]
     else:
-        return process_zip_archive(
-            common_params,
-            folders['extract_dir'],
-            stopped_speed_threshold,
+        return process_zip_archive(common_params, stopped_speed_threshold)
+
+
+def create_workout_upload(
+    auth_user: User, workout_data: Dict, workout_file: FileStorage
+) -> WorkoutUpload:
+    """
+    Store gpx file or zip archive to be processed asynchronously
+    """
+    if workout_file.filename is None:
+        raise WorkoutException('error', 'File has no filename.')
+    filename = secure_filename(workout_file.filename)
+    extension = f".{filename.rsplit('.', 1)[1].lower()}"
+    get_sport_and_stopped_speed_threshold(
+        auth_user, workout_data.get('sport_id')
+    )
+
+    file_path = os.path.join(
+        'workouts',
+        str(auth_user.id),
+        'uploads',
+        f'{uuid4().hex}{extension}',
+    )
+    absolute_file_path = get_absolute_file_path(file_path)
+    try:
+        os.makedirs(os.path.dirname(absolute_file_path), exist_ok=True)
+        workout_file.save(absolute_file_path)
+    except Exception as e:
+        raise WorkoutException('error', 'Error during workout file save.', e)
+
+    workout_upload = WorkoutUpload(
+        user_id=auth_user.id,
+        file_name=filename,
+        file_path=file_path,
+        workout_data=workout_data,
+    )
+    db.session.add(workout_upload)
+    db.session.commit()
+    return workout_upload
+
+
+def delete_workout_upload(workout_upload: WorkoutUpload) -> None:
+    """
+    Delete workout upload and stored file (when upload can not be queued)
+    """
+    try:
+        os.remove(get_absolute_file_path(workout_upload.file_path))
+    except OSError:
+        appLog.error('upload file not found when deleting workout upload')
+    db.session.delete(workout_upload)
+    db.session.commit()
+
+
+def get_gpx_files_count(file_path: str) -> int:
+    if not file_path.lower().endswith('.zip'):
+        return 1
+    with zipfile.ZipFile(file_path, "r") as zip_ref:
+        return len(
+            [
+                zip_info
+                for zip_info in zip_ref.infolist()
+                if is_gpx_file(zip_info.filename)
+            ]
+        )
+
+
+def process_workout_upload(upload_id: int) -> List[int]:
+    """
+    Create workouts from an uploaded file, updating upload progress after
+    each processed file, and return created workouts ids
+    """
+    workout_upload = WorkoutUpload.query.filter_by(id=upload_id).first()
+    if not workout_upload or workout_upload.status != 'queued':
+        return []
+
+    new_workouts_ids: List[int] = []
+    workout_upload.status = 'in_progress'
+    db.session.commit()
+
+    absolute_file_path = get_absolute_file_path(workout_upload.file_path)
+
+    def on_file_processed(
+        filename: str,
+        workout: Optional[Workout],
+        error: Optional[WorkoutException],
+    ) -> None:
+        workout_upload.processed_files_count += 1
+        if workout:
+            new_workouts_ids.append(workout.id)
+            # JSON columns are not mutable, lists must be reassigned
+            workout_upload.workouts = [
+                *workout_upload.workouts,
+                workout.short_id,
+            ]
+        if error:
+            if error.e:
+                appLog.error(error.e)
+            workout_upload.errors = [
+                *workout_upload.errors,
+                {'file': filename, 'error': error.message},
+            ]
+        db.session.commit()
+
+    try:
+        user = User.query.filter_by(id=workout_upload.user_id).first()
+        sport, stopped_speed_threshold = get_sport_and_stopped_speed_threshold(
+            user, workout_upload.workout_data.get('sport_id')
+        )
+        workout_upload.files_count = get_gpx_files_count(absolute_file_path)
+        db.session.commit()
+
+        common_params = {
+            'auth_user': user,
+            'workout_data': workout_upload.workout_data,
+            'file_path': absolute_file_path,
+            'sport_id': sport.id,
+        }
+        if absolute_file_path.lower().endswith('.gpx'):
+            try:
+                new_workout = process_one_gpx_file(
+                    common_params,
+                    workout_upload.file_name,
+                    stopped_speed_threshold,
+                )
+            except WorkoutException as e:
+                db.session.rollback()
+                on_file_processed(workout_upload.file_name, None, e)
+            else:
+                on_file_processed(workout_upload.file_name, new_workout, None)
+        else:
+            process_zip_archive(
+                common_params, stopped_speed_threshold, on_file_processed
+            )
+        workout_upload.status = (
+            'successful' if workout_upload.workouts else 'errored'
         )
+    except Exception as e:
+        db.session.rollback()
+        appLog.error(e)
+        workout_upload.status = 'errored'
+        workout_upload.errors = [
+            *workout_upload.errors,
+            {
+                'file': workout_upload.file_name,
+                'error': (
+                    e.message
+                    if isinstance(e, WorkoutException)
+                    else 'error during workout upload processing'
+                ),
+            },
+        ]
+    finally:
+        if os.path.exists(absolute_file_path):
+            os.remove(absolute_file_path)
+        db.session.commit()
+    return new_workouts_ids
 
 
 def get_average_speed(
@@ -481,3 +1090,112 @@ def get_average_speed(
         / nb_workouts,
         2,
     )
+
+
+def compress_workouts_gpx_files(
+    batch_size: int = 100,
+    on_batch_end: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """
+    Compress existing uncompressed gpx files and update workouts by batch.
+    Uncompressed files are deleted once workouts are updated.
+    """
+    counts = {'compressed': 0, 'errors': 0, 'freed_space': 0}
+    last_workout_id = 0
+    while True:
+        workouts = (
+            db.session.query(Workout.id, Workout.gpx)
+            .filter(
+                Workout.id > last_workout_id,
+                Workout.gpx != None,  # noqa
+                ~Workout.gpx.endswith(COMPRESSED_GPX_EXTENSION),
+            )
+            .order_by(Workout.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not workouts:
+            break
+
+        mappings = []
+        uncompressed_filepaths = []
+        for workout in workouts:
+            absolute_gpx_filepath = get_absolute_file_path(workout.gpx)
+            try:
+                compressed_filepath = compress_gpx_file(
+                    absolute_gpx_filepath, delete_uncompressed_file=False
+                )
+                counts['freed_space'] += os.path.getsize(
+                    absolute_gpx_filepath
+                ) - os.path.getsize(compressed_filepath)
+            except Exception as e:
+                appLog.error(
+                    f'error when compressing gpx file for workout '
+                    f'{workout.id}: {e}'
+                )
+                counts['errors'] += 1
+                continue
+            mappings.append(
+                {
+                    'id': workout.id,
+                    'gpx': f'{workout.gpx}{COMPRESSED_GPX_EXTENSION}',
+                }
+            )
+            uncompressed_filepaths.append(absolute_gpx_filepath)
+
+        # bulk update, without triggering workout update events
+        # (that update records)
+        db.session.bulk_update_mappings(Workout, mappings)
+        db.session.commit()
+        for filepath in uncompressed_filepaths:
+            os.remove(filepath)
+        counts['compressed'] += len(mappings)
+        last_workout_id = workouts[-1].id
+        if on_batch_end:
+            on_batch_end(counts)
+
+    return counts
+
+
+def rebuild_records(
+    on_user_end: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Recompute records of all users with workouts or records (records of all
+    sports of a user are computed at once) and return users count
+    """
+    user_ids = sorted(
+        user_id
+        for (user_id,) in db.session.query(Workout.user_id)
+        .union(db.session.query(Record.user_id))
+        .all()
+    )
+    for user_id in user_ids:
+        update_records(user_id, None, db.session.connection(), db.session)
+        db.session.commit()
+        stats_cache.invalidate(user_id)
+        if on_user_end:
+            on_user_end(user_id)
+    return len(user_ids)
+
+
+def rebuild_daily_stats(
+    on_user_end: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Recompute daily statistics of all users from workouts and return users
+    count
+    """
+    user_ids = sorted(
+        user_id
+        for (user_id,) in db.session.query(Workout.user_id)
+        .union(db.session.query(UserSportDailyStats.user_id))
+        .all()
+    )
+    for user_id in user_ids:
+        rebuild_user_daily_stats(db.session.connection(), user_id)
+        db.session.commit()
+        stats_cache.invalidate(user_id)
+        if on_user_end:
+            on_user_end(user_id)
+    return len(user_ids)
@@ -4,7 +4,6 @@ import shutil
 from datetime import timedelta
 from typing import Dict, List, Optional, Tuple, Union
 
-import requests
 from flask import (
     Blueprint,
     Response,
@@ -31,19 +30,36 @@ from fittrackee.responses import (
 )
 from fittrackee.users.models import User
 
-from .models import Workout
+from .models import Workout, WorkoutUpload
+from .tasks import generate_map_image, process_upload
 from .utils.convert import convert_in_duration
 from .utils.gpx import (
     WorkoutGPXException,
     extract_segment_from_gpx_file,
-    get_chart_data,
+    get_cached_chart_data,
+)
+from .utils.gpx_storage import (
+    get_uncompressed_gpx_filepath,
+    is_gpx_file_compressed,
+    iter_gpx_file,
+    open_gpx_file,
+)
+from .utils.maps import (
+    MAP_IMAGE_FORMATS,
+    MAP_IMAGE_SIZES,
+    get_map_tile_content,
+    get_map_tile_etag,
+    get_map_variant,
 )
 from .utils.short_id import decode_short_id
 from .utils.visibility import can_view_workout
 from .utils.workouts import (
     WorkoutException,
     create_workout,
+    create_workout_upload,
+    delete_workout_upload,
     edit_workout,
+    generate_workout_map,
     get_absolute_file_path,
     get_datetime_from_request_args,
     process_files,
@@ -53,6 +69,11 @@ workouts_blueprint = Blueprint('workouts', __name__)
 
 DEFAULT_WORKOUTS_PER_PAGE = 5
 MAX_WORKOUTS_PER_PAGE = 100
+MIN_CHART_DATA_POINTS = 3
+CHART_DATA_FORMATS = ['objects', 'columnar']
+MAP_TILE_MAX_AGE = 86400
+# map images are immutable (addressed by a random map id)
+MAP_MAX_AGE = 365 * 86400
 
 
 @workouts_blueprint.route('/workouts', methods=['GET'])
@@ -424,20 +445,45 @@ def get_workout_data(
             f'no gpx file for this workout (id: {workout_short_id})'
         )
 
+    max_points = None
+    chart_format = request.args.get('format', 'objects')
+    with_polyline = request.args.get('polyline', 'false').lower() == 'true'
+    if data_type == 'chart_data':
+        if 'max_points' in request.args:
+            try:
+                max_points = int(request.args['max_points'])
+            except ValueError:
+                max_points = 0
+            if max_points < MIN_CHART_DATA_POINTS:
+                return InvalidPayloadErrorResponse(
+                    'max_points must be an integer greater than or equal to '
+                    f'{MIN_CHART_DATA_POINTS}'
+                )
+        if chart_format not in CHART_DATA_FORMATS:
+            return InvalidPayloadErrorResponse(
+                'invalid format, must be one of: '
+                f'{", ".join(CHART_DATA_FORMATS)}'
+            )
+
     try:
         absolute_gpx_filepath = get_absolute_file_path(workout.gpx)
-        chart_data_content: Optional[List] = []
+        chart_data_content: Optional[Union[List, Dict]] = []
         if data_type == 'chart_data':
-            chart_data_content = get_chart_data(
+            chart_data_content = get_cached_chart_data(
+                str(workout.uuid),
+                absolute_gpx_filepath,
+                segment_id,
+                max_points,
+                chart_format,
+                with_polyline,
+            )
+        elif segment_id is not None:  # data_type == 'gpx'
+            gpx_segment_content = extract_segment_from_gpx_file(
                 absolute_gpx_filepath, segment_id
             )
-        else:  # data_type == 'gpx'
-            with open(absolute_gpx_filepath, encoding='utf-8') as f:
-                gpx_content = f.read()
-                if segment_id is not None:
-                    gpx_segment_content = extract_segment_from_gpx_file(
-                        gpx_content, segment_id
-                    )
+        else:
+            with open_gpx_file(absolute_gpx_filepath) as f:
+                gpx_content = f.read().decode('utf-8')
     except WorkoutGPXException as e:
         appLog.error(e.message)
         if e.status == 'not found':
@@ -525,14 +571,25 @@ def get_workout_chart_data(
 
     **Scope**: ``workouts:read``
 
-    **Example request**:
+    **Example requests**:
+
+    - without parameters
 
     .. sourcecode:: http
 
       GET /api/workouts/kjxavSTUrJvoAh2wvCeGEF/chart HTTP/1.1
       Content-Type: application/json
 
-    **Example response**:
+    - with columnar format
+
+    .. sourcecode:: http
+
+      GET /api/workouts/kjxavSTUrJvoAh2wvCeGEF/chart?format=columnar HTTP/1.1
+      Content-Type: application/json
+
+    **Example responses**:
+
+    - without parameters
 
     .. sourcecode:: http
 
@@ -566,11 +623,48 @@ def get_workout_chart_data(
         "status": "success"
       }
 
+    - with columnar format
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Content-Type: application/json
+
+      {
+        "data": {
+          "chart_data": {
+            "distance": [0.0, 7.5],
+            "duration": [0.0, 7380.0],
+            "elevation": [279.4, 280.0],
+            "latitude": [51.5078118, 51.5079733],
+            "longitude": [-0.1232004, -0.1234538],
+            "speed": [8.63, 6.39],
+            "start": "Fri, 14 Jul 2017 13:44:03 GMT",
+            "time_offsets": [0, 7380000]
+          }
+        },
+        "message": "",
+        "status": "success"
+      }
+
     :param string workout_short_id: workout short id
 
+    :query integer max_points: maximum number of points returned (minimum:
+           3), points being downsampled with Largest-Triangle-Three-Buckets
+           algorithm (default: all points are returned)
+    :query string format: ``objects`` (default, one object per point) or
+           ``columnar`` (one array per field, with start time truncated to
+           seconds and time offsets in milliseconds)
+    :query boolean polyline: if ``true`` and format is ``columnar``,
+           coordinates are returned as an encoded polyline (default:
+           ``false``)
+
     :reqheader Authorization: OAuth 2.0 Bearer Token
 
     :statuscode 200: success
+    :statuscode 400:
+        - max_points must be an integer greater than or equal to 3
+        - invalid format, must be one of: objects, columnar
     :statuscode 401:
         - provide a valid auth token
         - signature expired, please log in again
@@ -695,10 +789,23 @@ def get_segment_chart_data(
     :param string workout_short_id: workout short id
     :param integer segment_id: segment id
 
+    :query integer max_points: maximum number of points returned (minimum:
+           3), points being downsampled with Largest-Triangle-Three-Buckets
+           algorithm (default: all points are returned)
+    :query string format: ``objects`` (default, one object per point) or
+           ``columnar`` (one array per field, with start time truncated to
+           seconds and time offsets in milliseconds)
+    :query boolean polyline: if ``true`` and format is ``columnar``,
+           coordinates are returned as an encoded polyline (default:
+           ``false``)
+
     :reqheader Authorization: OAuth 2.0 Bearer Token
 
     :statuscode 200: success
-    :statuscode 400: no gpx file for this workout
+    :statuscode 400:
+        - no gpx file for this workout
+        - max_points must be an integer greater than or equal to 3
+        - invalid format, must be one of: objects, columnar
     :statuscode 401:
         - provide a valid auth token
         - signature expired, please log in again
@@ -722,6 +829,10 @@ def download_workout_gpx(
     """
     Download gpx file.
 
+    If gpx file is stored compressed and client accepts gzip encoding,
+    compressed file is returned with ``Content-Encoding: gzip`` header,
+    otherwise file is decompressed on the fly.
+
     **Scope**: ``workouts:read``
 
     **Example request**:
@@ -729,16 +840,20 @@ def download_workout_gpx(
     .. sourcecode:: http
 
       GET /api/workouts/kjxavSTUrJvoAh2wvCeGEF/gpx/download HTTP/1.1
+      Accept-Encoding: gzip
 
     **Example response**:
 
     .. sourcecode:: http
 
       HTTP/1.1 200 OK
+      Content-Encoding: gzip
       Content-Type: application/gpx+xml
 
     :param string workout_short_id: workout short id
 
+    :reqheader Accept-Encoding: ``gzip`` to get compressed gpx file
+
     :statuscode 200: success
     :statuscode 401:
         - provide a valid auth token
@@ -764,12 +879,41 @@ def download_workout_gpx(
             message=f'no gpx file for workout (id: {workout_short_id})',
         )
 
-    return send_from_directory(
-        current_app.config['UPLOAD_FOLDER'],
-        workout.gpx,
-        mimetype='application/gpx+xml',
-        as_attachment=True,
+    download_name = os.path.basename(
+        get_uncompressed_gpx_filepath(workout.gpx)
     )
+    if not is_gpx_file_compressed(workout.gpx):
+        return send_from_directory(
+            current_app.config['UPLOAD_FOLDER'],
+            workout.gpx,
+            mimetype='application/gpx+xml',
+            as_attachment=True,
+        )
+
+    if request.accept_encodings['gzip'] > 0:
+        response = send_from_directory(
+            current_app.config['UPLOAD_FOLDER'],
+            workout.gpx,
+            mimetype='application/gpx+xml',
+            as_attachment=True,
+            download_name=download_name,
+        )
+        response.content_encoding = 'gzip'
+    else:
+        absolute_gpx_filepath = get_absolute_file_path(workout.gpx)
+        if not os.path.exists(absolute_gpx_filepath):
+            return NotFoundErrorResponse('gpx file does not exist')
+        response = Response(
+            iter_gpx_file(absolute_gpx_filepath),
+            mimetype='application/gpx+xml',
+            headers={
+                'Content-Disposition': (
+                    f'attachment; filename={download_name}'
+                )
+            },
+        )
+    response.vary.add('Accept-Encoding')
+    return response
 
 
 @workouts_blueprint.route('/workouts/map/<map_id>', methods=['GET'])
@@ -777,24 +921,45 @@ def download_workout_gpx(
 def get_map(map_id: int) -> Union[HttpResponse, Response]:
     """
     Get map image for workouts with gpx.
+    If map image is not generated yet, it is generated before response.
+
+    Map image is returned in WebP format if client accepts it (unless
+    format is provided in query parameters).
+    Images are immutable and returned with ``ETag`` and ``Cache-Control``
+    headers.
 
     **Example request**:
 
     .. sourcecode:: http
 
-      GET /api/workouts/map/fa33f4d996844a5c73ecd1ae24456ab8?1563529507772
+      GET /api/workouts/map/fa33f4d996844a5c73ecd1ae24456ab8?size=small
         HTTP/1.1
+      Accept: image/webp,*/*
 
     **Example response**:
 
     .. sourcecode:: http
 
       HTTP/1.1 200 OK
-      Content-Type: image/png
+      Cache-Control: private, max-age=31536000, immutable
+      Content-Type: image/webp
+      ETag: "1697544000.0-2146-1738467524"
+      Vary: Accept
+
+    :param string map_id: workout map id (random token set on workout
+                          creation, not a hash of map image)
 
-    :param string map_id: workout map id
+    :query string size: map image size: ``small`` (200x113) or
+                        ``thumbnail`` (100x56). If not provided, default
+                        size is 400x225.
+    :query string format: map image format: ``png`` or ``webp``
+
+    :reqheader Accept: ``image/webp`` to get WebP image
+    :reqheader If-None-Match: map image ETag
 
     :statuscode 200: success
+    :statuscode 304: map image not modified
+    :statuscode 400: invalid size or format
     :statuscode 401:
         - provide a valid auth token
         - signature expired, please log in again
@@ -803,14 +968,43 @@ def get_map(map_id: int) -> Union[HttpResponse, Response]:
     :statuscode 500:
 
     """
+    size = request.args.get('size')
+    if size is not None and size not in MAP_IMAGE_SIZES:
+        return InvalidPayloadErrorResponse('invalid size')
+    image_format = request.args.get('format')
+    if image_format is None:
+        # WebP must be explicitly accepted ('*/*' is not enough)
+        image_format = (
+            'webp'
+            if any(
+                mimetype == 'image/webp' and quality > 0
+                for mimetype, quality in request.accept_mimetypes
+            )
+            else 'png'
+        )
+    elif image_format not in MAP_IMAGE_FORMATS:
+        return InvalidPayloadErrorResponse('invalid format')
     try:
         workout = Workout.query.filter_by(map_id=map_id).first()
         if not workout:
             return NotFoundErrorResponse('Map does not exist.')
-        return send_from_directory(
+        if not generate_workout_map(workout):
+            return NotFoundErrorResponse('Map file does not exist.')
+        map_filepath = get_map_variant(
+            get_absolute_file_path(workout.map), size, image_format
+        )
+        response = send_from_directory(
             current_app.config['UPLOAD_FOLDER'],
-            workout.map,
+            os.path.relpath(map_filepath, current_app.config['UPLOAD_FOLDER']),
+            mimetype=MAP_IMAGE_FORMATS[image_format],
         )
+        # 'immutable' directive is not supported by response cache control
+        response.headers[
+            'Cache-Control'
+        ] = f'private, max-age={MAP_MAX_AGE}, immutable'
+        if 'format' not in request.args:
+            response.vary.add('Accept')
+        return response
     except NotFound:
         return NotFoundErrorResponse('Map file does not exist.')
     except Exception as e:
@@ -821,10 +1015,13 @@ def get_map(map_id: int) -> Union[HttpResponse, Response]:
     '/workouts/map_tile/<s>/<z>/<x>/<y>.png', methods=['GET']
 )
 @limiter.exempt
-def get_map_tile(s: str, z: str, x: str, y: str) -> Tuple[Response, int]:
+def get_map_tile(s: str, z: str, x: str, y: str) -> Response:
     """
     Get map tile from tile server.
 
+    Tiles are cached by the application and returned with ``ETag`` and
+    ``Cache-Control`` headers.
+
     **Example request**:
 
     .. sourcecode:: http
@@ -836,31 +1033,36 @@ def get_map_tile(s: str, z: str, x: str, y: str) -> Tuple[Response, int]:
     .. sourcecode:: http
 
       HTTP/1.1 200 OK
+      Cache-Control: public, max-age=86400
       Content-Type: image/png
+      ETag: "8d2c5e0a3b41f6d97c2e51a0b7f3d4c6"
 
     :param string s: subdomain
     :param string z: zoom
     :param string x: index of the tile along the map's x axis
     :param string y: index of the tile along the map's y axis
 
-    Status codes are status codes returned by tile server
+    :reqheader If-None-Match: tile ETag
+
+    :statuscode 304: tile not modified
+
+    Other status codes are status codes returned by tile server
 
     """
-    url = current_app.config['TILE_SERVER']['URL'].format(
+    status_code, content, content_type = get_map_tile_content(
+        current_app.config['TILE_SERVER'],
         s=secure_filename(s),
         z=secure_filename(z),
         x=secure_filename(x),
         y=secure_filename(y),
     )
-    headers = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:88.0)'}
-    response = requests.get(url, headers=headers, timeout=30)
-    return (
-        Response(
-            response.content,
-            content_type=response.headers['content-type'],
-        ),
-        response.status_code,
-    )
+    response = Response(content, status=status_code, content_type=content_type)
+    if status_code == 200:
+        response.set_etag(get_map_tile_etag(content))
+        response.cache_control.public = True
+        response.cache_control.max_age = MAP_TILE_MAX_AGE
+        response.make_conditional(request)
+    return response
 
 
 @workouts_blueprint.route('/workouts', methods=['POST'])
@@ -959,6 +1161,33 @@ def post_workout(auth_user: User) -> Union[Tuple[Dict, int], HttpResponse]:
           "status": "success"
         }
 
+    **Example response (asynchronous processing)**:
+
+    .. sourcecode:: http
+
+      HTTP/1.1 202 ACCEPTED
+      Content-Type: application/json
+
+        {
+          "data": {
+            "upload": {
+              "created_at": "Sun, 01 Mar 2026 09:10:12 GMT",
+              "errors": [],
+              "file_name": "workouts.zip",
+              "files_count": null,
+              "id": "2bW4mKpZnNwKGh4QyTXVS3",
+              "processed_files_count": 0,
+              "status": "queued",
+              "workouts": []
+            }
+          },
+          "status": "success"
+        }
+
+    :query boolean async: if ``true``, file is processed by task queue
+           workers and upload progress can be fetched with
+           ``GET /api/workouts/uploads/<upload_id>``
+
     :form file: gpx file (allowed extensions: .gpx, .zip)
     :form data: sport id and notes (example: ``{"sport_id": 1, "notes": ""}``).
                 Double quotes in notes must be escaped.
@@ -966,6 +1195,7 @@ def post_workout(auth_user: User) -> Union[Tuple[Dict, int], HttpResponse]:
     :reqheader Authorization: OAuth 2.0 Bearer Token
 
     :statuscode 201: workout created
+    :statuscode 202: workout file queued for processing
     :statuscode 400:
         - invalid payload
         - no file part
@@ -1002,11 +1232,33 @@ def post_workout(auth_user: User) -> Union[Tuple[Dict, int], HttpResponse]:
         return InvalidPayloadErrorResponse()
 
     workout_file = request.files['file']
+    if request.args.get('async', 'false').lower() == 'true':
+        try:
+            workout_upload = create_workout_upload(
+                auth_user, workout_data, workout_file
+            )
+        except WorkoutException as e:
+            db.session.rollback()
+            if e.e:
+                appLog.error(e.e)
+            return InternalServerErrorResponse(e.message)
+        try:
+            process_upload.send(upload_id=workout_upload.id)
+        except Exception as e:
+            appLog.error(e)
+            delete_workout_upload(workout_upload)
+            return InternalServerErrorResponse(
+                'error when queuing workout file processing'
+            )
+        return {
+            'status': 'success',
+            'data': {'upload': workout_upload.serialize()},
+        }, 202
+
     upload_dir = os.path.join(
         current_app.config['UPLOAD_FOLDER'], 'workouts', str(auth_user.id)
     )
     folders = {
-        'extract_dir': os.path.join(upload_dir, 'extract'),
         'tmp_dir': os.path.join(upload_dir, 'tmp'),
     }
 
@@ -1015,6 +1267,13 @@ def post_workout(auth_user: User) -> Union[Tuple[Dict, int], HttpResponse]:
             auth_user, workout_data, workout_file, folders
         )
         if len(new_workouts) > 0:
+            try:
+                for new_workout in new_workouts:
+                    generate_map_image.send(workout_id=new_workout.id)
+            except Exception as e:
+                # if task queue is not available, maps are generated on
+                # first request
+                appLog.error(e)
             response_object = {
                 'status': 'created',
                 'data': {
@@ -1033,11 +1292,86 @@ def post_workout(auth_user: User) -> Union[Tuple[Dict, int], HttpResponse]:
             return InternalServerErrorResponse(e.message)
         return InvalidPayloadErrorResponse(e.message, e.status)
 
-    shutil.rmtree(folders['extract_dir'], ignore_errors=True)
     shutil.rmtree(folders['tmp_dir'], ignore_errors=True)
     return response_object, 201
 
 
+@workouts_blueprint.route(
+    '/workouts/uploads/<string:upload_id>', methods=['GET']
+)
+@require_auth(scopes=['workouts:read'])
+def get_workout_upload(
+    auth_user: User, upload_id: str
+) -> Union[Dict, HttpResponse]:
+    """
+    Get progress of a workout file uploaded for asynchronous processing
+    (only uploads from authenticated user are accessible).
+
+    **Scope**: ``workouts:read``
+
+    **Example request**:
+
+    .. sourcecode:: http
+
+      GET /api/workouts/uploads/2bW4mKpZnNwKGh4QyTXVS3 HTTP/1.1
+
+    **Example response**:
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Content-Type: application/json
+
+        {
+          "data": {
+            "upload": {
+              "created_at": "Sun, 01 Mar 2026 09:10:12 GMT",
+              "errors": [
+                {
+                  "error": "no tracks in gpx file",
+                  "file": "test_3.gpx"
+                }
+              ],
+              "file_name": "workouts.zip",
+              "files_count": 3,
+              "id": "2bW4mKpZnNwKGh4QyTXVS3",
+              "processed_files_count": 3,
+              "status": "successful",
+              "workouts": [
+                "kjxavSTUrJvoAh2wvCeGEF",
+                "XoVZKhZ3hN8yNAaK2ZqJu3"
+              ]
+            }
+          },
+          "status": "success"
+        }
+
+    - upload statuses: ``queued``, ``in_progress``, ``successful`` (at
+      least one workout created) and ``errored``
+
+    :param string upload_id: upload short id
+
+    :reqheader Authorization: OAuth 2.0 Bearer Token
+
+    :statuscode 200: success
+    :statuscode 401:
+        - provide a valid auth token
+        - signature expired, please log in again
+        - invalid token, please log in again
+    :statuscode 404: upload not found
+
+    """
+    workout_upload = WorkoutUpload.query.filter_by(
+        uuid=decode_short_id(upload_id), user_id=auth_user.id
+    ).first()
+    if not workout_upload:
+        return NotFoundErrorResponse(f'upload not found (id: {upload_id})')
+    return {
+        'status': 'success',
+        'data': {'upload': workout_upload.serialize()},
+    }
+
+
 @workouts_blueprint.route('/workouts/no_gpx', methods=['POST'])
 @require_auth(scopes=['workouts:write'])
 def post_workout_no_gpx(